@@ -6,20 +6,34 @@ from datetime import datetime, date
 from pathlib import Path
 
 from .config import config
-from .db import migrate_db, reset_db, db
+from .db import migrate_db, reset_db, db, async_db, create_partitions, detach_partitions
 from .ingest.ct import ingest_ct
 from .ingest.rss import ingest_rss
 from .ingest.commoncrawl import ingest_cc
 from .pipeline.filters import filter_raw_urls
 from .pipeline.html_writer import HTMLWriter
 from .pipeline.sitemap_writer import SitemapWriter
-from .pipeline.manifest import create_run_manifest, get_run_stats, get_daily_stats, get_ranking_stats
+from .pipeline.manifest import (
+    create_run_manifest, get_run_stats, get_daily_stats, get_ranking_stats,
+    record_stage_metrics, refresh_stats_snapshots,
+)
+from .pipeline.metrics import StageMetrics
+from .pipeline.profiling import CommandProfiler
+from .pipeline.tracing import span, start_tracing, stop_tracing
 from .pipeline.ranker import ranker
+from .pipeline.recheck import recheck_due_urls
+from .pipeline.day_summary import refresh_day_summaries
 
 
 @click.group()
 @click.option('--config-file', help='Configuration file path')
-def main(config_file):
+@click.option('--profile', is_flag=True, help='Profile the command; writes .pstats and collapsed stacks to PROFILE_DIR')
+@click.option('--profile-top', default=None, type=click.IntRange(min=1),
+              help='Print the N most expensive functions (implies --profile; default: 20)')
+@click.option('--trace', 'trace_path', default=None,
+              help='Write tracing spans in Chrome trace format to this file (default from TRACE_FILE)')
+@click.pass_context
+def main(ctx, config_file, profile, profile_top, trace_path):
     """Holler Discovery Feed CLI."""
     if config_file:
         # TODO: Load config from file
@@ -30,6 +44,16 @@ def main(config_file):
     except ValueError as e:
         click.echo(f"Configuration error: {e}", err=True)
         raise click.Abort()
+    
+    if profile or profile_top:
+        profiler = CommandProfiler(ctx.invoked_subcommand, top=profile_top or 20).start()
+        ctx.call_on_close(profiler.stop)
+    
+    trace_path = trace_path or config.trace_file
+    if trace_path:
+        start_tracing(trace_path, f"hndisc {ctx.invoked_subcommand}")
+        ctx.call_on_close(stop_tracing)
+        ctx.with_resource(span(f"cli.{ctx.invoked_subcommand}"))
 
 
 @main.command()
@@ -37,10 +61,13 @@ def main(config_file):
 def migrate_db_cmd(reset):
     """Apply database migrations."""
     async def _migrate():
-        if reset:
-            await reset_db()
-        else:
-            await migrate_db()
+        try:
+            if reset:
+                await reset_db()
+            else:
+                await migrate_db()
+        finally:
+            await async_db.dispose()
     
     asyncio.run(_migrate())
     click.echo("Database migration completed")
@@ -51,7 +78,9 @@ def migrate_db_cmd(reset):
 def ingest_ct_cmd(hours):
     """Ingest URLs from Certificate Transparency logs."""
     async def _ingest():
-        count = await ingest_ct(hours)
+        with StageMetrics('ingest', 'ct') as stage:
+            count = await ingest_ct(hours)
+        record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
         click.echo(f"CT ingestion completed: {count} URLs inserted")
     
     asyncio.run(_ingest())
@@ -62,7 +91,9 @@ def ingest_ct_cmd(hours):
 def ingest_rss_cmd(feeds):
     """Ingest URLs from RSS feeds."""
     async def _ingest():
-        count = await ingest_rss(feeds)
+        with StageMetrics('ingest', 'rss') as stage:
+            count = await ingest_rss(feeds)
+        record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
         click.echo(f"RSS ingestion completed: {count} URLs inserted")
     
     asyncio.run(_ingest())
@@ -73,7 +104,9 @@ def ingest_rss_cmd(feeds):
 def ingest_cc_cmd(limit):
     """Ingest URLs from Common Crawl Index."""
     async def _ingest():
-        count = await ingest_cc(limit)
+        with StageMetrics('ingest', 'cc') as stage:
+            count = await ingest_cc(limit)
+        record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
         click.echo(f"Common Crawl ingestion completed: {count} URLs inserted")
     
     asyncio.run(_ingest())
@@ -83,32 +116,40 @@ def ingest_cc_cmd(limit):
 @click.option('--host-cap', default=None, type=int, help='Maximum URLs per host (default from config)')
 def filter_cmd(host_cap):
     """Filter raw URLs and move good ones to discovered_kept."""
-    count = filter_raw_urls(host_cap)
+    with StageMetrics('filter') as stage:
+        count = filter_raw_urls(host_cap)
+    record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
     click.echo(f"Filtering completed: {count} URLs moved to discovered_kept")
 
 
 @main.command()
 @click.option('--min-publish-score', default=None, type=float, help='Minimum score to publish (default from config)')
 @click.option('--profile-score', default=None, type=float, help='Minimum score for profile pages (default from config)')
-def rank_cmd(min_publish_score, profile_score):
+@click.option('--workers', default=1, type=click.IntRange(min=1), help='Scoring worker processes (default: 1, serial)')
+@click.option('--chunk-size', default=None, type=int, help='URLs per ranking chunk with --workers (default from config)')
+@click.option('--redecay/--no-redecay', default=True, help='Re-apply freshness decay to already ranked URLs (default: on)')
+def rank_cmd(min_publish_score, profile_score, workers, chunk_size, redecay):
     """Rank URLs and assign priority classes."""
     async def _rank():
-        counts = await ranker.rank_urls(min_publish_score, profile_score)
-        
-        # Update run manifest with ranking metrics
-        run_date = datetime.now().strftime('%Y-%m-%d')
-        avg_score = 0.0  # Will be computed by ranker
-        
-        # Get average score from database
-        from .db import DiscoveredKept
-        from sqlalchemy import func
-        session = db.get_session()
         try:
-            avg_score = session.query(func.avg(DiscoveredKept.discovery_score)).scalar() or 0.0
+            with StageMetrics('rank') as stage:
+                if redecay:
+                    await ranker.redecay_freshness()
+                counts = await ranker.rank_urls(min_publish_score, profile_score, workers, chunk_size)
+                touched = ranker.pop_touched_dates()
+                # Summary refreshes use sync sessions; keep them off the event loop
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, refresh_day_summaries, touched)
+                await loop.run_in_executor(None, refresh_stats_snapshots, touched)
+            
+            # Update run manifest with ranking metrics (average computed by rank_urls)
+            run_date = datetime.now().strftime('%Y-%m-%d')
+            avg_score = ranker.last_avg_score
+            
+            await ranker.update_run_manifest(run_date, counts, avg_score)
         finally:
-            session.close()
-        
-        await ranker.update_run_manifest(run_date, counts, avg_score)
+            await async_db.dispose()
+        record_stage_metrics(run_date, [stage])
         
         click.echo("Ranking completed successfully!")
         click.echo(f"  P0 (≥80): {counts['P0']} URLs")
@@ -120,29 +161,100 @@ def rank_cmd(min_publish_score, profile_score):
     asyncio.run(_rank())
 
 
+@main.command()
+@click.option('--ahead', default=None, type=click.IntRange(min=0),
+              help='Months of partitions to create ahead (default from config)')
+@click.option('--detach-before', default=None, help='Detach monthly partitions before this month (YYYY-MM)')
+@click.option('--drop', is_flag=True, help='Drop detached partitions instead of keeping them for archiving')
+def partitions_cmd(ahead, detach_before, drop):
+    """Create upcoming monthly partitions and detach old ones."""
+    async def _partitions():
+        created = await create_partitions(ahead)
+        click.echo(f"Created {len(created)} partitions")
+        
+        if detach_before:
+            before_month = datetime.strptime(detach_before, '%Y-%m').date()
+            detached = await detach_partitions(before_month, drop=drop)
+            for name in detached:
+                click.echo(f"{'Dropped' if drop else 'Detached'} {name}")
+            click.echo(f"{'Dropped' if drop else 'Detached'} {len(detached)} partitions")
+    
+    asyncio.run(_partitions())
+
+
+@main.command()
+def refresh_days_cmd():
+    """Rebuild the per-day discovery summary table from discovered_kept."""
+    count = refresh_day_summaries()
+    click.echo(f"Discovery day summary rebuilt: {count} days")
+
+
+@main.command()
+@click.option('--batch-size', default=None, type=int, help='URLs leased per batch (default from config)')
+@click.option('--max-batches', default=None, type=int, help='Stop after this many batches (default: drain queue)')
+def recheck_cmd(batch_size, max_batches):
+    """Re-score P2/P3 URLs whose backoff check is due."""
+    totals = recheck_due_urls(batch_size, max_batches)
+    click.echo(f"Recheck completed: {totals['checked']} URLs rechecked, "
+               f"{totals['promoted']} promoted to P0/P1")
+
+
 @main.command()
 @click.option('--date', default=None, help='Date to generate pages for (YYYY-MM-DD, default: today)')
+@click.option('--from', 'from_date', default=None, help='First date of a backfill range (YYYY-MM-DD)')
+@click.option('--to', 'to_date', default=None, help='Last date of a backfill range (YYYY-MM-DD, default: today)')
 @click.option('--out', default='../public', help='Output directory (default: ../public)')
 @click.option('--links-per-page', default=None, type=int, help='Links per page (default from config)')
-def generate_cmd(date, out, links_per_page):
-    """Generate discovery pages for a specific date."""
+@click.option('--workers', default=1, type=click.IntRange(min=1), help='Page rendering processes (default: 1, serial)')
+@click.option('--force', is_flag=True, help='Rewrite pages even if their inputs are unchanged')
+@click.option('--precompress', multiple=True, type=click.Choice(['gz', 'br']),
+              help='Also write .gz/.br siblings (repeatable; default from PRECOMPRESS)')
+@click.option('--append', is_flag=True, help='Only publish new URLs onto the tail pages, keeping published pages fixed')
+def generate_cmd(date, from_date, to_date, out, links_per_page, workers, force, precompress, append):
+    """Generate discovery pages for a specific date or a range of dates."""
     if date is None:
         date = datetime.now().strftime('%Y-%m-%d')
+    if from_date and to_date is None:
+        to_date = datetime.now().strftime('%Y-%m-%d')
     
     # Validate date format
     try:
-        datetime.strptime(date, '%Y-%m-%d')
+        for value in (date, from_date, to_date):
+            if value is not None:
+                datetime.strptime(value, '%Y-%m-%d')
     except ValueError:
         click.echo("Error: Invalid date format. Use YYYY-MM-DD", err=True)
         raise click.Abort()
     
+    if to_date and not from_date:
+        click.echo("Error: --to requires --from", err=True)
+        raise click.Abort()
+    if from_date and append:
+        click.echo("Error: --append cannot be combined with --from/--to", err=True)
+        raise click.Abort()
+    
     # Override config if specified
     if links_per_page:
         config.links_per_page = links_per_page
     
-    writer = HTMLWriter(output_dir=out)
-    generated_files = writer.generate_discovery_pages(date)
+    writer = HTMLWriter(output_dir=out, workers=workers, force=force,
+                        precompress=precompress or None)
+    try:
+        with StageMetrics('generate') as stage:
+            if from_date:
+                generated_files = writer.generate_date_range(from_date, to_date)
+            elif append:
+                generated_files = writer.append_pages_for_date(date)
+            else:
+                generated_files = writer.generate_discovery_pages(date)
+            stage.rows_out = len(generated_files)
+    finally:
+        writer.close()
+    record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
     
+    if from_date:
+        click.echo(f"Generated {len(generated_files)} files for {from_date} to {to_date}")
+        return
     click.echo(f"Generated {len(generated_files)} files for {date}")
     for file_path in generated_files:
         click.echo(f"  {file_path}")
@@ -151,13 +263,17 @@ def generate_cmd(date, out, links_per_page):
 @main.command()
 @click.option('--root', default='../public', help='Root directory for sitemaps (default: ../public)')
 @click.option('--base-url', default=None, help='Base URL for sitemaps (default from config)')
-def sitemaps_cmd(root, base_url):
+@click.option('--force', is_flag=True, help='Rewrite every shard even if unchanged')
+def sitemaps_cmd(root, base_url, force):
     """Generate sitemaps."""
     if base_url:
         config.base_url = base_url
     
-    writer = SitemapWriter(output_dir=root, base_url=config.base_url)
-    generated_files = writer.generate_sitemaps()
+    writer = SitemapWriter(output_dir=root, base_url=config.base_url, force=force)
+    with StageMetrics('sitemaps') as stage:
+        generated_files = writer.generate_sitemaps()
+        stage.rows_out = len(generated_files)
+    record_stage_metrics(datetime.now().strftime('%Y-%m-%d'), [stage])
     
     click.echo(f"Generated {len(generated_files)} sitemap files")
     for file_path in generated_files:
@@ -235,8 +351,12 @@ def upload_cmd(root, provider, bucket, prefix):
 @main.command()
 @click.option('--date', default=None, help='Date to get stats for (YYYY-MM-DD, default: latest)')
 @click.option('--ranking', is_flag=True, help='Show ranking statistics')
-def stats_cmd(date, ranking):
+@click.option('--refresh', is_flag=True, help='Recompute the daily stats snapshot before reading it')
+def stats_cmd(date, ranking, refresh):
     """Show run statistics."""
+    if refresh:
+        refresh_stats_snapshots([date or datetime.now().strftime('%Y-%m-%d')])
+    
     if date:
         stats = get_run_stats(date)
         daily_stats = get_daily_stats(date)
@@ -272,6 +392,7 @@ def stats_cmd(date, ranking):
         click.echo(f"  Date: {daily_stats.get('date', 'N/A')}")
         click.echo(f"  Raw Count: {daily_stats.get('raw_count', 0)}")
         click.echo(f"  Kept Count: {daily_stats.get('kept_count', 0)}")
+        click.echo(f"  Publishable: {daily_stats.get('publishable_count', 0)} URLs on {daily_stats.get('page_count', 0)} pages")
         click.echo(f"  Filter Rate: {daily_stats.get('filter_rate', 0):.2%}")
         
         if daily_stats.get('source_breakdown'):
@@ -287,6 +408,7 @@ def stats_cmd(date, ranking):
     if ranking and 'ranking_stats' in locals():
         click.echo("\nDetailed Ranking Statistics:")
         click.echo(f"  Date: {ranking_stats.get('date', 'N/A')}")
+        click.echo(f"  Snapshot: {ranking_stats.get('computed_at') or 'none (computed live; --refresh stores one)'}")
         click.echo(f"  Average Score: {ranking_stats.get('avg_score', 0.0):.2f}")
         
         if ranking_stats.get('priority_counts'):
@@ -313,37 +435,54 @@ def full_pipeline_cmd():
         
         click.echo(f"Running full discovery pipeline for {date_str}")
         
+        stages = []
+        
         # Step 1: Ingest from all sources
         click.echo("Step 1: Ingesting from Certificate Transparency...")
-        ct_count = await ingest_ct()
+        with StageMetrics('ingest', 'ct') as stage:
+            ct_count = await ingest_ct()
+        stages.append(stage)
         
         click.echo("Step 2: Ingesting from RSS feeds...")
-        rss_count = await ingest_rss()
+        with StageMetrics('ingest', 'rss') as stage:
+            rss_count = await ingest_rss()
+        stages.append(stage)
         
         click.echo("Step 3: Ingesting from Common Crawl...")
-        cc_count = await ingest_cc()
+        with StageMetrics('ingest', 'cc') as stage:
+            cc_count = await ingest_cc()
+        stages.append(stage)
         
         total_candidates = ct_count + rss_count + cc_count
         click.echo(f"Total candidates ingested: {total_candidates}")
         
         # Step 2: Filter URLs
         click.echo("Step 4: Filtering URLs...")
-        kept_count = filter_raw_urls()
+        with StageMetrics('filter') as stage:
+            kept_count = filter_raw_urls()
+        stages.append(stage)
         
         # Step 3: Generate HTML pages
         click.echo("Step 5: Generating discovery pages...")
         writer = HTMLWriter(output_dir='../public')
-        generated_files = writer.generate_discovery_pages(date_str)
+        with StageMetrics('generate') as stage:
+            generated_files = writer.generate_discovery_pages(date_str)
+            stage.rows_out = len(generated_files)
+        stages.append(stage)
         
         # Step 4: Generate sitemaps
         click.echo("Step 6: Generating sitemaps...")
         sitemap_writer = SitemapWriter(output_dir='../public')
-        sitemap_files = sitemap_writer.generate_sitemaps()
+        with StageMetrics('sitemaps') as stage:
+            sitemap_files = sitemap_writer.generate_sitemaps()
+            stage.rows_out = len(sitemap_files)
+        stages.append(stage)
         
         # Step 5: Create manifest
         click.echo("Step 7: Creating run manifest...")
         pages = len([f for f in generated_files if f.endswith('.html')])
         run_id = create_run_manifest(date_str, total_candidates, kept_count, pages)
+        record_stage_metrics(date_str, stages, run_id)
         
         click.echo(f"Pipeline completed successfully!")
         click.echo(f"  Candidates: {total_candidates}")
@@ -31,9 +31,12 @@ class Config:
     
     # Generate settings
     links_per_page: int = int(os.getenv("LINKS_PER_PAGE", "200"))
+    template_cache_dir: str = os.getenv("TEMPLATE_CACHE_DIR", "")  # Jinja bytecode cache (default: system temp)
+    precompress: List[str] = None  # Precompressed siblings to write (gz, br)
     
     # Sitemap settings
     sitemap_urls_per_file: int = int(os.getenv("SITEMAP_URLS_PER_FILE", "50000"))
+    sitemap_max_bytes: int = int(os.getenv("SITEMAP_MAX_BYTES", str(50 * 1024 * 1024)))  # Uncompressed limit
     base_url: str = os.getenv("BASE_URL", "https://holler.news")
     
     # Publish mode
@@ -67,14 +70,28 @@ class Config:
     min_publish_score: float = float(os.getenv("MIN_PUBLISH_SCORE", "60.0"))
     profile_score: float = float(os.getenv("PROFILE_SCORE", "80.0"))
     
+    # Ranking batch size (rows per chunk in parallel ranking)
+    rank_chunk_size: int = int(os.getenv("RANK_CHUNK_SIZE", "5000"))
+    
     # Backoff settings
     backoff_start_hours: int = int(os.getenv("BACKOFF_START_HOURS", "6"))
     backoff_max_hours: int = int(os.getenv("BACKOFF_MAX_HOURS", "48"))
     backoff_multiplier: float = float(os.getenv("BACKOFF_MULTIPLIER", "2.0"))
+    recheck_batch_size: int = int(os.getenv("RECHECK_BATCH_SIZE", "500"))
+    
+    # Partitioning (monthly partitions of discovered_raw/discovered_kept)
+    partition_months_ahead: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    
+    # Profiling settings (hndisc --profile)
+    profile_dir: str = os.getenv("PROFILE_DIR", "profiles")
+    profile_interval: float = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # Stack sampling period (s)
+    trace_file: str = os.getenv("TRACE_FILE", "")  # Chrome trace output for tracing spans (off if empty)
     
     def __post_init__(self):
         if self.doc_extensions is None:
             self.doc_extensions = os.getenv("DOC_EXTENSIONS", "pdf,csv,json,txt").split(",")
+        if self.precompress is None:
+            self.precompress = [fmt for fmt in os.getenv("PRECOMPRESS", "").split(",") if fmt]
         
         # Validate ranking weights sum to 1.0
         total_weight = (
@@ -1,25 +1,32 @@
 """Database connection and models for holler-discovery."""
 
 import asyncio
-from datetime import datetime, date
+import re
+from datetime import datetime, date, time, timedelta, timezone
 from typing import List, Optional
 from uuid import UUID, uuid4
 
 import asyncpg
 from sqlalchemy import (
     BigInteger,
+    Boolean,
     Column,
+    Computed,
+    Date,
     DateTime,
     Float,
     Integer,
+    PrimaryKeyConstraint,
     SmallInteger,
     String,
     Text,
     UniqueConstraint,
     create_engine,
     func,
+    select,
+    update,
 )
-from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
+from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB, insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text
@@ -29,35 +36,177 @@ from .config import config
 Base = declarative_base()
 
 
+def as_date(value) -> date:
+    """Coerce a YYYY-MM-DD string for comparison with the *_date columns."""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def utc_day_range(column, first_day, last_day=None) -> list:
+    """Range clauses on a partition key covering whole UTC days, first to last.
+    
+    The *_date columns are generated, so the planner can't prune partitions
+    from them; pair them with these bounds on seen_at/picked_at.
+    """
+    first = as_date(first_day)
+    last = as_date(last_day) if last_day is not None else first
+    start = datetime.combine(first, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(last + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return [column >= start, column < end]
+
+
+def month_partitions(table: str, first_month: date, last_month: date) -> List[tuple]:
+    """(name, start, end) of each monthly partition from first_month to last_month."""
+    partitions = []
+    start = first_month.replace(day=1)
+    while start <= last_month:
+        end = (start + timedelta(days=32)).replace(day=1)
+        partitions.append((f"{table}_p{start:%Y_%m}", start, end))
+        start = end
+    return partitions
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with the asyncpg driver, for create_async_engine."""
+    return re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql+asyncpg://', url)
+
+
+def utc_day(value: datetime) -> date:
+    """UTC calendar day of a timestamp, matching the generated *_date columns."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
 class DiscoveredRaw(Base):
-    """Raw discovered URLs from all sources."""
+    """Raw discovered URLs from all sources, partitioned by month of seen_at."""
     __tablename__ = "discovered_raw"
+    __table_args__ = (
+        # A partitioned table's primary key must include the partition key
+        PrimaryKeyConstraint('id', 'seen_at'),
+        {'postgresql_partition_by': 'RANGE (seen_at)'},
+    )
     
-    id = Column(BigInteger, primary_key=True)
-    url = Column(Text, unique=True, nullable=False, index=True)
+    id = Column(BigInteger, autoincrement=True)
+    url = Column(Text, nullable=False, index=True)  # Unique via discovered_url
     host = Column(String(255), nullable=False, index=True)
     tld = Column(String(100))
     source = Column(String(20), nullable=False)  # 'ct'|'rss'|'cc'|'seed'
     seen_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), index=True)
+    seen_date = Column(Date, Computed("(seen_at AT TIME ZONE 'UTC')::date", persisted=True))
+    
+    __mapper_args__ = {'primary_key': [id]}
 
 
 class DiscoveredKept(Base):
-    """Filtered URLs that passed quality checks."""
+    """Filtered URLs that passed quality checks, partitioned by month of picked_at."""
     __tablename__ = "discovered_kept"
+    __table_args__ = (
+        PrimaryKeyConstraint('id', 'picked_at'),
+        {'postgresql_partition_by': 'RANGE (picked_at)'},
+    )
     
-    id = Column(BigInteger, primary_key=True)
-    url = Column(Text, unique=True, nullable=False, index=True)
+    id = Column(BigInteger, autoincrement=True)
+    url = Column(Text, nullable=False, index=True)  # Unique via discovered_url
     host = Column(String(255), nullable=False, index=True)
     tld = Column(String(100))
     parking_score = Column(Float, nullable=False)
     novelty_score = Column(Float, nullable=False)
     picked_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    picked_date = Column(Date, Computed("(picked_at AT TIME ZONE 'UTC')::date", persisted=True))
     
     # New scoring columns
     discovery_score = Column(Float, nullable=False, default=0.0)
     priority_class = Column(SmallInteger, nullable=False, default=2)  # 0=P0, 1=P1, 2=P2, 3=P3
     signals = Column(JSONB)  # Sub-scores and booleans used
     next_check_at = Column(DateTime(timezone=True))  # For P2/P3 backoff
+    recheck_count = Column(SmallInteger, nullable=False, default=0, server_default=text("0"))
+    
+    # Incremental ranking state
+    needs_rank = Column(Boolean, nullable=False, default=True, server_default=text("true"))
+    freshness_bucket = Column(SmallInteger)  # Index into ranker FRESHNESS_VALUES
+    
+    # Discovery page the URL was published on (fixed once assigned)
+    published_page = Column(Integer)
+    
+    __mapper_args__ = {'primary_key': [id]}
+
+
+class DiscoveredUrl(Base):
+    """Every URL ever ingested, with the partition keys of its raw and kept rows.
+    
+    A unique index on a partitioned table must include the partition key, so
+    URL-level uniqueness lives in this small unpartitioned table instead.
+    """
+    __tablename__ = "discovered_url"
+    
+    url = Column(Text, primary_key=True)
+    seen_at = Column(DateTime(timezone=True), nullable=False)  # discovered_raw partition key
+    picked_at = Column(DateTime(timezone=True))  # discovered_kept partition key, once kept
+
+
+def claim_raw_url(session, url: str) -> Optional[datetime]:
+    """Register a newly ingested URL; returns its seen_at, or None if already ingested."""
+    return session.execute(
+        insert(DiscoveredUrl)
+        .values(url=url, seen_at=func.now())
+        .on_conflict_do_nothing(index_elements=['url'])
+        .returning(DiscoveredUrl.seen_at)
+    ).scalar()
+
+
+def claim_kept_url(session, url: str) -> Optional[datetime]:
+    """Mark an ingested URL as kept; returns its picked_at, or None if already kept."""
+    return session.execute(
+        update(DiscoveredUrl)
+        .where(DiscoveredUrl.url == url, DiscoveredUrl.picked_at.is_(None))
+        .values(picked_at=func.now())
+        .returning(DiscoveredUrl.picked_at)
+    ).scalar()
+
+
+class DiscoveryPageKey(Base):
+    """Seek key for each discovery page: the sort key of the last URL on the previous page."""
+    __tablename__ = "discovery_page_keys"
+    
+    picked_date = Column(String(10), primary_key=True)  # YYYY-MM-DD
+    page_num = Column(Integer, primary_key=True)
+    links_per_page = Column(Integer, nullable=False)
+    discovery_score = Column(Float, nullable=False)
+    novelty_score = Column(Float, nullable=False)
+    parking_score = Column(Float, nullable=False)
+    last_id = Column(BigInteger, nullable=False)
+
+
+class DiscoveryDay(Base):
+    """Per-day summary of publishable URLs, kept current by rank and generate."""
+    __tablename__ = "discovery_day"
+    
+    day = Column(Date, primary_key=True)
+    publishable_count = Column(Integer, nullable=False, default=0)
+    page_count = Column(Integer, nullable=False, default=0)
+    links_per_page = Column(Integer, nullable=False)
+    first_picked_at = Column(DateTime(timezone=True))
+    last_picked_at = Column(DateTime(timezone=True))
+    content_hash = Column(String(32))  # md5 of the ordered (id, score) list
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), onupdate=func.now())
+
+
+class DailyStats(Base):
+    """Per-day ranking statistics snapshot, refreshed when ranking touches the day."""
+    __tablename__ = "daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    kept_count = Column(Integer, nullable=False, default=0)
+    p0_count = Column(Integer, nullable=False, default=0)
+    p1_count = Column(Integer, nullable=False, default=0)
+    p2_count = Column(Integer, nullable=False, default=0)
+    p3_count = Column(Integer, nullable=False, default=0)
+    avg_score = Column(Float, nullable=False, default=0.0)
+    score_distribution = Column(JSONB)  # Bucket label -> count
+    top_urls = Column(JSONB)  # Ten highest-scoring URLs
+    computed_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), onupdate=func.now())
 
 
 class RunManifest(Base):
@@ -80,6 +229,27 @@ class RunManifest(Base):
     avg_score = Column(Float, nullable=False, default=0.0)
 
 
+class RunStageMetrics(Base):
+    """Performance metrics for one pipeline stage of a run."""
+    __tablename__ = "run_stage_metrics"
+    
+    id = Column(BigInteger, primary_key=True)
+    run_id = Column(PGUUID(as_uuid=True), index=True)  # Set once the run's manifest exists
+    run_date = Column(String(10), nullable=False, index=True)  # YYYY-MM-DD
+    stage = Column(String(20), nullable=False)  # 'ingest'|'filter'|'rank'|'generate'|'sitemaps'
+    source = Column(String(20))  # Ingest source ('ct'|'rss'|'cc')
+    wall_seconds = Column(Float, nullable=False, default=0.0)
+    cpu_seconds = Column(Float, nullable=False, default=0.0)
+    peak_rss_kb = Column(BigInteger, nullable=False, default=0)
+    rows_in = Column(BigInteger, nullable=False, default=0)
+    rows_out = Column(BigInteger, nullable=False, default=0)
+    rows_per_sec = Column(Float, nullable=False, default=0.0)
+    db_round_trips = Column(Integer, nullable=False, default=0)
+    http_requests = Column(Integer, nullable=False, default=0)
+    http_bytes = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+
+
 class Database:
     """Database connection manager."""
     
@@ -103,102 +273,404 @@ class Database:
             self.connect()
         return self.SessionLocal()
     
+    async def get_connection(self):
+        """Get a raw asyncpg connection (used for migrations)."""
+        # asyncpg only understands plain postgresql:// DSNs
+        dsn = re.sub(r'^postgres(ql)?\+\w+://', 'postgresql://', config.database_url)
+        return await asyncpg.connect(dsn)
+
+
+class AsyncDatabase:
+    """Async database connection manager (SQLAlchemy AsyncSession on asyncpg).
+    
+    Used by the ``async def`` paths so they await the database instead of
+    blocking the event loop. The engine's connections belong to the loop
+    that opened them; call dispose() before that loop closes.
+    """
+    
+    def __init__(self):
+        self.engine = None
+        self.SessionLocal = None
+    
+    def connect(self):
+        """Initialize the async engine."""
+        # Imported here so sync-only commands don't need greenlet
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        
+        self.engine = create_async_engine(
+            async_database_url(config.database_url),
+            echo=False,
+            pool_pre_ping=True,
+            pool_recycle=300,
+        )
+        self.SessionLocal = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+    
+    def get_session(self):
+        """Get an AsyncSession."""
+        if not self.SessionLocal:
+            self.connect()
+        return self.SessionLocal()
+    
+    async def dispose(self):
+        """Close pooled connections (before the event loop shuts down)."""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self.SessionLocal = None
+    
     async def create_tables(self):
         """Create all tables."""
         if not self.engine:
             self.connect()
-        Base.metadata.create_all(bind=self.engine)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     
     async def drop_tables(self):
         """Drop all tables."""
         if not self.engine:
             self.connect()
-        Base.metadata.drop_all(bind=self.engine)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
     
     async def get_stats(self) -> dict:
         """Get database statistics."""
         session = self.get_session()
         try:
             stats = {
-                "raw_count": session.query(DiscoveredRaw).count(),
-                "kept_count": session.query(DiscoveredKept).count(),
-                "runs_count": session.query(RunManifest).count(),
-                "latest_run": session.query(RunManifest).order_by(RunManifest.created_at.desc()).first(),
+                "raw_count": await session.scalar(select(func.count()).select_from(DiscoveredRaw)),
+                "kept_count": await session.scalar(select(func.count()).select_from(DiscoveredKept)),
+                "runs_count": await session.scalar(select(func.count()).select_from(RunManifest)),
+                "latest_run": await session.scalar(
+                    select(RunManifest).order_by(RunManifest.created_at.desc()).limit(1)
+                ),
             }
             return stats
         finally:
-            session.close()
+            await session.close()
 
 
-# Global database instance
+# Global database instances
 db = Database()
+async_db = AsyncDatabase()
+
+
+# Tables range-partitioned by month, and their partition keys
+PARTITIONED_TABLES = {
+    'discovered_raw': 'seen_at',
+    'discovered_kept': 'picked_at',
+}
+
+
+def partition_month(table: str, name: str) -> Optional[date]:
+    """First day of the month a partition named by month_partitions covers."""
+    match = re.fullmatch(rf"{table}_p(\d{{4}})_(\d{{2}})", name)
+    if match is None:
+        return None  # The default partition, or not one of ours
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month``."""
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+async def ensure_partitions(conn, table: str, key: str, months_ahead: int = None,
+                            source: str = None) -> List[str]:
+    """Create any missing monthly partitions, through months_ahead months from now.
+    
+    Partitions start at the month of the oldest row in ``source`` (default:
+    the table itself). A default partition catches rows outside every range,
+    so inserts never fail for lack of one; rows found there raise, since
+    Postgres cannot create a partition over them and they are never pruned.
+    """
+    if months_ahead is None:
+        months_ahead = config.partition_months_ahead
+    
+    default = f"{table}_default"
+    if await conn.fetchval("SELECT to_regclass($1)", default) is not None:
+        stray = await conn.fetchval(f"SELECT count(*) FROM {default}")
+        if stray:
+            raise RuntimeError(
+                f"{stray} rows in {default}; move them into monthly partitions of {table} "
+                f"(detach {default}, create the partitions, re-insert the rows)"
+            )
+    
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    oldest = await conn.fetchval(f"SELECT min({key}) FROM {source or table}")
+    first_month = min(utc_day(oldest), this_month) if oldest else this_month
+    
+    created = []
+    for name, start, end in month_partitions(table, first_month, add_months(this_month, months_ahead)):
+        if await conn.fetchval("SELECT to_regclass($1)", name) is not None:
+            continue
+        await conn.execute(f"""
+            CREATE TABLE {name} PARTITION OF {table}
+            FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')
+        """)
+        created.append(name)
+    
+    await conn.execute(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT")
+    return created
+
+
+async def partition_table(conn, table: str, key: str) -> bool:
+    """Convert a plain table from before partitioning into a partitioned one.
+    
+    Runs in one transaction: the old table is renamed, its rows copied into
+    monthly partitions and then dropped. Returns False if there is nothing
+    to convert.
+    """
+    relkind = await conn.fetchval("SELECT relkind FROM pg_class WHERE oid = to_regclass($1)", table)
+    if relkind != 'r':
+        return False  # Already partitioned ('p') or missing
+    
+    legacy = f"{table}_unpartitioned"
+    columns = await conn.fetch("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = $1 AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, table)
+    column_list = ', '.join(row['column_name'] for row in columns)
+    
+    async with conn.transaction():
+        await conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        await conn.execute(f"""
+            CREATE TABLE {table} (
+                LIKE {legacy} INCLUDING DEFAULTS INCLUDING GENERATED,
+                PRIMARY KEY (id, {key})
+            ) PARTITION BY RANGE ({key})
+        """)
+        await ensure_partitions(conn, table, key, source=legacy)
+        await conn.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {legacy}")
+        
+        # Keep the id sequence when the old table goes
+        sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", legacy)
+        if sequence:
+            await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        await conn.execute(f"DROP TABLE {legacy}")
+    return True
+
+
+async def create_partitions(months_ahead: int = None) -> List[str]:
+    """Create missing monthly partitions for every partitioned table."""
+    conn = await db.get_connection()
+    try:
+        created = []
+        for table, key in PARTITIONED_TABLES.items():
+            created.extend(await ensure_partitions(conn, table, key, months_ahead))
+        return created
+    finally:
+        await conn.close()
+
+
+async def detach_partitions(before_month: date, drop: bool = False) -> List[str]:
+    """Detach monthly partitions that end on or before ``before_month``.
+    
+    Detaching only changes the catalog, so retiring a month is O(1) rather
+    than a DELETE over its rows. Detached tables are left in place for
+    archiving unless ``drop`` is set.
+    """
+    before_month = before_month.replace(day=1)
+    conn = await db.get_connection()
+    detached = []
+    
+    try:
+        for table in PARTITIONED_TABLES:
+            rows = await conn.fetch("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass($1)
+                ORDER BY c.relname
+            """, table)
+            for row in rows:
+                month = partition_month(table, row['relname'])
+                if month is None or month >= before_month:
+                    continue
+                
+                await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {row['relname']}")
+                if drop:
+                    await conn.execute(f"DROP TABLE {row['relname']}")
+                detached.append(row['relname'])
+    finally:
+        await conn.close()
+    
+    return detached
 
 
 async def migrate_db():
     """Apply database migrations."""
-    await db.create_tables()
+    await async_db.create_tables()
     
-    # Add new columns if they don't exist (backward compatible)
+    conn = await db.get_connection()
     try:
-        conn = await db.get_connection()
-        await conn.execute("""
-            ALTER TABLE discovered_kept 
-            ADD COLUMN IF NOT EXISTS discovery_score REAL NOT NULL DEFAULT 0.0
-        """)
-        await conn.execute("""
-            ALTER TABLE discovered_kept 
-            ADD COLUMN IF NOT EXISTS priority_class SMALLINT NOT NULL DEFAULT 2
-        """)
-        await conn.execute("""
-            ALTER TABLE discovered_kept 
-            ADD COLUMN IF NOT EXISTS signals JSONB
-        """)
-        await conn.execute("""
-            ALTER TABLE discovered_kept 
-            ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMPTZ
-        """)
+        # Add new columns if they don't exist (backward compatible)
+        try:
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS discovery_score REAL NOT NULL DEFAULT 0.0
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS priority_class SMALLINT NOT NULL DEFAULT 2
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS signals JSONB
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMPTZ
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS recheck_count SMALLINT NOT NULL DEFAULT 0
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS needs_rank BOOLEAN NOT NULL DEFAULT TRUE
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS freshness_bucket SMALLINT
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS published_page INTEGER
+            """)
+            
+            # Sargable per-day columns (UTC calendar day)
+            await conn.execute("""
+                ALTER TABLE discovered_kept 
+                ADD COLUMN IF NOT EXISTS picked_date DATE
+                GENERATED ALWAYS AS ((picked_at AT TIME ZONE 'UTC')::date) STORED
+            """)
+            await conn.execute("""
+                ALTER TABLE discovered_raw 
+                ADD COLUMN IF NOT EXISTS seen_date DATE
+                GENERATED ALWAYS AS ((seen_at AT TIME ZONE 'UTC')::date) STORED
+            """)
+            
+            # Rows ranked before needs_rank existed carry signals; derive their
+            # freshness bucket from the stored freshness value
+            await conn.execute("""
+                UPDATE discovered_kept
+                SET needs_rank = FALSE,
+                    freshness_bucket = CASE (signals->>'freshness')::real
+                        WHEN 1.0 THEN 0 WHEN 0.9 THEN 1 WHEN 0.7 THEN 2
+                        WHEN 0.5 THEN 3 ELSE 4 END
+                WHERE needs_rank AND signals IS NOT NULL
+            """)
+            
+            # Add new columns to run_manifest
+            await conn.execute("""
+                ALTER TABLE run_manifest 
+                ADD COLUMN IF NOT EXISTS p0_count INTEGER NOT NULL DEFAULT 0
+            """)
+            await conn.execute("""
+                ALTER TABLE run_manifest 
+                ADD COLUMN IF NOT EXISTS p1_count INTEGER NOT NULL DEFAULT 0
+            """)
+            await conn.execute("""
+                ALTER TABLE run_manifest 
+                ADD COLUMN IF NOT EXISTS p2_count INTEGER NOT NULL DEFAULT 0
+            """)
+            await conn.execute("""
+                ALTER TABLE run_manifest 
+                ADD COLUMN IF NOT EXISTS p3_count INTEGER NOT NULL DEFAULT 0
+            """)
+            await conn.execute("""
+                ALTER TABLE run_manifest 
+                ADD COLUMN IF NOT EXISTS avg_score REAL NOT NULL DEFAULT 0.0
+            """)
+        except Exception as e:
+            print(f"Migration warning (may already exist): {e}")
         
-        # Add new columns to run_manifest
-        await conn.execute("""
-            ALTER TABLE run_manifest 
-            ADD COLUMN IF NOT EXISTS p0_count INTEGER NOT NULL DEFAULT 0
-        """)
-        await conn.execute("""
-            ALTER TABLE run_manifest 
-            ADD COLUMN IF NOT EXISTS p1_count INTEGER NOT NULL DEFAULT 0
-        """)
-        await conn.execute("""
-            ALTER TABLE run_manifest 
-            ADD COLUMN IF NOT EXISTS p2_count INTEGER NOT NULL DEFAULT 0
-        """)
-        await conn.execute("""
-            ALTER TABLE run_manifest 
-            ADD COLUMN IF NOT EXISTS p3_count INTEGER NOT NULL DEFAULT 0
-        """)
-        await conn.execute("""
-            ALTER TABLE run_manifest 
-            ADD COLUMN IF NOT EXISTS avg_score REAL NOT NULL DEFAULT 0.0
-        """)
+        # Monthly range partitions: convert tables created before partitioning,
+        # then keep partitions created ahead of incoming rows. Failures here
+        # propagate: a half-partitioned table must not pass as migrated
+        for table, key in PARTITIONED_TABLES.items():
+            if await partition_table(conn, table, key):
+                print(f"Partitioned {table} by month of {key}")
+            await ensure_partitions(conn, table, key)
+            
+            await conn.execute(f"DROP INDEX IF EXISTS ux_{table}_url_{key}")
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_url ON {table} (url)")
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_host ON {table} (host)")
         
-        # Create indexes for performance
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_discovered_kept_priority_picked 
-            ON discovered_kept (priority_class, picked_at)
-        """)
-        await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_discovered_kept_next_check 
-            ON discovered_kept (next_check_at)
-        """)
+        # Fill discovered_url once (it starts empty), keeping each URL's
+        # earliest row and dropping duplicates left from before it existed
+        if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM discovered_url)"):
+            for table, key in PARTITIONED_TABLES.items():
+                await conn.execute(f"""
+                    DELETE FROM {table} a USING {table} b
+                    WHERE a.url = b.url AND (a.{key}, a.id) > (b.{key}, b.id)
+                """)
+            await conn.execute("""
+                INSERT INTO discovered_url (url, seen_at)
+                SELECT url, seen_at FROM discovered_raw
+            """)
+            await conn.execute("""
+                INSERT INTO discovered_url (url, seen_at, picked_at)
+                SELECT url, picked_at, picked_at FROM discovered_kept
+                ON CONFLICT (url) DO UPDATE SET picked_at = EXCLUDED.picked_at
+            """)
+            print("Backfilled discovered_url")
         
+        try:
+            # Create indexes for performance
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS ix_discovered_raw_seen_at 
+                ON discovered_raw (seen_at)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_priority_picked 
+                ON discovered_kept (priority_class, picked_at)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_next_check 
+                ON discovered_kept (next_check_at)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_picked_date 
+                ON discovered_kept (picked_date, priority_class, discovery_score DESC)
+                INCLUDE (novelty_score, parking_score)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_raw_seen_date 
+                ON discovered_raw (seen_date, source)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_publishable 
+                ON discovered_kept (discovery_score DESC, id) WHERE priority_class IN (0, 1)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_needs_rank 
+                ON discovered_kept (id) WHERE needs_rank
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_freshness_decay 
+                ON discovered_kept (picked_at) WHERE NOT needs_rank AND freshness_bucket < 4
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_page_seek 
+                ON discovered_kept (picked_date, (-discovery_score), (-novelty_score), parking_score, id)
+                WHERE priority_class IN (0, 1)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_discovered_kept_published_page 
+                ON discovered_kept (picked_date, published_page)
+            """)
+        except Exception as e:
+            print(f"Migration warning (may already exist): {e}")
+    finally:
         await conn.close()
-        print("Database migrations applied successfully")
-    except Exception as e:
-        print(f"Migration warning (may already exist): {e}")
-        print("Database migrations applied successfully")
+    print("Database migrations applied successfully")
 
 
 async def reset_db():
     """Reset database (drop and recreate all tables)."""
-    await db.drop_tables()
-    await db.create_tables()
+    await async_db.drop_tables()
+    await async_db.create_tables()
+    await create_partitions()
     print("Database reset successfully")
@@ -7,7 +7,9 @@ from typing import List, Set, Dict, Any
 from urllib.parse import urlparse
 
 from ..config import config
-from ..db import db, DiscoveredRaw
+from ..db import db, claim_raw_url, DiscoveredRaw
+from ..pipeline.metrics import add_rows, http_trace_config
+from ..pipeline.tracing import current_span, traced
 
 
 class CommonCrawlIngester:
@@ -21,7 +23,8 @@ class CommonCrawlIngester:
         """Async context manager entry."""
         self.session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=60),
-            connector=aiohttp.TCPConnector(limit=10)
+            connector=aiohttp.TCPConnector(limit=10),
+            trace_configs=[http_trace_config()]
         )
         return self
     
@@ -30,6 +33,7 @@ class CommonCrawlIngester:
         if self.session:
             await self.session.close()
     
+    @traced("cc.get_latest_crawls")
     async def get_latest_crawls(self, count: int = 3) -> List[str]:
         """Get the latest N crawl IDs from Common Crawl."""
         try:
@@ -61,6 +65,7 @@ class CommonCrawlIngester:
             print(f"Error fetching CC crawl list: {e}")
             return []
     
+    @traced("cc.query_crawl_index")
     async def query_crawl_index(self, crawl_id: str, limit: int = 10000) -> List[Dict[str, Any]]:
         """Query a specific crawl index for URLs."""
         urls = []
@@ -155,6 +160,7 @@ class CommonCrawlIngester:
         except Exception:
             return ""
     
+    @traced("cc.ingest")
     async def ingest(self, limit: int = None) -> int:
         """Ingest URLs from Common Crawl."""
         if limit is None:
@@ -194,11 +200,6 @@ class CommonCrawlIngester:
                 if not normalized_url:
                     continue
                 
-                # Check if URL already exists
-                existing = session.query(DiscoveredRaw).filter(DiscoveredRaw.url == normalized_url).first()
-                if existing:
-                    continue
-                
                 # Extract host and TLD
                 try:
                     parsed = urlparse(normalized_url)
@@ -207,12 +208,18 @@ class CommonCrawlIngester:
                 except Exception:
                     continue
                 
+                # Claim the URL; skip it if any run already ingested it
+                seen_at = claim_raw_url(session, normalized_url)
+                if seen_at is None:
+                    continue
+                
                 # Insert new record
                 record = DiscoveredRaw(
                     url=normalized_url,
                     host=host,
                     tld=tld,
-                    source="cc"
+                    source="cc",
+                    seen_at=seen_at
                 )
                 session.add(record)
                 inserted_count += 1
@@ -232,6 +239,8 @@ class CommonCrawlIngester:
         finally:
             session.close()
         
+        add_rows(rows_in=len(all_urls), rows_out=inserted_count)
+        current_span().set(rows_in=len(all_urls), rows_out=inserted_count)
         return inserted_count
 
 
@@ -7,7 +7,9 @@ from typing import List, Set
 from urllib.parse import urlparse, urljoin
 
 from ..config import config
-from ..db import db, DiscoveredRaw
+from ..db import db, claim_raw_url, DiscoveredRaw
+from ..pipeline.metrics import add_rows, http_trace_config
+from ..pipeline.tracing import current_span, traced
 
 
 class CTIngester:
@@ -21,7 +23,8 @@ class CTIngester:
         """Async context manager entry."""
         self.session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=30),
-            connector=aiohttp.TCPConnector(limit=10)
+            connector=aiohttp.TCPConnector(limit=10),
+            trace_configs=[http_trace_config()]
         )
         return self
     
@@ -30,6 +33,7 @@ class CTIngester:
         if self.session:
             await self.session.close()
     
+    @traced("ct.fetch_domains")
     async def fetch_domains(self, hours_back: int = 24) -> List[str]:
         """Fetch domains from CT logs for the last N hours."""
         # Calculate timestamp for N hours ago
@@ -101,6 +105,7 @@ class CTIngester:
         
         return ""
     
+    @traced("ct.ingest")
     async def ingest(self, hours_back: int = None) -> int:
         """Ingest domains from CT logs."""
         if hours_back is None:
@@ -123,11 +128,6 @@ class CTIngester:
                 if not url:
                     continue
                 
-                # Check if URL already exists
-                existing = session.query(DiscoveredRaw).filter(DiscoveredRaw.url == url).first()
-                if existing:
-                    continue
-                
                 # Extract host and TLD
                 try:
                     parsed = urlparse(url)
@@ -136,12 +136,18 @@ class CTIngester:
                 except Exception:
                     continue
                 
+                # Claim the URL; skip it if any run already ingested it
+                seen_at = claim_raw_url(session, url)
+                if seen_at is None:
+                    continue
+                
                 # Insert new record
                 record = DiscoveredRaw(
                     url=url,
                     host=host,
                     tld=tld,
-                    source="ct"
+                    source="ct",
+                    seen_at=seen_at
                 )
                 session.add(record)
                 inserted_count += 1
@@ -161,6 +167,8 @@ class CTIngester:
         finally:
             session.close()
         
+        add_rows(rows_in=len(domains), rows_out=inserted_count)
+        current_span().set(rows_in=len(domains), rows_out=inserted_count)
         return inserted_count
 
 
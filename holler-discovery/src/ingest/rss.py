@@ -8,7 +8,9 @@ from urllib.parse import urlparse, urljoin
 from pathlib import Path
 
 from ..config import config
-from ..db import db, DiscoveredRaw
+from ..db import db, claim_raw_url, DiscoveredRaw
+from ..pipeline.metrics import add_rows, http_trace_config
+from ..pipeline.tracing import current_span, span, traced
 
 
 class RSSIngester:
@@ -21,7 +23,8 @@ class RSSIngester:
         """Async context manager entry."""
         self.session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=30),
-            connector=aiohttp.TCPConnector(limit=10)
+            connector=aiohttp.TCPConnector(limit=10),
+            trace_configs=[http_trace_config()]
         )
         return self
     
@@ -107,6 +110,7 @@ class RSSIngester:
         except Exception:
             return ""
     
+    @traced("rss.ingest")
     async def ingest(self, feeds_path: str = None) -> int:
         """Ingest URLs from RSS feeds."""
         feeds = self.load_feeds(feeds_path)
@@ -119,7 +123,8 @@ class RSSIngester:
         
         # Fetch all feeds concurrently
         tasks = [self.fetch_feed(feed_url) for feed_url in feeds]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        with span("rss.fetch_feeds", feeds=len(feeds)):
+            results = await asyncio.gather(*tasks, return_exceptions=True)
         
         for result in results:
             if isinstance(result, list):
@@ -141,11 +146,6 @@ class RSSIngester:
                 if not normalized_url:
                     continue
                 
-                # Check if URL already exists
-                existing = session.query(DiscoveredRaw).filter(DiscoveredRaw.url == normalized_url).first()
-                if existing:
-                    continue
-                
                 # Extract host and TLD
                 try:
                     parsed = urlparse(normalized_url)
@@ -154,12 +154,18 @@ class RSSIngester:
                 except Exception:
                     continue
                 
+                # Claim the URL; skip it if any run already ingested it
+                seen_at = claim_raw_url(session, normalized_url)
+                if seen_at is None:
+                    continue
+                
                 # Insert new record
                 record = DiscoveredRaw(
                     url=normalized_url,
                     host=host,
                     tld=tld,
-                    source="rss"
+                    source="rss",
+                    seen_at=seen_at
                 )
                 session.add(record)
                 inserted_count += 1
@@ -179,6 +185,8 @@ class RSSIngester:
         finally:
             session.close()
         
+        add_rows(rows_in=len(all_urls), rows_out=inserted_count)
+        current_span().set(rows_in=len(all_urls), rows_out=inserted_count)
         return inserted_count
 
 
@@ -1,12 +1,32 @@
 """URL chunking and pagination utilities."""
 
 import math
-from typing import List, Dict, Any, Iterator
+from itertools import groupby
+from typing import List, Dict, Any, Iterator, Tuple
 from collections import defaultdict
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, or_, tuple_, update
 
 from ..config import config
-from ..db import db, DiscoveredKept
+from ..db import db, as_date, utc_day_range, DiscoveredKept, DiscoveryPageKey
+from .day_summary import DaySummaryManager
+from .tracing import current_span, traced
+
+# Page order; ``id`` breaks ties so every URL has a stable position
+PAGE_ORDER = (
+    DiscoveredKept.discovery_score.desc(),
+    DiscoveredKept.novelty_score.desc(),
+    DiscoveredKept.parking_score.asc(),
+    DiscoveredKept.id.asc(),
+)
+
+# PAGE_ORDER as all-ascending keys, so a seek is one row-value comparison
+# (served by idx_discovered_kept_page_seek)
+PAGE_SEEK = (
+    -DiscoveredKept.discovery_score,
+    -DiscoveredKept.novelty_score,
+    DiscoveredKept.parking_score,
+    DiscoveredKept.id,
+)
 
 
 class URLChunker:
@@ -14,47 +34,331 @@ class URLChunker:
     
     def __init__(self, links_per_page: int = None):
         self.links_per_page = links_per_page or config.links_per_page
+        
+        # Ordered URL lists per (date, min_score), so paging a day costs one query
+        self._urls_by_date: Dict[Tuple[str, float], List[Dict[str, Any]]] = {}
     
+    def clear_cache(self, date_str: str = None) -> None:
+        """Drop memoized URL lists for one date, or for all dates."""
+        if date_str is None:
+            self._urls_by_date.clear()
+        else:
+            for key in [key for key in self._urls_by_date if key[0] == date_str]:
+                del self._urls_by_date[key]
+    
+    @traced('chunker.urls_for_date')
     def get_urls_for_date(self, date_str: str, min_score: float = None) -> List[Dict[str, Any]]:
-        """Get URLs picked on a specific date, optionally filtered by score."""
+        """Get URLs picked on a specific date, optionally filtered by score.
+        
+        Results are memoized per date and score threshold; call clear_cache()
+        to pick up rows written since the first call.
+        """
         if min_score is None:
             min_score = config.min_publish_score
         
+        cache_key = (date_str, min_score)
+        if cache_key in self._urls_by_date:
+            return self._urls_by_date[cache_key]
+        
         session = db.get_session()
         
         try:
             # Query URLs picked on the given date, only P0/P1 (priority_class 0,1)
             # and above minimum score
             records = session.query(DiscoveredKept).filter(
-                func.date(DiscoveredKept.picked_at) == date_str,
-                DiscoveredKept.discovery_score >= min_score,
-                DiscoveredKept.priority_class.in_([0, 1])  # P0 and P1 only
-            ).order_by(
-                DiscoveredKept.discovery_score.desc(),  # Order by discovery score
-                DiscoveredKept.novelty_score.desc(),
-                DiscoveredKept.parking_score.asc()
-            ).all()
+                *self._publishable_filter(date_str, min_score)
+            ).order_by(*PAGE_ORDER).all()
             
             # Convert to dict format
-            urls = []
-            for record in records:
-                urls.append({
-                    'url': record.url,
-                    'host': record.host,
-                    'tld': record.tld,
-                    'parking_score': record.parking_score,
-                    'novelty_score': record.novelty_score,
-                    'discovery_score': record.discovery_score,
-                    'priority_class': record.priority_class,
-                    'signals': record.signals or {},
-                    'picked_at': record.picked_at
-                })
+            urls = [self._record_to_dict(record) for record in records]
+            current_span().set(date=date_str, rows=len(urls))
             
+            self._urls_by_date[cache_key] = urls
             return urls
             
         finally:
             session.close()
     
+    def set_urls_for_date(self, date_str: str, urls: List[Dict[str, Any]],
+                          min_score: float = None) -> None:
+        """Seed the memoized URL list for a date fetched elsewhere."""
+        if min_score is None:
+            min_score = config.min_publish_score
+        self._urls_by_date[(date_str, min_score)] = urls
+    
+    def iter_urls_by_date(self, start_date: str, end_date: str, min_score: float = None,
+                          batch_size: int = 1000) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yield (date, ordered publishable URLs) for each date in a range.
+        
+        One query streams every date's rows in (picked_date, PAGE_ORDER)
+        order, so a backfill holds a single day in memory at a time.
+        """
+        if min_score is None:
+            min_score = config.min_publish_score
+        
+        session = db.get_session()
+        
+        try:
+            query = session.query(DiscoveredKept).filter(
+                DiscoveredKept.picked_date.between(as_date(start_date), as_date(end_date)),
+                *utc_day_range(DiscoveredKept.picked_at, start_date, end_date),
+                DiscoveredKept.discovery_score >= min_score,
+                DiscoveredKept.priority_class.in_([0, 1])  # P0 and P1 only
+            ).order_by(DiscoveredKept.picked_date, *PAGE_ORDER)
+            
+            for picked_date, records in groupby(query.yield_per(batch_size),
+                                                key=lambda record: record.picked_date):
+                yield picked_date.strftime('%Y-%m-%d'), [self._record_to_dict(record) for record in records]
+        finally:
+            session.close()
+    
+    def _publishable_filter(self, date_str: str, min_score: float) -> list:
+        """Filter clauses selecting a date's publishable URLs."""
+        return [
+            DiscoveredKept.picked_date == as_date(date_str),
+            *utc_day_range(DiscoveredKept.picked_at, date_str),  # Prunes to the date's partition
+            DiscoveredKept.discovery_score >= min_score,
+            DiscoveredKept.priority_class.in_([0, 1]),  # P0 and P1 only
+        ]
+    
+    def _record_to_dict(self, record) -> Dict[str, Any]:
+        """Convert a discovered_kept row to the dict format used by templates."""
+        return {
+            'id': record.id,
+            'url': record.url,
+            'host': record.host,
+            'tld': record.tld,
+            'parking_score': record.parking_score,
+            'novelty_score': record.novelty_score,
+            'discovery_score': record.discovery_score,
+            'priority_class': record.priority_class,
+            'signals': record.signals or {},
+            'picked_at': record.picked_at,
+            'published_page': record.published_page
+        }
+    
+    def get_page_keys(self, urls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Seek keys for pages 2..N: the sort key of the last URL on the previous page."""
+        keys = []
+        for page_num in range(2, self.get_page_count(len(urls)) + 1):
+            last = urls[(page_num - 1) * self.links_per_page - 1]
+            keys.append({
+                'page_num': page_num,
+                'discovery_score': last['discovery_score'],
+                'novelty_score': last['novelty_score'],
+                'parking_score': last['parking_score'],
+                'last_id': last['id'],
+            })
+        return keys
+    
+    @traced('chunker.save_page_keys')
+    def save_page_keys(self, date_str: str, urls: List[Dict[str, Any]]) -> None:
+        """Replace the stored page seek keys for a date (no writes if they are unchanged)."""
+        keys = self.get_page_keys(urls)
+        session = db.get_session()
+        
+        try:
+            stored = session.query(
+                DiscoveryPageKey.page_num,
+                DiscoveryPageKey.discovery_score,
+                DiscoveryPageKey.novelty_score,
+                DiscoveryPageKey.parking_score,
+                DiscoveryPageKey.last_id,
+                DiscoveryPageKey.links_per_page,
+            ).filter(
+                DiscoveryPageKey.picked_date == date_str
+            ).order_by(DiscoveryPageKey.page_num).all()
+            if [row._asdict() for row in stored] == [
+                dict(key, links_per_page=self.links_per_page) for key in keys
+            ]:
+                return
+            
+            session.query(DiscoveryPageKey).filter(
+                DiscoveryPageKey.picked_date == date_str
+            ).delete(synchronize_session=False)
+            
+            for key in keys:
+                session.add(DiscoveryPageKey(
+                    picked_date=date_str,
+                    links_per_page=self.links_per_page,
+                    **key
+                ))
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error saving page keys for {date_str}: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_page(self, date_str: str, page_num: int) -> List[Dict[str, Any]]:
+        """Fetch a single page of a date's publishable URLs.
+        
+        Once the date is published, pages are read by ``published_page`` so
+        appended URLs are found where they were placed. Otherwise the stored
+        seek key for the page makes it one index range scan of
+        ``links_per_page`` rows; without a key for this page size it falls
+        back to OFFSET.
+        """
+        if page_num < 1:
+            raise ValueError(f"Invalid page number {page_num}")
+        
+        session = db.get_session()
+        
+        try:
+            publishable = self._publishable_filter(date_str, config.min_publish_score)
+            published = session.query(
+                session.query(DiscoveredKept.id).filter(
+                    *publishable, DiscoveredKept.published_page.isnot(None)
+                ).exists()
+            ).scalar()
+            
+            if published:
+                records = session.query(DiscoveredKept).filter(
+                    *publishable, DiscoveredKept.published_page == page_num
+                ).order_by(*PAGE_ORDER).all()
+                return [self._record_to_dict(record) for record in records]
+            
+            query = session.query(DiscoveredKept).filter(*publishable).order_by(*PAGE_SEEK)
+            
+            if page_num > 1:
+                key = session.query(DiscoveryPageKey).filter(
+                    DiscoveryPageKey.picked_date == date_str,
+                    DiscoveryPageKey.page_num == page_num,
+                    DiscoveryPageKey.links_per_page == self.links_per_page
+                ).first()
+                
+                if key is not None:
+                    query = query.filter(self._after_key(key))
+                else:
+                    query = query.offset((page_num - 1) * self.links_per_page)
+            
+            records = query.limit(self.links_per_page).all()
+            return [self._record_to_dict(record) for record in records]
+            
+        finally:
+            session.close()
+    
+    def _after_key(self, key: DiscoveryPageKey):
+        """Rows strictly after ``key`` in PAGE_ORDER."""
+        return tuple_(*PAGE_SEEK) > tuple_(
+            -key.discovery_score, -key.novelty_score, key.parking_score, key.last_id
+        )
+    
+    @traced('chunker.assign_pages')
+    def assign_pages(self, date_str: str, assignments: Dict[int, int], reset: bool = False) -> None:
+        """Record the page each URL id is published on.
+        
+        With ``reset`` (a full regeneration of the day) rows of the date that
+        are no longer publishable also lose their page, so they are placed
+        afresh if they come back.
+        """
+        session = db.get_session()
+        
+        try:
+            if reset:
+                dropped = session.query(DiscoveredKept).filter(
+                    DiscoveredKept.picked_date == as_date(date_str),
+                    *utc_day_range(DiscoveredKept.picked_at, date_str),
+                    DiscoveredKept.published_page.isnot(None),
+                    or_(DiscoveredKept.discovery_score < config.min_publish_score,
+                        DiscoveredKept.priority_class.notin_([0, 1]))
+                )
+                if session.query(dropped.exists()).scalar():
+                    dropped.update({'published_page': None}, synchronize_session=False)
+            
+            if assignments:
+                # By id within the day's partition; ORM bulk updates would need picked_at too
+                session.execute(
+                    update(DiscoveredKept.__table__).where(
+                        DiscoveredKept.id == bindparam('url_id'),
+                        *utc_day_range(DiscoveredKept.picked_at, date_str)
+                    ).values(published_page=bindparam('page_num')),
+                    [{'url_id': url_id, 'page_num': page_num} for url_id, page_num in assignments.items()]
+                )
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error assigning pages for {date_str}: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def page_moves(self, urls: List[Dict[str, Any]]) -> Dict[int, int]:
+        """Page of each URL in a full day's ordered list, for URLs not already on it."""
+        moves = {}
+        for index, url_data in enumerate(urls):
+            page_num = index // self.links_per_page + 1
+            if url_data.get('published_page') != page_num:
+                moves[url_data['id']] = page_num
+        return moves
+    
+    def get_published_page_counts(self, date_str: str) -> Dict[int, int]:
+        """Publishable URL count on each already-assigned page of a date."""
+        session = db.get_session()
+        
+        try:
+            rows = session.query(
+                DiscoveredKept.published_page, func.count(DiscoveredKept.id)
+            ).filter(
+                *self._publishable_filter(date_str, config.min_publish_score),
+                DiscoveredKept.published_page.isnot(None)
+            ).group_by(DiscoveredKept.published_page).all()
+            
+            return {page_num: count for page_num, count in rows}
+            
+        finally:
+            session.close()
+    
+    @traced('chunker.unpublished_urls')
+    def get_unpublished_urls(self, date_str: str) -> List[Dict[str, Any]]:
+        """Publishable URLs of a date that have no page yet, in page order."""
+        session = db.get_session()
+        
+        try:
+            records = session.query(DiscoveredKept).filter(
+                *self._publishable_filter(date_str, config.min_publish_score),
+                DiscoveredKept.published_page.is_(None)
+            ).order_by(*PAGE_ORDER).all()
+            
+            return [self._record_to_dict(record) for record in records]
+            
+        finally:
+            session.close()
+    
+    def get_published_page(self, date_str: str, page_num: int) -> List[Dict[str, Any]]:
+        """URLs assigned to one page of a date, in page order."""
+        session = db.get_session()
+        
+        try:
+            records = session.query(DiscoveredKept).filter(
+                *self._publishable_filter(date_str, config.min_publish_score),
+                DiscoveredKept.published_page == page_num
+            ).order_by(*PAGE_ORDER).all()
+            
+            return [self._record_to_dict(record) for record in records]
+            
+        finally:
+            session.close()
+    
+    def append_assignments(self, page_counts: Dict[int, int],
+                           new_urls: List[Dict[str, Any]]) -> Dict[int, int]:
+        """Place new URLs after the published ones: top up the last page, then open new pages."""
+        assignments = {}
+        page_num = max(page_counts) if page_counts else 1
+        filled = page_counts.get(page_num, 0)
+        
+        for url_data in new_urls:
+            if filled >= self.links_per_page:
+                page_num += 1
+                filled = 0
+            assignments[url_data['id']] = page_num
+            filled += 1
+        
+        return assignments
+    
     def chunk_urls(self, urls: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
         """Chunk URLs into pages."""
         for i in range(0, len(urls), self.links_per_page):
@@ -111,8 +415,18 @@ class URLChunker:
             'total_urls': url_count
         }
     
-    def get_day_navigation(self, date_str: str) -> Dict[str, Any]:
-        """Get navigation info for day index."""
+    def get_day_counts(self, dates: List) -> Dict[str, int]:
+        """Publishable URL counts per date from the discovery_day summary."""
+        return DaySummaryManager(self.links_per_page).get_day_counts(dates)
+    
+    @traced('chunker.day_navigation')
+    def get_day_navigation(self, date_str: str, url_count: int = None,
+                           total_pages: int = None) -> Dict[str, Any]:
+        """Get navigation info for day index.
+        
+        Callers that already know the day's totals pass them in to skip
+        loading the day's URLs.
+        """
         from datetime import datetime, timedelta
         
         # Parse date
@@ -122,17 +436,19 @@ class URLChunker:
             return {'error': 'Invalid date format'}
         
         # Get URLs for this date
-        urls = self.get_urls_for_date(date_str)
-        url_count = len(urls)
-        total_pages = self.get_page_count(url_count)
+        if url_count is None:
+            url_count = len(self.get_urls_for_date(date_str))
+        if total_pages is None:
+            total_pages = self.get_page_count(url_count)
         
         # Check for previous/next days
         prev_date = current_date - timedelta(days=1)
         next_date = current_date + timedelta(days=1)
         
-        # Check if previous/next days have data
-        has_prev_day = self.get_urls_for_date(prev_date.strftime('%Y-%m-%d'))
-        has_next_day = self.get_urls_for_date(next_date.strftime('%Y-%m-%d'))
+        # Check if previous/next days have data (from the day summary)
+        day_counts = self.get_day_counts([prev_date, next_date])
+        has_prev_day = day_counts[prev_date.strftime('%Y-%m-%d')] > 0
+        has_next_day = day_counts[next_date.strftime('%Y-%m-%d')] > 0
         
         return {
             'date': date_str,
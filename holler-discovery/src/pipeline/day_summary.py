@@ -0,0 +1,166 @@
+"""Per-day discovery summary maintenance."""
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+
+from ..config import config
+from ..db import db, as_date, utc_day_range, DiscoveredKept, DiscoveryDay
+
+
+class DaySummaryManager:
+    """Maintains the discovery_day summary table.
+    
+    Each row holds a day's publishable count, page count, first/last
+    picked_at and a content hash, so navigation, sitemaps and stats can
+    read one small table instead of scanning discovered_kept.
+    """
+    
+    def __init__(self, links_per_page: int = None, min_score: float = None):
+        self.links_per_page = links_per_page or config.links_per_page
+        self.min_score = float(config.min_publish_score if min_score is None else min_score)
+    
+    def _publishable(self):
+        """Condition for a URL to be published: P0/P1 at or above min_score."""
+        return and_(
+            DiscoveredKept.discovery_score >= self.min_score,
+            DiscoveredKept.priority_class.in_([0, 1])  # P0 and P1 only
+        )
+    
+    def _page_columns(self):
+        """Publishable count and page count aggregates for a day.
+        
+        Published pages stay on disk (``generate --append`` never renumbers
+        them) even after their URLs fall below the threshold, so a published
+        day's page count is its highest published_page.
+        """
+        publishable_count = func.count(DiscoveredKept.id).filter(self._publishable())
+        page_count = func.coalesce(
+            func.max(DiscoveredKept.published_page),
+            (publishable_count + self.links_per_page - 1) // self.links_per_page
+        )
+        return publishable_count, page_count
+    
+    def _summary_select(self):
+        """Aggregate publishable rows by picked_date."""
+        publishable = self._publishable()
+        publishable_count, page_count = self._page_columns()
+        content = func.string_agg(
+            func.concat(DiscoveredKept.id, ':', DiscoveredKept.discovery_score),
+            aggregate_order_by(
+                literal(','),
+                DiscoveredKept.discovery_score.desc(),
+                DiscoveredKept.novelty_score.desc(),
+                DiscoveredKept.parking_score.asc(),
+                DiscoveredKept.id.asc()
+            )
+        ).filter(publishable)
+        
+        # Every row of the day is read (published_page survives on rows that
+        # dropped out); the other aggregates only count publishable ones
+        return select(
+            DiscoveredKept.picked_date,
+            publishable_count,
+            page_count,
+            literal(self.links_per_page),
+            func.min(DiscoveredKept.picked_at).filter(publishable),
+            func.max(DiscoveredKept.picked_at).filter(publishable),
+            func.md5(content),
+        ).group_by(DiscoveredKept.picked_date).having(publishable_count > 0)
+    
+    def refresh_days(self, days: Optional[Iterable] = None) -> int:
+        """Recompute summary rows for the given days (all days if None)."""
+        if days is not None:
+            days = sorted({as_date(day) for day in days})
+            if not days:
+                return 0
+        
+        summary = self._summary_select()
+        if days is not None:
+            summary = summary.where(
+                DiscoveredKept.picked_date.in_(days),
+                *utc_day_range(DiscoveredKept.picked_at, days[0], days[-1])
+            )
+        
+        stmt = insert(DiscoveryDay).from_select([
+            'day', 'publishable_count', 'page_count', 'links_per_page',
+            'first_picked_at', 'last_picked_at', 'content_hash',
+        ], summary)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DiscoveryDay.day],
+            set_={
+                'publishable_count': stmt.excluded.publishable_count,
+                'page_count': stmt.excluded.page_count,
+                'links_per_page': stmt.excluded.links_per_page,
+                'first_picked_at': stmt.excluded.first_picked_at,
+                'last_picked_at': stmt.excluded.last_picked_at,
+                'content_hash': stmt.excluded.content_hash,
+                'updated_at': func.now(),
+            }
+        )
+        
+        session = db.get_session()
+        
+        try:
+            # Days that no longer have publishable URLs are not produced by the
+            # aggregate, so empty them first
+            emptied = session.query(DiscoveryDay)
+            if days is not None:
+                emptied = emptied.filter(DiscoveryDay.day.in_(days))
+            emptied.update({
+                'publishable_count': 0,
+                'page_count': 0,
+                'content_hash': None,
+            }, synchronize_session=False)
+            
+            session.execute(stmt)
+            session.commit()
+            
+            refreshed = len(days) if days is not None else session.query(DiscoveryDay).count()
+            print(f"Refreshed discovery day summary for {refreshed} days")
+            return refreshed
+            
+        except Exception as e:
+            session.rollback()
+            print(f"Error refreshing discovery day summary: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_day_counts(self, days: Iterable) -> Dict[str, int]:
+        """Publishable counts for the given days (missing days count as 0)."""
+        days = [as_date(day) for day in days]
+        
+        session = db.get_session()
+        
+        try:
+            rows = session.query(
+                DiscoveryDay.day, DiscoveryDay.publishable_count
+            ).filter(DiscoveryDay.day.in_(days)).all()
+            
+            counts = {day.strftime('%Y-%m-%d'): 0 for day in days}
+            for day, count in rows:
+                counts[day.strftime('%Y-%m-%d')] = count
+            return counts
+            
+        finally:
+            session.close()
+    
+    def get_published_days(self, days: Optional[Iterable] = None):
+        """Days with publishable URLs (all of them, or only ``days``), newest first."""
+        session = db.get_session()
+        
+        try:
+            query = session.query(DiscoveryDay).filter(DiscoveryDay.publishable_count > 0)
+            if days is not None:
+                query = query.filter(DiscoveryDay.day.in_([as_date(day) for day in days]))
+            return query.order_by(DiscoveryDay.day.desc()).all()
+        finally:
+            session.close()
+
+
+def refresh_day_summaries(days: Optional[Iterable] = None) -> int:
+    """Convenience function to refresh the discovery_day summary table."""
+    manager = DaySummaryManager()
+    return manager.refresh_days(days)
@@ -5,8 +5,10 @@ from collections import defaultdict
 from sqlalchemy import func
 
 from ..config import config
-from ..db import db, DiscoveredRaw, DiscoveredKept
+from ..db import db, claim_kept_url, DiscoveredRaw, DiscoveredKept
 from ..ingest.normalize import URLNormalizer
+from .metrics import add_rows
+from .tracing import span, traced
 
 
 class URLFilter:
@@ -114,26 +116,31 @@ class URLFilter:
         
         # Calculate scores
         print("Calculating parking and novelty scores...")
-        scored_urls = self.calculate_scores(urls)
+        with span('filter.scores', rows=len(urls)):
+            scored_urls = self.calculate_scores(urls)
         
         # Apply host caps
         print(f"Applying host caps (max {host_cap or config.host_cap} per host)...")
-        capped_urls = self.apply_host_caps(scored_urls, host_cap)
+        with span('filter.host_caps', rows=len(scored_urls)):
+            capped_urls = self.apply_host_caps(scored_urls, host_cap)
         print(f"After host capping: {len(capped_urls)} URLs")
         
         # Filter by thresholds
         print(f"Filtering by thresholds (parking < {config.parking_threshold}, novelty >= {config.novelty_threshold})...")
-        filtered_urls = self.filter_urls(capped_urls)
+        with span('filter.thresholds', rows=len(capped_urls)):
+            filtered_urls = self.filter_urls(capped_urls)
         print(f"After filtering: {len(filtered_urls)} URLs")
         
         # Deduplicate
         print("Deduplicating URLs...")
-        deduplicated_urls = self.deduplicate_urls(filtered_urls)
+        with span('filter.dedupe', rows=len(filtered_urls)):
+            deduplicated_urls = self.deduplicate_urls(filtered_urls)
         print(f"After deduplication: {len(deduplicated_urls)} URLs")
         
         return deduplicated_urls
 
 
+@traced('filter.run')
 def filter_raw_urls(host_cap: int = None) -> int:
     """Filter raw URLs and move good ones to discovered_kept table."""
     session = db.get_session()
@@ -158,23 +165,24 @@ def filter_raw_urls(host_cap: int = None) -> int:
         # Insert good URLs into discovered_kept
         inserted_count = 0
         for url, scores in processed_urls.items():
-            # Check if already exists in kept table
-            existing = session.query(DiscoveredKept).filter(DiscoveredKept.url == url).first()
-            if existing:
-                continue
-            
             # Get the original record for host/tld info
             original = next((r for r in raw_urls if r.url == url), None)
             if not original:
                 continue
             
+            # Claim the URL; skip it if it was already kept
+            picked_at = claim_kept_url(session, url)
+            if picked_at is None:
+                continue
+            
             # Create new kept record
             kept_record = DiscoveredKept(
                 url=url,
                 host=original.host,
                 tld=original.tld,
                 parking_score=scores['parking_score'],
-                novelty_score=scores['novelty_score']
+                novelty_score=scores['novelty_score'],
+                picked_at=picked_at
             )
             session.add(kept_record)
             inserted_count += 1
@@ -187,6 +195,7 @@ def filter_raw_urls(host_cap: int = None) -> int:
         session.commit()
         print(f"Filtering complete: {inserted_count} URLs moved to discovered_kept")
         
+        add_rows(rows_in=len(raw_urls), rows_out=inserted_count)
         return inserted_count
         
     except Exception as e:
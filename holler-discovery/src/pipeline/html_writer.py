@@ -1,34 +1,147 @@
 """HTML generation for discovery pages."""
 
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import List, Dict, Any, Sequence, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
 from ..config import config
 from .chunker import URLChunker
+from .day_summary import DaySummaryManager
+from .metrics import add_rows
+from .tracing import current_span, traced
+from .stream_writer import atomic_write, write_stream
+
+
+TEMPLATES = ['discovery_page.html.j2', 'day_index.html.j2']
+
+# Render manifest kept in the output root
+MANIFEST_NAME = '.render-manifest.json'
+
+
+def build_environment(template_dir: Path) -> Environment:
+    """Create a Jinja2 environment backed by the shared bytecode cache."""
+    cache_dir = config.template_cache_dir or None
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=select_autoescape(['html', 'xml']),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir)
+    )
+
+
+def write_page(env: Environment, template_name: str, template_data: Dict[str, Any],
+               output_path: Path, precompress: Sequence[str] = ()) -> str:
+    """Stream a rendered template to output_path without building the whole page."""
+    template = env.get_template(template_name)
+    write_stream(output_path, template.generate(**template_data), precompress)
+    return str(output_path)
 
 
 class HTMLWriter:
     """HTML page generator."""
     
-    def __init__(self, template_dir: str = "templates", output_dir: str = "public"):
+    def __init__(self, template_dir: str = "templates", output_dir: str = "public",
+                 workers: int = 1, force: bool = False, precompress: Sequence[str] = None):
         self.template_dir = Path(template_dir)
         self.output_dir = Path(output_dir)
         self.chunker = URLChunker()
+        self.workers = workers
+        self.force = force
+        self.precompress = list(config.precompress if precompress is None else precompress)
+        self._pool = None
+        self._pending = []
+        self._manifest = None
+        self.files_written = 0
         
         # Setup Jinja2 environment
-        self.env = Environment(
-            loader=FileSystemLoader(self.template_dir),
-            autoescape=select_autoescape(['html', 'xml'])
-        )
+        self.env = build_environment(self.template_dir)
+        self.template_version = self._get_template_version()
         
         # Ensure output directories exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def generate_discovery_page(self, date_str: str, page_num: int, 
-                               output_path: str = None) -> str:
-        """Generate a discovery page for a specific date and page number."""
+    def _get_template_version(self) -> str:
+        """Hash of the template sources, so template edits invalidate every page."""
+        digest = hashlib.sha256()
+        for name in TEMPLATES:
+            template_path = self.template_dir / name
+            if template_path.exists():
+                digest.update(name.encode('utf-8'))
+                digest.update(template_path.read_bytes())
+        return digest.hexdigest()
+    
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_dir / MANIFEST_NAME
+    
+    @property
+    def manifest(self) -> Dict[str, str]:
+        """Output path (relative to output_dir) -> hash of the inputs it was rendered from."""
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._manifest = {}
+        return self._manifest
+    
+    @traced('html.save_manifest')
+    def save_manifest(self) -> None:
+        """Persist the render manifest (atomically, like the pages)."""
+        if self._manifest is not None:
+            atomic_write(self.manifest_path, json.dumps(self._manifest, indent=0, sort_keys=True))
+    
+    def input_hash(self, template_name: str, template_data: Dict[str, Any]) -> str:
+        """Hash of everything a rendered file depends on."""
+        digest = hashlib.sha256()
+        digest.update(self.template_version.encode('utf-8'))
+        digest.update(template_name.encode('utf-8'))
+        digest.update(','.join(self.precompress).encode('utf-8'))
+        digest.update(json.dumps(template_data, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _manifest_key(self, output_path: Path) -> str:
+        return os.path.relpath(output_path, self.output_dir)
+    
+    def is_current(self, output_path: Path, input_hash: str) -> bool:
+        """True if output_path exists and was rendered from the same inputs."""
+        if self.force:
+            return False
+        return (self.manifest.get(self._manifest_key(output_path)) == input_hash
+                and Path(output_path).exists())
+    
+    def record_output(self, output_path: Path, input_hash: str) -> None:
+        self.manifest[self._manifest_key(output_path)] = input_hash
+        self.files_written += 1
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the render pool on first use (kept for multi-day runs)."""
+        if self._pool is None:
+            # Compile templates here so every worker loads bytecode from the cache
+            for name in TEMPLATES:
+                self.env.get_template(name)
+            
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_render_worker,
+                initargs=(str(self.template_dir), self.precompress)
+            )
+        return self._pool
+    
+    def close(self) -> None:
+        """Shut down the render pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def get_page_data(self, date_str: str, page_num: int) -> Dict[str, Any]:
+        """Build the template data for one discovery page."""
         # Get URLs for this page
         all_urls = self.chunker.get_urls_for_date(date_str)
         total_pages = self.chunker.get_page_count(len(all_urls))
@@ -47,10 +160,18 @@ class HTMLWriter:
         # Get navigation info
         nav_info = self.chunker.get_navigation_info(date_str, page_num)
         
+        return self.build_page_data(date_str, page_num, total_pages, page_urls,
+                                    nav_info['page_info'], nav_info['sample_hosts'])
+    
+    def build_page_data(self, date_str: str, page_num: int, total_pages: int,
+                        page_urls: List[Dict[str, Any]], page_info: Dict[str, Any],
+                        sample_hosts: List[str]) -> Dict[str, Any]:
+        """Template data for a page whose URLs and navigation are already known."""
         # Add source and priority info to URLs
         enhanced_urls = []
         for url_data in page_urls:
             enhanced_url = url_data.copy()
+            enhanced_url.pop('published_page', None)  # Bookkeeping; not part of the page's inputs
             enhanced_url['source'] = self._get_source_from_url(url_data['url'])
             enhanced_url['priority_label'] = self._get_priority_label(url_data.get('priority_class', 2))
             enhanced_urls.append(enhanced_url)
@@ -61,34 +182,105 @@ class HTMLWriter:
             'page_num': page_num,
             'total_pages': total_pages,
             'urls': enhanced_urls,
-            'sample_hosts': nav_info['sample_hosts'],
-            'navigation': nav_info['page_info'],
+            'sample_hosts': sample_hosts,
+            'navigation': page_info,
             'base_url': config.base_url,
             'brand_name': 'Underlight by Holler.News'
         }
         
-        # Render template
-        template = self.env.get_template('discovery_page.html.j2')
-        html_content = template.render(**template_data)
+        return template_data
+    
+    def get_page_path(self, date_str: str, page_num: int) -> Path:
+        """Default output path for a discovery page."""
+        return self.output_dir / "discover" / date_str / f"page-{page_num:06d}.html"
+    
+    @traced('html.page')
+    def generate_discovery_page(self, date_str: str, page_num: int, 
+                               output_path: str = None) -> str:
+        """Generate a discovery page for a specific date and page number."""
+        template_data = self.get_page_data(date_str, page_num)
         
         # Determine output path
         if output_path is None:
-            output_path = self.output_dir / "discover" / date_str / f"page-{page_num:06d}.html"
+            output_path = self.get_page_path(date_str, page_num)
         
-        output_path = Path(output_path)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Skip pages whose inputs are unchanged since they were last written
+        input_hash = self.input_hash('discovery_page.html.j2', template_data)
+        if self.is_current(output_path, input_hash):
+            return str(output_path)
         
-        # Write file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        output_path = write_page(self.env, 'discovery_page.html.j2', template_data, output_path,
+                                 self.precompress)
+        self.record_output(output_path, input_hash)
         
         print(f"Generated discovery page: {output_path}")
-        return str(output_path)
+        return output_path
     
-    def generate_day_index(self, date_str: str, output_path: str = None) -> str:
+    @traced('html.submit_pages')
+    def _generate_pages_parallel(self, date_str: str, total_pages: int,
+                                 wait: bool = True) -> List[str]:
+        """Render a day's pages in the process pool, one slice per worker.
+        
+        With ``wait=False`` the jobs stay queued so several dates render at
+        once; collect_pending() gathers them.
+        """
+        generated_files = []
+        jobs = []
+        input_hashes = {}
+        for page_num in range(1, total_pages + 1):
+            try:
+                template_data = self.get_page_data(date_str, page_num)
+                output_path = str(self.get_page_path(date_str, page_num))
+            except Exception as e:
+                print(f"Error preparing page {page_num} for {date_str}: {e}")
+                continue
+            
+            # Only pages whose inputs changed are sent to the pool
+            input_hash = self.input_hash('discovery_page.html.j2', template_data)
+            if self.is_current(output_path, input_hash):
+                generated_files.append(output_path)
+            else:
+                jobs.append((template_data, output_path))
+                input_hashes[output_path] = input_hash
+        
+        if not jobs:
+            return generated_files
+        
+        # Contiguous slices keep per-task pickling overhead low
+        slice_size = max(1, -(-len(jobs) // self.workers))
+        pool = self._get_pool()
+        for start in range(0, len(jobs), slice_size):
+            future = pool.submit(_render_pages, jobs[start:start + slice_size])
+            self._pending.append((date_str, future, input_hashes))
+        
+        if wait:
+            generated_files.extend(self.collect_pending())
+        return sorted(generated_files)
+    
+    @traced('html.collect_pending')
+    def collect_pending(self) -> List[str]:
+        """Wait for submitted render jobs and record what they wrote."""
+        generated_files = []
+        pending, self._pending = self._pending, []
+        
+        for date_str, future, input_hashes in pending:
+            try:
+                for output_path in future.result():
+                    self.record_output(output_path, input_hashes[output_path])
+                    generated_files.append(output_path)
+            except Exception as e:
+                print(f"Error rendering pages for {date_str}: {e}")
+        
+        if pending:
+            print(f"Rendered {len(generated_files)} pages with {self.workers} workers")
+        return generated_files
+    
+    @traced('html.day_index')
+    def generate_day_index(self, date_str: str, output_path: str = None,
+                           url_count: int = None, total_pages: int = None) -> str:
         """Generate day index page."""
         # Get navigation info
-        nav_info = self.chunker.get_day_navigation(date_str)
+        nav_info = self.chunker.get_day_navigation(date_str, url_count, total_pages)
         
         if nav_info.get('total_pages', 0) == 0:
             print(f"No pages found for date {date_str}")
@@ -104,44 +296,68 @@ class HTMLWriter:
             'brand_name': 'Underlight by Holler.News'
         }
         
-        # Render template
-        template = self.env.get_template('day_index.html.j2')
-        html_content = template.render(**template_data)
-        
         # Determine output path
         if output_path is None:
             output_path = self.output_dir / "discover" / date_str / "index.html"
         
-        output_path = Path(output_path)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        input_hash = self.input_hash('day_index.html.j2', template_data)
+        if self.is_current(output_path, input_hash):
+            return str(output_path)
         
-        # Write file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        output_path = write_page(self.env, 'day_index.html.j2', template_data, output_path,
+                                 self.precompress)
+        self.record_output(output_path, input_hash)
         
         print(f"Generated day index: {output_path}")
-        return str(output_path)
+        return output_path
     
-    def generate_all_pages_for_date(self, date_str: str) -> List[str]:
-        """Generate all pages for a specific date."""
+    @traced('html.generate_date')
+    def generate_all_pages_for_date(self, date_str: str, urls: List[Dict[str, Any]] = None,
+                                    wait: bool = True) -> List[str]:
+        """Generate all pages for a specific date.
+        
+        ``urls`` may carry the date's already-fetched publishable URLs (see
+        generate_date_range); ``wait=False`` leaves pool render jobs pending.
+        """
         generated_files = []
+        written_before = self.files_written
         
-        # Get URLs for this date
-        urls = self.chunker.get_urls_for_date(date_str)
+        # Fetch the day's ordered URLs once; every page and the index
+        # below slice the chunker's memoized result
+        if urls is None:
+            self.chunker.clear_cache(date_str)
+            urls = self.chunker.get_urls_for_date(date_str)
+        else:
+            self.chunker.set_urls_for_date(date_str, urls)
         if not urls:
             print(f"No URLs found for date {date_str}")
             return generated_files
         
         total_pages = self.chunker.get_page_count(len(urls))
         print(f"Generating {total_pages} pages for {date_str} ({len(urls)} URLs)")
+        add_rows(rows_in=len(urls))
+        current_span().set(date=date_str, urls=len(urls), pages=total_pages)
         
-        # Generate individual pages
-        for page_num in range(1, total_pages + 1):
-            try:
-                page_path = self.generate_discovery_page(date_str, page_num)
-                generated_files.append(page_path)
-            except Exception as e:
-                print(f"Error generating page {page_num} for {date_str}: {e}")
+        # Record page boundaries so single pages can be re-fetched by seek,
+        # and each URL's page so later appends keep it in place. Both only
+        # write what changed, so an unchanged re-run leaves the tables alone
+        self.chunker.save_page_keys(date_str, urls)
+        self.chunker.assign_pages(date_str, self.chunker.page_moves(urls), reset=True)
+        
+        # Generate individual pages (single-page dates only go to the pool
+        # when other dates are rendering alongside them)
+        if self.workers > 1 and (total_pages > 1 or not wait):
+            generated_files.extend(self._generate_pages_parallel(date_str, total_pages, wait))
+        else:
+            for page_num in range(1, total_pages + 1):
+                try:
+                    page_path = self.generate_discovery_page(date_str, page_num)
+                    generated_files.append(page_path)
+                except Exception as e:
+                    print(f"Error generating page {page_num} for {date_str}: {e}")
+        
+        # Refresh the day summary before the index reads navigation from it
+        DaySummaryManager(self.chunker.links_per_page).refresh_days([date_str])
         
         # Generate day index
         try:
@@ -151,7 +367,118 @@ class HTMLWriter:
         except Exception as e:
             print(f"Error generating day index for {date_str}: {e}")
         
-        print(f"Generated {len(generated_files)} files for {date_str}")
+        self.save_manifest()
+        
+        if wait:
+            print(f"Generated {len(generated_files)} files for {date_str} "
+                  f"({self.files_written - written_before} written, rest unchanged)")
+        return generated_files
+    
+    @traced('html.generate_range')
+    def generate_date_range(self, start_date: str, end_date: str) -> List[str]:
+        """Generate every date from start_date to end_date (inclusive).
+        
+        All dates come from one ordered streaming query; with workers > 1
+        page rendering for successive dates overlaps in the process pool.
+        """
+        generated_files = []
+        dates = 0
+        
+        for date_str, urls in self.chunker.iter_urls_by_date(start_date, end_date):
+            dates += 1
+            try:
+                generated_files.extend(self.generate_all_pages_for_date(date_str, urls, wait=False))
+            except Exception as e:
+                print(f"Error generating pages for {date_str}: {e}")
+            finally:
+                self.chunker.clear_cache(date_str)
+            
+            # Bound the template data queued in the pool
+            if len(self._pending) > self.workers * 4:
+                generated_files.extend(self.collect_pending())
+                self.save_manifest()
+        
+        generated_files.extend(self.collect_pending())
+        self.save_manifest()
+        
+        print(f"Generated {len(generated_files)} files for {dates} dates "
+              f"({start_date} to {end_date})")
+        return generated_files
+    
+    @traced('html.append_date')
+    def append_pages_for_date(self, date_str: str) -> List[str]:
+        """Publish a date's new URLs without moving already-published ones.
+        
+        New URLs top up the last page and then fill new pages; only those
+        tail pages and the day index are rewritten. Earlier pages keep their
+        previous "Page N of M" total until the next full generate.
+        """
+        page_counts = self.chunker.get_published_page_counts(date_str)
+        if not page_counts:
+            # Nothing published for this date yet
+            return self.generate_all_pages_for_date(date_str)
+        
+        generated_files = []
+        written_before = self.files_written
+        
+        new_urls = self.chunker.get_unpublished_urls(date_str)
+        if not new_urls:
+            print(f"No new URLs to append for {date_str}")
+            return generated_files
+        
+        assignments = self.chunker.append_assignments(page_counts, new_urls)
+        self.chunker.assign_pages(date_str, assignments)
+        
+        first_page = max(page_counts)
+        total_pages = max(assignments.values())
+        url_count = sum(page_counts.values()) + len(new_urls)
+        print(f"Appending {len(new_urls)} URLs to {date_str} "
+              f"(pages {first_page}-{total_pages} of {total_pages})")
+        add_rows(rows_in=len(new_urls))
+        
+        sample_hosts = self.chunker.get_sample_hosts(self.chunker.get_published_page(date_str, 1))
+        links_per_page = self.chunker.links_per_page
+        
+        for page_num in range(first_page, total_pages + 1):
+            try:
+                page_urls = self.chunker.get_published_page(date_str, page_num)
+                page_info = {
+                    'page_num': page_num,
+                    'total_pages': total_pages,
+                    'has_prev': page_num > 1,
+                    'has_next': page_num < total_pages,
+                    'prev_page': page_num - 1 if page_num > 1 else None,
+                    'next_page': page_num + 1 if page_num < total_pages else None,
+                    'start_index': (page_num - 1) * links_per_page + 1,
+                    'end_index': (page_num - 1) * links_per_page + len(page_urls)
+                }
+                template_data = self.build_page_data(date_str, page_num, total_pages, page_urls,
+                                                     page_info, sample_hosts)
+                
+                output_path = self.get_page_path(date_str, page_num)
+                input_hash = self.input_hash('discovery_page.html.j2', template_data)
+                if not self.is_current(output_path, input_hash):
+                    output_path = write_page(self.env, 'discovery_page.html.j2', template_data,
+                                             output_path, self.precompress)
+                    self.record_output(output_path, input_hash)
+                generated_files.append(str(output_path))
+            except Exception as e:
+                print(f"Error appending page {page_num} for {date_str}: {e}")
+        
+        DaySummaryManager(links_per_page).refresh_days([date_str])
+        
+        try:
+            index_path = self.generate_day_index(date_str, url_count=url_count,
+                                                 total_pages=total_pages)
+            if index_path:
+                generated_files.append(index_path)
+        except Exception as e:
+            print(f"Error generating day index for {date_str}: {e}")
+        
+        self.save_manifest()
+        
+        print(f"Appended {len(generated_files)} files for {date_str} "
+              f"({self.files_written - written_before} written)")
         return generated_files
     
     def _get_source_from_url(self, url: str) -> str:
@@ -185,3 +512,24 @@ class HTMLWriter:
             self.output_dir.mkdir(parents=True, exist_ok=True)
         
         return self.generate_all_pages_for_date(date_str)
+
+
+# Per-process environment for pool workers, built once by the initializer
+_worker_env = None
+_worker_precompress = ()
+
+
+def _init_render_worker(template_dir: str, precompress: Sequence[str]) -> None:
+    """Process pool initializer: load templates from the bytecode cache."""
+    global _worker_env, _worker_precompress
+    _worker_env = build_environment(Path(template_dir))
+    _worker_precompress = precompress
+    for name in TEMPLATES:
+        _worker_env.get_template(name)
+
+
+def _render_pages(jobs: List[Tuple[Dict[str, Any], str]]) -> List[str]:
+    """Process pool entry point: render and write a slice of pages."""
+    return [write_page(_worker_env, 'discovery_page.html.j2', template_data, output_path,
+                       _worker_precompress)
+            for template_data, output_path in jobs]
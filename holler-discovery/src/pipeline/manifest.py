@@ -2,12 +2,33 @@
 
 import json
 from datetime import datetime, date
-from typing import Dict, Any, Optional
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
 from uuid import uuid4
 
 from ..config import config
-from ..db import db, RunManifest, DiscoveredRaw, DiscoveredKept
-from sqlalchemy import func
+from ..db import db, as_date, utc_day_range, RunManifest, RunStageMetrics, DiscoveredRaw, DiscoveredKept, DiscoveryDay, DailyStats
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from .metrics import StageMetrics, format_prometheus
+from .stream_writer import write_stream
+
+# width_bucket(discovery_score, 0, 100, 5) buckets; 100 is folded into the last one
+SCORE_BUCKETS = ['0-20', '20-40', '40-60', '60-80', '80-100']
+TOP_URLS_PER_DAY = 10
+
+
+def score_stats_columns() -> list:
+    """Totals, priority counts, average and score histogram as one pass of FILTER aggregates."""
+    score = DiscoveredKept.discovery_score
+    bucket = func.least(func.width_bucket(score, 0.0, 100.0, len(SCORE_BUCKETS)), len(SCORE_BUCKETS))
+    
+    return [
+        func.count().label('kept_count'),
+        *[func.count().filter(DiscoveredKept.priority_class == p).label(f'p{p}_count') for p in range(4)],
+        func.coalesce(func.avg(score), 0.0).label('avg_score'),
+        *[func.count().filter(bucket == i + 1).label(f'bucket_{i}') for i in range(len(SCORE_BUCKETS))],
+    ]
 
 
 class ManifestManager:
@@ -31,6 +52,14 @@ class ManifestManager:
             )
             
             session.add(manifest)
+            session.flush()
+            
+            # Stage metrics recorded before the manifest existed belong to this run
+            session.execute(
+                update(RunStageMetrics)
+                .where(RunStageMetrics.run_date == run_date, RunStageMetrics.run_id.is_(None))
+                .values(run_id=manifest.run_id)
+            )
             session.commit()
             
             print(f"Created run manifest: {manifest.run_id} for {run_date}")
@@ -43,6 +72,67 @@ class ManifestManager:
         finally:
             session.close()
     
+    def record_stage_metrics(self, run_date: str, stages: Iterable[StageMetrics],
+                             run_id: str = None) -> None:
+        """Store stage metrics, linked to the run's manifest if it already exists."""
+        stages = list(stages)
+        if not stages:
+            return
+        
+        session = db.get_session()
+        
+        try:
+            if run_id is None:
+                manifest = session.query(RunManifest).filter(
+                    RunManifest.run_date == run_date
+                ).order_by(RunManifest.created_at.desc()).first()
+                run_id = manifest.run_id if manifest else None
+            
+            session.add_all(
+                RunStageMetrics(run_id=run_id, run_date=run_date, **stage.as_dict())
+                for stage in stages
+            )
+            session.commit()
+            
+        except Exception as e:
+            session.rollback()
+            print(f"Error recording stage metrics: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_stage_metrics(self, run_id: str = None, run_date: str = None) -> List[Dict[str, Any]]:
+        """Get stage metrics for a run (by id, or every row recorded for a date)."""
+        session = db.get_session()
+        
+        try:
+            query = session.query(RunStageMetrics)
+            if run_id is not None:
+                query = query.filter(RunStageMetrics.run_id == run_id)
+            else:
+                query = query.filter(RunStageMetrics.run_date == run_date)
+            
+            return [
+                {
+                    'stage': row.stage,
+                    'source': row.source,
+                    'wall_seconds': row.wall_seconds,
+                    'cpu_seconds': row.cpu_seconds,
+                    'peak_rss_kb': row.peak_rss_kb,
+                    'rows_in': row.rows_in,
+                    'rows_out': row.rows_out,
+                    'rows_per_sec': row.rows_per_sec,
+                    'db_round_trips': row.db_round_trips,
+                    'http_requests': row.http_requests,
+                    'http_bytes': row.http_bytes,
+                    'recorded_at': row.created_at.isoformat(),
+                }
+                for row in query.order_by(RunStageMetrics.created_at, RunStageMetrics.id)
+            ]
+            
+        finally:
+            session.close()
+    
     def get_run_stats(self, run_date: str = None) -> Dict[str, Any]:
         """Get statistics for a specific run or latest run."""
         session = db.get_session()
@@ -90,39 +180,43 @@ class ManifestManager:
         session = db.get_session()
         
         try:
-            # Get counts for the date
-            raw_count = session.query(DiscoveredRaw).filter(
-                func.date(DiscoveredRaw.seen_at) == date_str
-            ).count()
-            
-            kept_count = session.query(DiscoveredKept).filter(
-                func.date(DiscoveredKept.picked_at) == date_str
-            ).count()
-            
-            # Get source breakdown
+            # Source breakdown; the raw total is its sum
             source_stats = session.query(
                 DiscoveredRaw.source,
                 func.count(DiscoveredRaw.id).label('count')
             ).filter(
-                func.date(DiscoveredRaw.seen_at) == date_str
+                DiscoveredRaw.seen_date == as_date(date_str),
+                *utc_day_range(DiscoveredRaw.seen_at, date_str)
             ).group_by(DiscoveredRaw.source).all()
             
             source_breakdown = {source: count for source, count in source_stats}
+            raw_count = sum(source_breakdown.values())
+            
+            # Kept total comes from the stats snapshot
+            kept_count = self.get_ranking_stats(date_str)['kept_count']
             
             # Get top hosts
             top_hosts = session.query(
                 DiscoveredKept.host,
                 func.count(DiscoveredKept.id).label('count')
             ).filter(
-                func.date(DiscoveredKept.picked_at) == date_str
+                DiscoveredKept.picked_date == as_date(date_str),
+                *utc_day_range(DiscoveredKept.picked_at, date_str)
             ).group_by(DiscoveredKept.host).order_by(
                 func.count(DiscoveredKept.id).desc()
             ).limit(10).all()
             
+            # Publishable totals come from the day summary
+            day = session.query(DiscoveryDay).filter(
+                DiscoveryDay.day == as_date(date_str)
+            ).first()
+            
             return {
                 'date': date_str,
                 'raw_count': raw_count,
                 'kept_count': kept_count,
+                'publishable_count': day.publishable_count if day else 0,
+                'page_count': day.page_count if day else 0,
                 'filter_rate': kept_count / raw_count if raw_count > 0 else 0,
                 'source_breakdown': source_breakdown,
                 'top_hosts': [{'host': host, 'count': count} for host, count in top_hosts]
@@ -176,86 +270,155 @@ class ManifestManager:
         finally:
             session.close()
     
-    def get_ranking_stats(self, date_str: str = None) -> Dict[str, Any]:
-        """Get ranking statistics for a specific date."""
-        if date_str is None:
-            date_str = datetime.now().strftime('%Y-%m-%d')
+    def compute_stats_snapshots(self, session, days: Optional[List[date]] = None) -> Dict[date, Dict[str, Any]]:
+        """daily_stats values for the given days (all days if None), computed live.
+        
+        One grouped scan computes every day's counts, average and histogram;
+        a second windowed query picks each day's top URLs.
+        """
+        stats_query = session.query(
+            DiscoveredKept.picked_date, *score_stats_columns()
+        ).group_by(DiscoveredKept.picked_date)
+        
+        ranked = session.query(
+            DiscoveredKept.picked_date, DiscoveredKept.url, DiscoveredKept.host,
+            DiscoveredKept.discovery_score, DiscoveredKept.priority_class, DiscoveredKept.signals,
+            func.row_number().over(
+                partition_by=DiscoveredKept.picked_date,
+                order_by=(DiscoveredKept.discovery_score.desc(), DiscoveredKept.id)
+            ).label('rank')
+        ).filter(DiscoveredKept.discovery_score > 0)
+        
+        if days is not None:
+            day_range = utc_day_range(DiscoveredKept.picked_at, days[0], days[-1])
+            stats_query = stats_query.filter(DiscoveredKept.picked_date.in_(days), *day_range)
+            ranked = ranked.filter(DiscoveredKept.picked_date.in_(days), *day_range)
+        
+        ranked = ranked.subquery()
+        top_rows = session.query(ranked).filter(
+            ranked.c.rank <= TOP_URLS_PER_DAY
+        ).order_by(ranked.c.picked_date, ranked.c.rank).all()
+        
+        top_urls: Dict[date, List[Dict[str, Any]]] = {}
+        for row in top_rows:
+            top_urls.setdefault(row.picked_date, []).append({
+                'url': row.url,
+                'host': row.host,
+                'discovery_score': row.discovery_score,
+                'priority_class': row.priority_class,
+                'signals': row.signals or {}
+            })
+        
+        rows = {}
+        for row in stats_query.all():
+            rows[row.picked_date] = self._snapshot_row(row.picked_date, row, top_urls)
+        
+        # Days that lost all their rows keep an empty snapshot
+        for day in days or []:
+            rows.setdefault(day, self._snapshot_row(day, None, top_urls))
+        return rows
+    
+    def refresh_stats_snapshots(self, days: Optional[Iterable] = None) -> int:
+        """Recompute the daily_stats snapshot for the given days (all days if None)."""
+        if days is not None:
+            days = sorted({as_date(day) for day in days})
+            if not days:
+                return 0
         
         session = db.get_session()
         
         try:
-            # Get priority class counts
-            priority_stats = session.query(
-                DiscoveredKept.priority_class,
-                func.count(DiscoveredKept.id).label('count')
-            ).filter(
-                func.date(DiscoveredKept.picked_at) == date_str
-            ).group_by(DiscoveredKept.priority_class).all()
-            
-            priority_counts = {f'P{priority}': count for priority, count in priority_stats}
-            
-            # Get average score
-            avg_score = session.query(
-                func.avg(DiscoveredKept.discovery_score)
-            ).filter(
-                func.date(DiscoveredKept.picked_at) == date_str
-            ).scalar() or 0.0
+            rows = self.compute_stats_snapshots(session, days)
             
-            # Get score distribution
-            score_ranges = [
-                (0, 20, '0-20'),
-                (20, 40, '20-40'),
-                (40, 60, '40-60'),
-                (60, 80, '60-80'),
-                (80, 100, '80-100')
-            ]
+            if rows:
+                stmt = insert(DailyStats).values(list(rows.values()))
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[DailyStats.day],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in ['kept_count', 'p0_count', 'p1_count', 'p2_count', 'p3_count',
+                                       'avg_score', 'score_distribution', 'top_urls']
+                    } | {'computed_at': func.now()}
+                )
+                session.execute(stmt)
             
-            score_distribution = {}
-            for min_score, max_score, label in score_ranges:
-                count = session.query(DiscoveredKept).filter(
-                    func.date(DiscoveredKept.picked_at) == date_str,
-                    DiscoveredKept.discovery_score >= min_score,
-                    DiscoveredKept.discovery_score < max_score
-                ).count()
-                score_distribution[label] = count
+            session.commit()
+            return len(rows)
             
-            # Get top scoring URLs
-            top_urls = session.query(DiscoveredKept).filter(
-                func.date(DiscoveredKept.picked_at) == date_str,
-                DiscoveredKept.discovery_score > 0
-            ).order_by(
-                DiscoveredKept.discovery_score.desc()
-            ).limit(10).all()
+        except Exception as e:
+            session.rollback()
+            print(f"Error refreshing stats snapshots: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def _snapshot_row(self, day: date, row, top_urls: Dict[date, list]) -> Dict[str, Any]:
+        """daily_stats values for one day from an aggregate row (None for no rows)."""
+        return {
+            'day': day,
+            'kept_count': row.kept_count if row else 0,
+            'p0_count': row.p0_count if row else 0,
+            'p1_count': row.p1_count if row else 0,
+            'p2_count': row.p2_count if row else 0,
+            'p3_count': row.p3_count if row else 0,
+            'avg_score': float(row.avg_score) if row else 0.0,
+            'score_distribution': {
+                label: getattr(row, f'bucket_{i}') if row else 0
+                for i, label in enumerate(SCORE_BUCKETS)
+            },
+            'top_urls': top_urls.get(day, []),
+        }
+    
+    def get_ranking_stats(self, date_str: str = None) -> Dict[str, Any]:
+        """Get ranking statistics for a specific date.
+        
+        Read-only: served from the daily_stats snapshot (``computed_at`` says
+        how old it is) or, for a day without one, computed live with
+        ``computed_at`` None. Snapshots are refreshed by rank, recheck and
+        ``stats --refresh``.
+        """
+        if date_str is None:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+        
+        session = db.get_session()
+        
+        try:
+            snapshot = session.get(DailyStats, as_date(date_str))
+            if snapshot is None:
+                values = self.compute_stats_snapshots(session, [as_date(date_str)])[as_date(date_str)]
+                computed_at = None
+            else:
+                values = {column.name: getattr(snapshot, column.name) for column in DailyStats.__table__.columns}
+                computed_at = snapshot.computed_at
             
-            top_urls_data = []
-            for url in top_urls:
-                top_urls_data.append({
-                    'url': url.url,
-                    'host': url.host,
-                    'discovery_score': url.discovery_score,
-                    'priority_class': url.priority_class,
-                    'signals': url.signals or {}
-                })
+            priority_counts = {
+                f'P{p}': values[f'p{p}_count']
+                for p in range(4) if values[f'p{p}_count']
+            }
             
             return {
                 'date': date_str,
+                'kept_count': values['kept_count'],
                 'priority_counts': priority_counts,
-                'avg_score': float(avg_score),
-                'score_distribution': score_distribution,
-                'top_urls': top_urls_data
+                'avg_score': float(values['avg_score']),
+                'score_distribution': values['score_distribution'] or {},
+                'top_urls': values['top_urls'] or [],
+                'computed_at': computed_at
             }
             
         finally:
             session.close()
     
     def export_manifest(self, run_date: str, output_path: str = None) -> str:
-        """Export run manifest to JSON file."""
+        """Export run manifest to JSON file, with stage metrics as a Prometheus textfile beside it."""
         stats = self.get_run_stats(run_date)
         daily_stats = self.get_daily_stats(run_date)
+        stage_metrics = self.get_stage_metrics(run_id=stats.get('run_id'), run_date=run_date)
         
         manifest_data = {
             'run_stats': stats,
             'daily_stats': daily_stats,
+            'stage_metrics': stage_metrics,
             'exported_at': datetime.utcnow().isoformat(),
             'config': {
                 'links_per_page': config.links_per_page,
@@ -268,10 +431,12 @@ class ManifestManager:
         if output_path is None:
             output_path = f"manifest-{run_date}.json"
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(manifest_data, f, indent=2, default=str)
+        write_stream(output_path, json.JSONEncoder(indent=2, default=str).iterencode(manifest_data))
         
-        print(f"Exported manifest to: {output_path}")
+        prom_path = str(Path(output_path).with_suffix('.prom'))
+        write_stream(prom_path, [format_prometheus(stage_metrics, {'run_date': run_date})])
+        
+        print(f"Exported manifest to: {output_path} (metrics: {prom_path})")
         return output_path
 
 
@@ -281,6 +446,12 @@ def create_run_manifest(run_date: str, candidates: int, kept: int, pages: int) -
     return manager.create_run_manifest(run_date, candidates, kept, pages)
 
 
+def record_stage_metrics(run_date: str, stages: Iterable[StageMetrics], run_id: str = None) -> None:
+    """Convenience function to store stage metrics."""
+    manager = ManifestManager()
+    manager.record_stage_metrics(run_date, stages, run_id)
+
+
 def get_run_stats(run_date: str = None) -> Dict[str, Any]:
     """Convenience function to get run statistics."""
     manager = ManifestManager()
@@ -297,3 +468,9 @@ def get_ranking_stats(date_str: str = None) -> Dict[str, Any]:
     """Convenience function to get ranking statistics."""
     manager = ManifestManager()
     return manager.get_ranking_stats(date_str)
+
+
+def refresh_stats_snapshots(days: Optional[Iterable] = None) -> int:
+    """Convenience function to refresh daily_stats snapshots."""
+    manager = ManifestManager()
+    return manager.refresh_stats_snapshots(days)
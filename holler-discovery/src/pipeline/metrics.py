@@ -0,0 +1,162 @@
+"""Per-stage performance metrics: timing, memory, row counts, DB and HTTP activity."""
+
+import resource
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import profiling, tracing
+
+# Prometheus metric name -> (stage metrics field, help text)
+PROMETHEUS_METRICS = {
+    'hndisc_stage_wall_seconds': ('wall_seconds', 'Wall-clock time spent in the stage'),
+    'hndisc_stage_cpu_seconds': ('cpu_seconds', 'CPU time (user + system) spent in the stage'),
+    'hndisc_stage_peak_rss_bytes': ('peak_rss_kb', 'Peak resident set size at the end of the stage'),
+    'hndisc_stage_rows_in': ('rows_in', 'Rows read by the stage'),
+    'hndisc_stage_rows_out': ('rows_out', 'Rows produced by the stage'),
+    'hndisc_stage_rows_per_second': ('rows_per_sec', 'Rows produced per wall-clock second'),
+    'hndisc_stage_db_round_trips': ('db_round_trips', 'SQL statements sent to the database'),
+    'hndisc_stage_http_requests': ('http_requests', 'HTTP requests made'),
+    'hndisc_stage_http_bytes': ('http_bytes', 'HTTP response body bytes read'),
+}
+
+# Stages currently being measured; counters are added to all of them
+_active_stages: List['StageMetrics'] = []
+
+
+def peak_rss_kb() -> int:
+    """Peak RSS in KiB of this process or its largest child (render/rank pools)."""
+    peaks = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    # ru_maxrss is bytes on macOS, KiB elsewhere
+    if sys.platform == 'darwin':
+        return max(peaks) // 1024
+    return max(peaks)
+
+
+class StageMetrics:
+    """Measure one pipeline stage; use as a context manager around the stage.
+    
+    Wall and CPU time are taken from the enter/exit clocks. DB round trips and
+    HTTP traffic are counted while the stage is active, and code inside the
+    stage reports rows through ``add_rows``. Peak RSS is the process high-water
+    mark when the stage ends. Under ``hndisc --profile`` each stage is also
+    profiled on its own, and with tracing on it is a ``stage.*`` span.
+    """
+    
+    def __init__(self, stage: str, source: Optional[str] = None):
+        self.stage = stage
+        self.source = source
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_kb = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.db_round_trips = 0
+        self.http_requests = 0
+        self.http_bytes = 0
+        self._started = None
+        self._span = None
+    
+    @property
+    def label(self) -> str:
+        return f"{self.stage}-{self.source}" if self.source else self.stage
+    
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_out / self.wall_seconds if self.wall_seconds > 0 else 0.0
+    
+    def __enter__(self) -> 'StageMetrics':
+        self._started = (time.perf_counter(), time.process_time())
+        _active_stages.append(self)
+        profiling.stage_started(self.label)
+        self._span = tracing.span(f"stage.{self.label}").__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        profiling.stage_finished(self.label)
+        _active_stages.remove(self)
+        wall_start, cpu_start = self._started
+        self.wall_seconds = time.perf_counter() - wall_start
+        self.cpu_seconds = time.process_time() - cpu_start
+        self.peak_rss_kb = peak_rss_kb()
+        
+        self._span.set(rows_in=self.rows_in, rows_out=self.rows_out,
+                       db_round_trips=self.db_round_trips, http_requests=self.http_requests)
+        self._span.__exit__(exc_type, exc, tb)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Column values for a run_stage_metrics row."""
+        return {
+            'stage': self.stage,
+            'source': self.source,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'peak_rss_kb': self.peak_rss_kb,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_sec': self.rows_per_sec,
+            'db_round_trips': self.db_round_trips,
+            'http_requests': self.http_requests,
+            'http_bytes': self.http_bytes,
+        }
+
+
+def add_rows(rows_in: int = 0, rows_out: int = 0) -> None:
+    """Report rows read/produced to the active stages (no-op outside a stage)."""
+    for stage in _active_stages:
+        stage.rows_in += rows_in
+        stage.rows_out += rows_out
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_round_trip(conn, cursor, statement, parameters, context, executemany):
+    for stage in _active_stages:
+        stage.db_round_trips += 1
+
+
+async def _on_request_end(session, context, params):
+    for stage in _active_stages:
+        stage.http_requests += 1
+
+
+async def _on_response_chunk(session, context, params):
+    for stage in _active_stages:
+        stage.http_bytes += len(params.chunk)
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """aiohttp trace config that counts requests and response bytes for the active stages."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_response_chunk_received.append(_on_response_chunk)
+    return trace_config
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(stages: Iterable[Dict[str, Any]], labels: Optional[Dict[str, str]] = None) -> str:
+    """Render stage metric rows in the Prometheus textfile exposition format."""
+    stages = list(stages)
+    lines = []
+    
+    for name, (field, help_text) in PROMETHEUS_METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for row in stages:
+            row_labels = dict(labels or {}, stage=row['stage'])
+            if row.get('source'):
+                row_labels['source'] = row['source']
+            label_str = ','.join(f'{key}="{_label(value)}"' for key, value in row_labels.items())
+            
+            value = row.get(field) or 0
+            if field == 'peak_rss_kb':
+                value *= 1024
+            lines.append(f"{name}{{{label_str}}} {value}")
+    
+    return '\n'.join(lines) + '\n'
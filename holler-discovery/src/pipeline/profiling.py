@@ -0,0 +1,197 @@
+"""Profiling hooks for CLI commands: cProfile stats and sampled collapsed stacks."""
+
+import cProfile
+import pstats
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..config import config
+
+# Profiler for the running command (set by CommandProfiler.start)
+_active: Optional['CommandProfiler'] = None
+
+
+def frame_label(frame) -> str:
+    """Flamegraph frame name: qualified function name plus file and line."""
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Root-first, semicolon-separated stack for the collapsed (folded) format."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Sample one thread's Python stack on a timer.
+    
+    Samples are counted per label (the running stage) so each stage gets its
+    own collapsed-stack file. Needs ``sys._current_frames`` (CPython).
+    """
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.label = None
+        self.samples: Dict[Optional[str], Counter] = {}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @staticmethod
+    def available() -> bool:
+        return hasattr(sys, '_current_frames')
+    
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.setdefault(self.label, Counter())[collapse_stack(frame)] += 1
+    
+    def collapsed(self, label: Optional[str] = None, all_labels: bool = False) -> Counter:
+        """Stack counts for one label, or merged across every label."""
+        if not all_labels:
+            return self.samples.get(label, Counter())
+        
+        merged = Counter()
+        for counts in self.samples.values():
+            merged.update(counts)
+        return merged
+
+
+class CommandProfiler:
+    """Profile one CLI command with cProfile, plus a stack sampler when available.
+    
+    Pipeline stages (see metrics.StageMetrics) get their own profiler while
+    they run, so each stage is dumped to its own ``.pstats`` and ``.collapsed``
+    file; the command's files cover the whole run.
+    """
+    
+    def __init__(self, command: str, output_dir: str = None, top: int = 20, interval: float = None):
+        self.command = command or 'main'
+        self.top = top
+        self.interval = interval if interval is not None else config.profile_interval
+        
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.output_dir = Path(output_dir or config.profile_dir) / f"{self.command}-{stamp}"
+        
+        self._profilers: List[cProfile.Profile] = []  # Command profiler, then nested stages
+        self._stage_files: List[str] = []
+        self._sampler = None
+        self.files: List[str] = []
+    
+    def start(self) -> 'CommandProfiler':
+        global _active
+        
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if StackSampler.available():
+            self._sampler = StackSampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+        
+        profiler = cProfile.Profile()
+        self._profilers.append(profiler)
+        _active = self
+        profiler.enable()
+        return self
+    
+    def begin_stage(self, label: str) -> None:
+        """Switch to a fresh profiler for a pipeline stage."""
+        # Only one cProfile profiler can be enabled at a time
+        self._profilers[-1].disable()
+        profiler = cProfile.Profile()
+        self._profilers.append(profiler)
+        if self._sampler is not None:
+            self._sampler.label = label
+        profiler.enable()
+    
+    def end_stage(self, label: str) -> None:
+        """Dump the stage's profile and resume the enclosing profiler."""
+        profiler = self._profilers.pop()
+        profiler.disable()
+        
+        path = self._dump(profiler, f"{self.command}-{label}")
+        if path:
+            self._stage_files.append(path)
+        self._write_collapsed(f"{self.command}-{label}", self._sampler.collapsed(label) if self._sampler else None)
+        
+        if self._sampler is not None:
+            self._sampler.label = None
+        self._profilers[-1].enable()
+    
+    def stop(self) -> List[str]:
+        """Stop profiling, write the command's files and print the top summary."""
+        global _active
+        
+        # Stages interrupted by an error are folded into the command profile
+        while len(self._profilers) > 1:
+            self._profilers.pop().disable()
+        profiler = self._profilers.pop()
+        profiler.disable()
+        _active = None
+        
+        if self._sampler is not None:
+            self._sampler.stop()
+        
+        stats = pstats.Stats(profiler)
+        for path in self._stage_files:
+            stats.add(path)
+        command_path = self.output_dir / f"{self.command}.pstats"
+        stats.dump_stats(command_path)
+        self.files.append(str(command_path))
+        self._write_collapsed(self.command, self._sampler.collapsed(all_labels=True) if self._sampler else None)
+        
+        if self.top:
+            print(f"Profile of '{self.command}' (top {self.top} by cumulative time):")
+            stats.sort_stats('cumulative').print_stats(self.top)
+        print(f"Profile written to {self.output_dir}")
+        return self.files
+    
+    def _dump(self, profiler: cProfile.Profile, name: str) -> Optional[str]:
+        try:
+            stats = pstats.Stats(profiler)
+        except TypeError:  # Nothing was recorded
+            return None
+        
+        path = self.output_dir / f"{name}.pstats"
+        stats.dump_stats(path)
+        self.files.append(str(path))
+        return str(path)
+    
+    def _write_collapsed(self, name: str, counts: Optional[Counter]) -> None:
+        if not counts:
+            return
+        
+        path = self.output_dir / f"{name}.collapsed"
+        with open(path, 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+        self.files.append(str(path))
+
+
+def stage_started(label: str) -> None:
+    """Hook for StageMetrics: give the stage its own profile when profiling."""
+    if _active is not None:
+        _active.begin_stage(label)
+
+
+def stage_finished(label: str) -> None:
+    """Hook for StageMetrics: dump the stage's profile when profiling."""
+    if _active is not None:
+        _active.end_stage(label)
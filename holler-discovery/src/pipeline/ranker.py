@@ -2,13 +2,22 @@
 
 import re
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+import asyncio
+import bisect
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Sequence, Set, Tuple, Optional
 from urllib.parse import urlparse
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+
+import numpy as np
+from sqlalchemy import Row, and_, func, or_, select, update
 
 from ..config import config
-from ..db import db, DiscoveredKept, RunManifest
+from ..db import db, async_db, utc_day, DiscoveredKept, RunManifest
+from .metrics import add_rows
+from .tracing import current_span, traced
 
 
 @dataclass
@@ -24,6 +33,30 @@ class DiscoverySignals:
     topic_boost: float = 0.0
 
 
+@dataclass(frozen=True)
+class HostSignals:
+    """Host-only components of the discovery signals, cached per host."""
+    unseen_likelihood: float = 0.0
+    host_novelty: float = 0.0
+    content_readiness: float = 0.0
+    link_yield: float = 0.0
+    safety_keywords: FrozenSet[str] = frozenset()
+    topic_keywords: FrozenSet[str] = frozenset()
+
+
+# Column order of the signal matrix returned by DiscoveryRanker.score_batch
+SIGNAL_NAMES = tuple(f.name for f in fields(DiscoverySignals))
+
+# Freshness buckets: upper bound in hours -> score (older than last bound = 0.2)
+FRESHNESS_BOUNDS_HOURS = [1, 6, 24, 72]
+FRESHNESS_VALUES = [1.0, 0.9, 0.7, 0.5, 0.2]
+FRESHNESS_FINAL_BUCKET = len(FRESHNESS_BOUNDS_HOURS)
+FRESHNESS_BUCKETS = {value: bucket for bucket, value in enumerate(FRESHNESS_VALUES)}
+
+# Lower score bounds of P2, P1 and P0
+PRIORITY_BINS = [40, 60, 80]
+
+
 class DiscoveryRanker:
     """Ranks discovered URLs using multiple signals."""
     
@@ -44,6 +77,11 @@ class DiscoveryRanker:
             r'/datasets?/',
         ]
         
+        # Precompiled path alternation and suffix tuple shared by the
+        # content readiness and link yield signals
+        self._doc_path_re = re.compile('|'.join(self.doc_patterns), re.IGNORECASE)
+        self._doc_suffixes = tuple(f'.{ext}' for ext in self.config.doc_extensions)
+        
         # Suspicious TLDs (small penalty)
         self.suspicious_tlds = {
             'tk', 'ml', 'ga', 'cf', 'tk', 'ml', 'ga', 'cf'
@@ -54,12 +92,46 @@ class DiscoveryRanker:
             'adult', 'porn', 'xxx', 'sex', 'dating', 'escort',
             'for-sale', 'forsale', 'buy-now', 'purchase'
         }
+        
+        # Malware-like URL patterns (large safety penalty)
+        self.malware_patterns = ('malware', 'virus', 'trojan')
+        
+        # TLDs that tend to carry fresh projects
+        self.new_tlds = {'app', 'dev', 'io', 'ai', 'co'}
+        self.rare_tlds = {'app', 'dev', 'io', 'ai', 'co', 'tech', 'online'}
+        
+        # Host substrings used by the host-derived signals
+        self.novel_host_patterns = ('new', 'beta', 'test', 'staging')
+        self.docs_host_patterns = ('docs', 'documentation', 'help', 'support')
+        self.institutional_host_patterns = ('.gov', '.org', '.edu', '.mil')
+        self.media_host_patterns = ('news', 'media', 'press', 'journal')
+        
+        # Focus-area keywords for the topic boost (customize as needed)
+        self.topic_boost_keywords = {
+            'government', 'policy', 'research', 'data', 'transparency',
+            'civic', 'public', 'open', 'democracy', 'accountability'
+        }
+        
+        self.source_reliability = {
+            'ct': 1.0,    # Certificate Transparency - highest
+            'rss': 0.9,   # RSS feeds - very high
+            'cc': 0.7,    # Common Crawl - good
+            'seed': 0.8,  # Seed URLs - high
+        }
+        
+        # Host components memoized for the current ranking run
+        self._host_cache: Dict[str, HostSignals] = {}
+        
+        # picked_at days whose rows were (re)scored, for the day summary and stats snapshots
+        self.touched_dates: Set[date] = set()
+        self.last_avg_score = 0.0  # Average discovery score after the last rank_urls
     
     def compute_discovery_score(self, url: str, host: str, tld: str, 
                               parking_score: float, novelty_score: float,
                               source: str, seen_at: datetime) -> Tuple[float, DiscoverySignals]:
         """Compute discovery score (0-100) for a URL."""
         signals = DiscoverySignals()
+        doc_features = self._url_doc_features(url)
         
         # 1. Unseen Likelihood (0-1)
         signals.unseen_likelihood = self._compute_unseen_likelihood(
@@ -71,11 +143,11 @@ class DiscoveryRanker:
         
         # 3. Content Readiness (0-1)
         signals.content_readiness = self._compute_content_readiness(
-            url, parking_score, host
+            url, parking_score, host, doc_features
         )
         
         # 4. Link Yield Potential (0-1)
-        signals.link_yield = self._compute_link_yield(url, host)
+        signals.link_yield = self._compute_link_yield(url, host, doc_features)
         
         # 5. Source Reliability (0-1)
         signals.source_reliability = self._compute_source_reliability(source)
@@ -106,6 +178,48 @@ class DiscoveryRanker:
         
         return score, signals
     
+    def _url_doc_features(self, url: str) -> Tuple[bool, bool]:
+        """Return (has document-like path, has document extension) for a URL."""
+        has_doc_path = self._doc_path_re.search(url) is not None
+        has_doc_ext = url.lower().endswith(self._doc_suffixes)
+        return has_doc_path, has_doc_ext
+    
+    def host_signals(self, host: str) -> HostSignals:
+        """Return the host-only signal components, computed once per host per run."""
+        cached = self._host_cache.get(host)
+        if cached is None:
+            host_lower = host.lower()
+            cached = HostSignals(
+                # Subdomains often indicate new projects
+                unseen_likelihood=0.1 if host.count('.') >= 2 else 0.0,
+                # Subdomain patterns
+                host_novelty=0.2 if any(p in host for p in self.novel_host_patterns) else 0.0,
+                # Sitemap presence (heuristic based on common patterns)
+                content_readiness=0.1 if any(p in host for p in self.docs_host_patterns) else 0.0,
+                # Government/org and news/media patterns
+                link_yield=(
+                    (0.2 if any(p in host for p in self.institutional_host_patterns) else 0.0) +
+                    (0.1 if any(p in host for p in self.media_host_patterns) else 0.0)
+                ),
+                safety_keywords=frozenset(
+                    k for k in self.safety_penalty_keywords if k in host_lower
+                ),
+                topic_keywords=frozenset(
+                    k for k in self.topic_boost_keywords if k in host_lower
+                ),
+            )
+            self._host_cache[host] = cached
+        return cached
+    
+    def pop_touched_dates(self) -> Set[date]:
+        """Return and forget the days touched since the last call."""
+        touched, self.touched_dates = self.touched_dates, set()
+        return touched
+    
+    def reset_host_cache(self) -> None:
+        """Forget memoized host components (called at the start of each run)."""
+        self._host_cache.clear()
+    
     def _compute_unseen_likelihood(self, host: str, tld: str, 
                                  parking_score: float, novelty_score: float) -> float:
         """Compute how likely this is to be unseen content."""
@@ -118,12 +232,11 @@ class DiscoveryRanker:
         score += (1.0 - parking_score) * 0.3
         
         # New TLDs often have fresh content
-        if tld in ['app', 'dev', 'io', 'ai', 'co']:
+        if tld in self.new_tlds:
             score += 0.2
         
-        # Subdomains often indicate new projects
-        if host.count('.') >= 2:
-            score += 0.1
+        # Host component (subdomains)
+        score += self.host_signals(host).unseen_likelihood
         
         return min(1.0, score)
     
@@ -135,67 +248,64 @@ class DiscoveryRanker:
         score += novelty_score * 0.5
         
         # Rare TLDs
-        if tld in ['app', 'dev', 'io', 'ai', 'co', 'tech', 'online']:
+        if tld in self.rare_tlds:
             score += 0.3
         
-        # Subdomain patterns
-        if any(pattern in host for pattern in ['new', 'beta', 'test', 'staging']):
-            score += 0.2
+        # Host component (subdomain patterns)
+        score += self.host_signals(host).host_novelty
         
         return min(1.0, score)
     
-    def _compute_content_readiness(self, url: str, parking_score: float, host: str) -> float:
+    def _compute_content_readiness(self, url: str, parking_score: float, host: str,
+                                   doc_features: Optional[Tuple[bool, bool]] = None) -> float:
         """Compute content readiness score."""
+        if doc_features is None:
+            doc_features = self._url_doc_features(url)
+        has_doc_path, has_doc_ext = doc_features
+        
         score = 0.0
         
         # Low parking score = real content
         score += (1.0 - parking_score) * 0.6
         
         # Document-like paths
-        if any(re.search(pattern, url, re.IGNORECASE) for pattern in self.doc_patterns):
+        if has_doc_path:
             score += 0.3
         
         # File extensions
-        if any(url.lower().endswith(f'.{ext}') for ext in config.doc_extensions):
+        if has_doc_ext:
             score += 0.2
         
-        # Sitemap presence (heuristic based on common patterns)
-        if any(pattern in host for pattern in ['docs', 'documentation', 'help', 'support']):
-            score += 0.1
+        # Host component (docs/help hosts)
+        score += self.host_signals(host).content_readiness
         
         return min(1.0, score)
     
-    def _compute_link_yield(self, url: str, host: str) -> float:
+    def _compute_link_yield(self, url: str, host: str,
+                            doc_features: Optional[Tuple[bool, bool]] = None) -> float:
         """Compute link yield potential."""
+        if doc_features is None:
+            doc_features = self._url_doc_features(url)
+        has_doc_path, has_doc_ext = doc_features
+        
         score = 0.0
         
         # Document-like paths
-        if any(re.search(pattern, url, re.IGNORECASE) for pattern in self.doc_patterns):
+        if has_doc_path:
             score += 0.4
         
         # File extensions
-        if any(url.lower().endswith(f'.{ext}') for ext in config.doc_extensions):
+        if has_doc_ext:
             score += 0.3
         
-        # Government/org patterns
-        if any(pattern in host for pattern in ['.gov', '.org', '.edu', '.mil']):
-            score += 0.2
-        
-        # News/media patterns
-        if any(pattern in host for pattern in ['news', 'media', 'press', 'journal']):
-            score += 0.1
+        # Host component (government/org and news/media patterns)
+        score += self.host_signals(host).link_yield
         
         return min(1.0, score)
     
     def _compute_source_reliability(self, source: str) -> float:
         """Compute source reliability score."""
-        reliability_map = {
-            'ct': 1.0,    # Certificate Transparency - highest
-            'rss': 0.9,   # RSS feeds - very high
-            'cc': 0.7,    # Common Crawl - good
-            'seed': 0.8,  # Seed URLs - high
-        }
-        return reliability_map.get(source, 0.5)
+        return self.source_reliability.get(source, 0.5)
     
     def _compute_freshness(self, seen_at: datetime) -> float:
         """Compute freshness score based on when URL was seen."""
@@ -213,45 +323,145 @@ class DiscoveryRanker:
         else:
             return 0.2
     
+    def freshness_bucket(self, seen_at: datetime, now: Optional[datetime] = None) -> int:
+        """Index into FRESHNESS_VALUES for a URL seen at ``seen_at``."""
+        if now is None:
+            now = datetime.now(seen_at.tzinfo) if seen_at.tzinfo else datetime.now()
+        hours_ago = (now - seen_at).total_seconds() / 3600
+        return bisect.bisect_left(FRESHNESS_BOUNDS_HOURS, hours_ago)
+    
     def _compute_safety(self, url: str, host: str, tld: str) -> float:
         """Compute safety score."""
         score = 1.0
         
         # Check for safety penalty keywords
         url_lower = url.lower()
-        host_lower = host.lower()
-        
-        for keyword in self.safety_penalty_keywords:
-            if keyword in url_lower or keyword in host_lower:
-                score -= 0.3
+        score -= 0.3 * self._keyword_hits(
+            url_lower, self.safety_penalty_keywords, self.host_signals(host).safety_keywords
+        )
         
         # Suspicious TLD penalty
         if tld in self.suspicious_tlds:
             score -= 0.1
         
         # Malware-like patterns
-        if any(pattern in url_lower for pattern in ['malware', 'virus', 'trojan']):
+        if any(pattern in url_lower for pattern in self.malware_patterns):
             score -= 0.5
         
         return max(0.0, score)
     
     def _compute_topic_boost(self, url: str, host: str) -> float:
         """Compute topic boost score (optional)."""
-        # This can be customized based on your focus areas
-        boost_keywords = {
-            'government', 'policy', 'research', 'data', 'transparency',
-            'civic', 'public', 'open', 'democracy', 'accountability'
-        }
+        boost = 0.1 * self._keyword_hits(
+            url.lower(), self.topic_boost_keywords, self.host_signals(host).topic_keywords
+        )
         
-        url_lower = url.lower()
-        host_lower = host.lower()
+        return min(1.0, boost)
+    
+    def _keyword_hits(self, url_lower: str, keywords: set, host_hits: FrozenSet[str]) -> int:
+        """Count keywords found in the host (precomputed) or in the URL."""
+        return len(host_hits) + sum(
+            1 for keyword in keywords if keyword not in host_hits and keyword in url_lower
+        )
+    
+    def rank_weight_vector(self) -> np.ndarray:
+        """Ranking weights in SIGNAL_NAMES order."""
+        return np.array([
+            self.config.rank_weights_unseen,
+            self.config.rank_weights_host_novelty,
+            self.config.rank_weights_content_ready,
+            self.config.rank_weights_link_yield,
+            self.config.rank_weights_source_rel,
+            self.config.rank_weights_freshness,
+            self.config.rank_weights_safety,
+            self.config.rank_weights_topic,
+        ], dtype=np.float64)
+    
+    @traced('rank.score_batch')
+    def score_batch(self, columns: Dict[str, Sequence[Any]]
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score many URLs at once.
+        
+        ``columns`` holds equal-length sequences keyed by ``url``, ``host``,
+        ``tld``, ``parking_score``, ``novelty_score``, ``source`` and
+        ``seen_at``. Returns ``(scores, priority_classes, signal_matrix)``
+        where ``signal_matrix`` has one column per entry in SIGNAL_NAMES.
+        Results match compute_discovery_score within float tolerance.
+        """
+        urls = list(columns['url'])
+        hosts = list(columns['host'])
+        tlds = [tld or '' for tld in columns['tld']]
+        sources = list(columns['source'])
+        seen_at = list(columns['seen_at'])
+        n = len(urls)
+        current_span().set(rows=n)
+        
+        parking = np.asarray(columns['parking_score'], dtype=np.float64)
+        novelty = np.asarray(columns['novelty_score'], dtype=np.float64)
+        
+        def flags(values) -> np.ndarray:
+            return np.fromiter(values, dtype=np.float64, count=n)
+        
+        # Per-URL string features (the only part that cannot be vectorized)
+        doc_features = [self._url_doc_features(url) for url in urls]
+        doc_path = flags(f[0] for f in doc_features)
+        doc_ext = flags(f[1] for f in doc_features)
+        urls_lower = [url.lower() for url in urls]
+        host_parts = [self.host_signals(host) for host in hosts]
+        
+        new_tld = flags(tld in self.new_tlds for tld in tlds)
+        rare_tld = flags(tld in self.rare_tlds for tld in tlds)
+        suspicious_tld = flags(tld in self.suspicious_tlds for tld in tlds)
+        host_unseen = flags(h.unseen_likelihood for h in host_parts)
+        host_novelty = flags(h.host_novelty for h in host_parts)
+        host_content = flags(h.content_readiness for h in host_parts)
+        host_link_yield = flags(h.link_yield for h in host_parts)
+        unsafe_hits = flags(
+            self._keyword_hits(u, self.safety_penalty_keywords, h.safety_keywords)
+            for u, h in zip(urls_lower, host_parts)
+        )
+        malware = flags(any(p in u for p in self.malware_patterns) for u in urls_lower)
+        topic_hits = flags(
+            self._keyword_hits(u, self.topic_boost_keywords, h.topic_keywords)
+            for u, h in zip(urls_lower, host_parts)
+        )
+        reliability = flags(self.source_reliability.get(src, 0.5) for src in sources)
+        
+        # Freshness: hours since seen, bucketed
+        now_aware = datetime.now(timezone.utc)
+        now_naive = datetime.now()
+        hours_ago = flags(
+            ((now_aware if ts.tzinfo else now_naive) - ts).total_seconds() / 3600
+            for ts in seen_at
+        )
+        freshness = np.asarray(FRESHNESS_VALUES)[
+            np.digitize(hours_ago, FRESHNESS_BOUNDS_HOURS, right=True)
+        ]
+        
+        signal_matrix = np.empty((n, len(SIGNAL_NAMES)), dtype=np.float64)
+        signal_matrix[:, 0] = np.minimum(
+            1.0, novelty * 0.4 + (1.0 - parking) * 0.3 + new_tld * 0.2 + host_unseen
+        )
+        signal_matrix[:, 1] = np.minimum(
+            1.0, novelty * 0.5 + rare_tld * 0.3 + host_novelty
+        )
+        signal_matrix[:, 2] = np.minimum(
+            1.0, (1.0 - parking) * 0.6 + doc_path * 0.3 + doc_ext * 0.2 + host_content
+        )
+        signal_matrix[:, 3] = np.minimum(
+            1.0, doc_path * 0.4 + doc_ext * 0.3 + host_link_yield
+        )
+        signal_matrix[:, 4] = reliability
+        signal_matrix[:, 5] = freshness
+        signal_matrix[:, 6] = np.maximum(
+            0.0, 1.0 - unsafe_hits * 0.3 - suspicious_tld * 0.1 - malware * 0.5
+        )
+        signal_matrix[:, 7] = np.minimum(1.0, topic_hits * 0.1)
         
-        boost = 0.0
-        for keyword in boost_keywords:
-            if keyword in url_lower or keyword in host_lower:
-                boost += 0.1
+        scores = np.clip(signal_matrix @ self.rank_weight_vector() * 100, 0.0, 100.0)
+        priority_classes = (3 - np.digitize(scores, PRIORITY_BINS)).astype(np.int16)
         
-        return min(1.0, boost)
+        return scores, priority_classes, signal_matrix
     
     def map_to_priority_class(self, score: float) -> int:
         """Map discovery score to priority class."""
@@ -264,8 +474,13 @@ class DiscoveryRanker:
         else:
             return 3  # P3
     
-    def compute_next_check_at(self, priority_class: int, current_time: datetime) -> Optional[datetime]:
-        """Compute next check time for P2/P3 items."""
+    def compute_next_check_at(self, priority_class: int, current_time: datetime,
+                              recheck_count: int = 0) -> Optional[datetime]:
+        """Compute next check time for P2/P3 items.
+        
+        The interval grows by ``backoff_multiplier`` for every recheck that
+        left the URL in P2/P3 (6h -> 12h -> 24h -> 48h for P2 by default).
+        """
         if priority_class in [0, 1]:  # P0/P1 don't need backoff
             return None
         
@@ -274,71 +489,191 @@ class DiscoveryRanker:
             hours = self.config.backoff_start_hours
         else:  # P3
             hours = self.config.backoff_start_hours * self.config.backoff_multiplier
+        hours *= self.config.backoff_multiplier ** recheck_count
         
         # Cap at max hours
         hours = min(hours, self.config.backoff_max_hours)
         
         return current_time + timedelta(hours=hours)
     
-    async def rank_urls(self, min_publish_score: float = None, 
-                       profile_score: float = None) -> Dict[str, int]:
-        """Rank all URLs in discovered_kept table."""
-        if min_publish_score is None:
-            min_publish_score = self.config.min_publish_score
-        if profile_score is None:
-            profile_score = self.config.profile_score
+    @traced('rank.read_chunk')
+    def _read_rank_chunk(self, after_id: int, chunk_size: int) -> Dict[str, list]:
+        """Read the next id-ordered chunk of unranked URLs as columns."""
+        session = db.get_session()
+        try:
+            rows = session.query(
+                DiscoveredKept.id,
+                DiscoveredKept.url,
+                DiscoveredKept.host,
+                DiscoveredKept.tld,
+                DiscoveredKept.parking_score,
+                DiscoveredKept.novelty_score,
+                DiscoveredKept.picked_at,
+            ).filter(
+                DiscoveredKept.needs_rank.is_(True),  # Only rank unranked URLs
+                DiscoveredKept.id > after_id
+            ).order_by(DiscoveredKept.id).limit(chunk_size).all()
+        finally:
+            session.close()
+        
+        return {
+            'id': [r.id for r in rows],
+            'url': [r.url for r in rows],
+            'host': [r.host for r in rows],
+            'tld': [r.tld for r in rows],
+            'parking_score': [r.parking_score for r in rows],
+            'novelty_score': [r.novelty_score for r in rows],
+            'source': ['unknown'] * len(rows),  # Source not stored in discovered_kept
+            'seen_at': [r.picked_at for r in rows],
+        }
+    
+    @traced('rank.write_chunk')
+    def _write_rank_chunk(self, scored: Tuple[list, list, list, list, list], now: datetime) -> int:
+        """Write one scored chunk back to discovered_kept by primary key."""
+        ids, picked_at, scores, priority_classes, signal_rows = scored
+        mappings = [
+            {
+                'id': url_id,
+                'picked_at': url_picked_at,  # Partition key, part of the table's primary key
+                'discovery_score': score,
+                'priority_class': priority_class,
+                'signals': dict(zip(SIGNAL_NAMES, row)),
+                'next_check_at': self.compute_next_check_at(priority_class, now),
+                'freshness_bucket': FRESHNESS_BUCKETS[row[5]],
+                'needs_rank': False,
+            }
+            for url_id, url_picked_at, score, priority_class, row in zip(
+                ids, picked_at, scores, priority_classes, signal_rows
+            )
+        ]
         
-        # Get all URLs that need ranking
         session = db.get_session()
         try:
-            urls = session.query(DiscoveredKept).filter(
-                DiscoveredKept.discovery_score == 0.0  # Only rank unranked URLs
-            ).all()
-            
-            print(f"Ranking {len(urls)} URLs...")
+            session.execute(update(DiscoveredKept), mappings)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        
+        return len(mappings)
+    
+    async def _rank_urls_parallel(self, workers: int, chunk_size: int) -> int:
+        """Rank unranked URLs with overlapping DB reads, scoring and writes.
+        
+        While chunk N+1 is being read, up to ``workers`` earlier chunks are
+        scored in worker processes and the oldest scored chunk is flushed
+        by a writer thread.
+        """
+        loop = asyncio.get_running_loop()
+        now = datetime.now()
+        ranked = 0
+        
+        with ThreadPoolExecutor(max_workers=2) as io_pool, \
+                ProcessPoolExecutor(max_workers=workers) as cpu_pool:
+            pending_scores = deque()
+            pending_write = None
             
-            # Process each URL
-            for url_record in urls:
-                score, signals = self.compute_discovery_score(
-                    url_record.url,
-                    url_record.host,
-                    url_record.tld or '',
-                    url_record.parking_score,
-                    url_record.novelty_score,
-                    'unknown',  # Source not stored in discovered_kept
-                    url_record.picked_at
-                )
+            chunk = await loop.run_in_executor(io_pool, self._read_rank_chunk, 0, chunk_size)
+            while chunk['id'] or pending_scores:
+                next_read = None
+                if chunk['id']:
+                    self.touched_dates.update(utc_day(ts) for ts in chunk['seen_at'])
+                    pending_scores.append(loop.run_in_executor(cpu_pool, _score_chunk, chunk))
+                    next_read = loop.run_in_executor(
+                        io_pool, self._read_rank_chunk, chunk['id'][-1], chunk_size
+                    )
                 
-                priority_class = self.map_to_priority_class(score)
-                next_check_at = self.compute_next_check_at(priority_class, datetime.now())
+                # Keep every worker busy; drain once reading is done
+                if len(pending_scores) >= workers or next_read is None:
+                    scored = await pending_scores.popleft()
+                    if pending_write is not None:
+                        ranked += await pending_write
+                    pending_write = loop.run_in_executor(
+                        io_pool, self._write_rank_chunk, scored, now
+                    )
+                    print(f"Ranked {ranked} URLs...")
                 
-                # Update the record
-                url_record.discovery_score = score
-                url_record.priority_class = priority_class
-                url_record.signals = {
-                    'unseen_likelihood': signals.unseen_likelihood,
-                    'host_novelty': signals.host_novelty,
-                    'content_readiness': signals.content_readiness,
-                    'link_yield': signals.link_yield,
-                    'source_reliability': signals.source_reliability,
-                    'freshness': signals.freshness,
-                    'safety': signals.safety,
-                    'topic_boost': signals.topic_boost,
-                }
-                url_record.next_check_at = next_check_at
-            
-            session.commit()
+                chunk = await next_read if next_read is not None else {'id': []}
             
-            # Count by priority class
-            counts = {
-                'P0': session.query(DiscoveredKept).filter(DiscoveredKept.priority_class == 0).count(),
-                'P1': session.query(DiscoveredKept).filter(DiscoveredKept.priority_class == 1).count(),
-                'P2': session.query(DiscoveredKept).filter(DiscoveredKept.priority_class == 2).count(),
-                'P3': session.query(DiscoveredKept).filter(DiscoveredKept.priority_class == 3).count(),
-            }
+            if pending_write is not None:
+                ranked += await pending_write
+        
+        add_rows(rows_in=ranked, rows_out=ranked)
+        return ranked
+    
+    @traced('rank.serial')
+    def _rank_urls_serial(self, session) -> None:
+        """Rank all unranked URLs in a single batch within ``session``."""
+        urls = session.query(DiscoveredKept).filter(
+            DiscoveredKept.needs_rank.is_(True)  # Only rank unranked URLs
+        ).all()
+        
+        print(f"Ranking {len(urls)} URLs...")
+        
+        # Score all URLs in one batch
+        scores, priority_classes, signal_matrix = self.score_batch({
+            'url': [r.url for r in urls],
+            'host': [r.host for r in urls],
+            'tld': [r.tld for r in urls],
+            'parking_score': [r.parking_score for r in urls],
+            'novelty_score': [r.novelty_score for r in urls],
+            'source': ['unknown'] * len(urls),  # Source not stored in discovered_kept
+            'seen_at': [r.picked_at for r in urls],
+        })
+        now = datetime.now()
+        
+        for url_record, score, priority_class, row in zip(
+            urls, scores.tolist(), priority_classes.tolist(), signal_matrix.tolist()
+        ):
+            # Update the record
+            url_record.discovery_score = score
+            url_record.priority_class = priority_class
+            url_record.signals = dict(zip(SIGNAL_NAMES, row))
+            url_record.next_check_at = self.compute_next_check_at(priority_class, now)
+            url_record.freshness_bucket = FRESHNESS_BUCKETS[row[5]]
+            url_record.needs_rank = False
+            self.touched_dates.add(utc_day(url_record.picked_at))
+        
+        session.commit()
+        add_rows(rows_in=len(urls), rows_out=len(urls))
+    
+    @traced('rank.run')
+    async def rank_urls(self, min_publish_score: float = None, 
+                       profile_score: float = None, workers: int = 1,
+                       chunk_size: int = None) -> Dict[str, int]:
+        """Rank all URLs in discovered_kept table.
+        
+        With ``workers`` > 1, URLs are read in id-range chunks and scored in
+        a process pool while the previous chunks are written back.
+        """
+        if min_publish_score is None:
+            min_publish_score = self.config.min_publish_score
+        if profile_score is None:
+            profile_score = self.config.profile_score
+        if chunk_size is None:
+            chunk_size = self.config.rank_chunk_size
+        
+        self.reset_host_cache()
+        session = async_db.get_session()
+        try:
+            if workers > 1:
+                print(f"Ranking unranked URLs with {workers} workers (chunks of {chunk_size})...")
+                ranked = await self._rank_urls_parallel(workers, chunk_size)
+                print(f"Ranked {ranked} URLs")
+            else:
+                # The ORM unit of work runs on the AsyncSession's sync facade
+                await session.run_sync(self._rank_urls_serial)
             
-            # Compute average score
-            avg_score = session.query(db.func.avg(DiscoveredKept.discovery_score)).scalar() or 0.0
+            # Priority counts and average score in one scan
+            totals = (await session.execute(select(
+                *[func.count().filter(DiscoveredKept.priority_class == p) for p in range(4)],
+                func.avg(DiscoveredKept.discovery_score)
+            ))).one()
+            counts = {f'P{p}': totals[p] for p in range(4)}
+            avg_score = float(totals[4] or 0.0)
+            self.last_avg_score = avg_score
             
             print(f"Ranking complete:")
             print(f"  P0 (≥80): {counts['P0']} URLs")
@@ -350,31 +685,144 @@ class DiscoveryRanker:
             return counts
             
         finally:
-            session.close()
+            await session.close()
     
-    async def get_publishable_urls(self, min_score: float = None) -> List[DiscoveredKept]:
-        """Get URLs that should be published (P0/P1)."""
+    @traced('rank.redecay')
+    async def redecay_freshness(self, now: Optional[datetime] = None) -> int:
+        """Re-apply freshness decay to ranked URLs whose age bucket changed.
+        
+        Only the freshness term is recomputed; the other sub-signals are
+        read back from ``signals`` and recombined with the current weights.
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+        
+        # A row is stale once it is older than the upper bound of its bucket
+        crossed = or_(*[
+            and_(
+                DiscoveredKept.freshness_bucket == bucket,
+                DiscoveredKept.picked_at < now - timedelta(hours=bound),
+            )
+            for bucket, bound in enumerate(FRESHNESS_BOUNDS_HOURS)
+        ])
+        
+        session = async_db.get_session()
+        try:
+            rows = (await session.execute(select(
+                DiscoveredKept.id,
+                DiscoveredKept.picked_at,
+                DiscoveredKept.signals,
+                DiscoveredKept.recheck_count,
+            ).where(
+                DiscoveredKept.needs_rank.is_(False),
+                DiscoveredKept.freshness_bucket < FRESHNESS_FINAL_BUCKET,
+                crossed,
+            ))).all()
+            
+            if not rows:
+                return 0
+            
+            buckets = [self.freshness_bucket(r.picked_at, now) for r in rows]
+            signal_matrix = np.array(
+                [[(r.signals or {}).get(name, 0.0) for name in SIGNAL_NAMES] for r in rows],
+                dtype=np.float64,
+            )
+            signal_matrix[:, SIGNAL_NAMES.index('freshness')] = np.asarray(FRESHNESS_VALUES)[buckets]
+            scores = np.clip(signal_matrix @ self.rank_weight_vector() * 100, 0.0, 100.0)
+            priority_classes = 3 - np.digitize(scores, PRIORITY_BINS)
+            
+            await session.execute(update(DiscoveredKept), [
+                {
+                    'id': r.id,
+                    'picked_at': r.picked_at,
+                    'discovery_score': score,
+                    'priority_class': priority_class,
+                    'signals': dict(zip(SIGNAL_NAMES, signal_row)),
+                    'freshness_bucket': bucket,
+                    # Keep the URL's place in the recheck backoff schedule
+                    'next_check_at': self.compute_next_check_at(priority_class, now, r.recheck_count),
+                }
+                for r, bucket, score, priority_class, signal_row in zip(
+                    rows, buckets, scores.tolist(), priority_classes.tolist(),
+                    signal_matrix.tolist()
+                )
+            ])
+            await session.commit()
+            self.touched_dates.update(utc_day(r.picked_at) for r in rows)
+            
+            print(f"Re-decayed freshness for {len(rows)} URLs")
+            return len(rows)
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+    
+    async def get_publishable_urls(self, min_score: float = None, limit: int = None,
+                                   per_host_limit: int = None,
+                                   batch_size: int = 1000) -> AsyncIterator[Row]:
+        """Stream URLs that should be published (P0/P1), best first.
+        
+        Yields lightweight rows (id, url, host, tld, parking_score,
+        novelty_score, discovery_score, priority_class, signals, picked_at)
+        ordered by ``discovery_score DESC, id`` from a server-side cursor.
+        ``limit`` and ``per_host_limit`` are applied in SQL.
+        """
         if min_score is None:
             min_score = self.config.min_publish_score
         
-        session = db.get_session()
+        columns = [
+            DiscoveredKept.id,
+            DiscoveredKept.url,
+            DiscoveredKept.host,
+            DiscoveredKept.tld,
+            DiscoveredKept.parking_score,
+            DiscoveredKept.novelty_score,
+            DiscoveredKept.discovery_score,
+            DiscoveredKept.priority_class,
+            DiscoveredKept.signals,
+            DiscoveredKept.picked_at,
+        ]
+        publishable = [
+            DiscoveredKept.discovery_score >= min_score,
+            DiscoveredKept.priority_class.in_([0, 1]),  # P0 and P1 only
+        ]
+        
+        if per_host_limit:
+            # Rank URLs within each host and keep the best per_host_limit
+            host_rank = func.row_number().over(
+                partition_by=DiscoveredKept.host,
+                order_by=(DiscoveredKept.discovery_score.desc(), DiscoveredKept.id)
+            ).label('host_rank')
+            ranked = select(*columns, host_rank).where(*publishable).subquery()
+            query = select(
+                *[ranked.c[column.key] for column in columns]
+            ).where(
+                ranked.c.host_rank <= per_host_limit
+            ).order_by(ranked.c.discovery_score.desc(), ranked.c.id)
+        else:
+            query = select(*columns).where(*publishable).order_by(
+                DiscoveredKept.discovery_score.desc(), DiscoveredKept.id
+            )
+        
+        if limit:
+            query = query.limit(limit)
+        
+        session = async_db.get_session()
         try:
-            urls = session.query(DiscoveredKept).filter(
-                DiscoveredKept.discovery_score >= min_score,
-                DiscoveredKept.priority_class.in_([0, 1])  # P0 and P1 only
-            ).order_by(DiscoveredKept.discovery_score.desc()).all()
-            
-            return urls
+            result = await session.stream(query.execution_options(yield_per=batch_size))
+            async for row in result:
+                yield row
         finally:
-            session.close()
+            await session.close()
     
     async def update_run_manifest(self, run_date: str, counts: Dict[str, int], avg_score: float):
         """Update run manifest with ranking metrics."""
-        session = db.get_session()
+        session = async_db.get_session()
         try:
-            manifest = session.query(RunManifest).filter(
-                RunManifest.run_date == run_date
-            ).first()
+            manifest = await session.scalar(
+                select(RunManifest).where(RunManifest.run_date == run_date).limit(1)
+            )
             
             if manifest:
                 manifest.p0_count = counts['P0']
@@ -382,10 +830,17 @@ class DiscoveryRanker:
                 manifest.p2_count = counts['P2']
                 manifest.p3_count = counts['P3']
                 manifest.avg_score = avg_score
-                session.commit()
+                await session.commit()
         finally:
-            session.close()
+            await session.close()
 
 
 # Global ranker instance
 ranker = DiscoveryRanker()
+
+
+def _score_chunk(columns: Dict[str, list]) -> Tuple[list, list, list, list, list]:
+    """Process pool entry point: score one chunk with the module ranker."""
+    scores, priority_classes, signal_matrix = ranker.score_batch(columns)
+    return (columns['id'], columns['seen_at'], scores.tolist(), priority_classes.tolist(),
+            signal_matrix.tolist())
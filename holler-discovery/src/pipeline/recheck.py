@@ -0,0 +1,117 @@
+"""Backoff rechecks for P2/P3 URLs."""
+
+from datetime import datetime, timezone
+from typing import Dict
+
+from ..config import config
+from ..db import db, utc_day, DiscoveredKept
+from .day_summary import refresh_day_summaries
+from .manifest import refresh_stats_snapshots
+from .ranker import ranker, SIGNAL_NAMES, FRESHNESS_BUCKETS
+
+
+class RecheckWorker:
+    """Re-scores P2/P3 URLs whose next_check_at is due.
+    
+    Due rows are leased in batches with ``SELECT ... FOR UPDATE SKIP LOCKED``
+    so several workers can drain the queue concurrently; each batch is
+    re-scored and committed in the same transaction that holds the locks.
+    """
+    
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or config.recheck_batch_size
+    
+    def recheck_batch(self, now: datetime = None) -> Dict[str, int]:
+        """Lease, re-score and reschedule one batch of due URLs."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        
+        # Host components are memoized per run; a long-lived worker refreshes them per batch
+        ranker.reset_host_cache()
+        session = db.get_session()
+        
+        try:
+            records = session.query(DiscoveredKept).filter(
+                DiscoveredKept.next_check_at <= now,
+                DiscoveredKept.priority_class.in_([2, 3]),  # P2 and P3 only
+                DiscoveredKept.needs_rank.is_(False)
+            ).order_by(
+                DiscoveredKept.next_check_at
+            ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+            
+            if not records:
+                session.commit()
+                return {'checked': 0, 'promoted': 0}
+            
+            scores, priority_classes, signal_matrix = ranker.score_batch({
+                'url': [r.url for r in records],
+                'host': [r.host for r in records],
+                'tld': [r.tld for r in records],
+                'parking_score': [r.parking_score for r in records],
+                'novelty_score': [r.novelty_score for r in records],
+                'source': ['unknown'] * len(records),  # Source not stored in discovered_kept
+                'seen_at': [r.picked_at for r in records],
+            })
+            
+            promoted = 0
+            for record, score, priority_class, row in zip(
+                records, scores.tolist(), priority_classes.tolist(), signal_matrix.tolist()
+            ):
+                # Any score or class change moves the day's stats and summary
+                if score != record.discovery_score or priority_class != record.priority_class:
+                    ranker.touched_dates.add(utc_day(record.picked_at))
+                
+                if priority_class in [0, 1]:
+                    promoted += 1
+                    record.recheck_count = 0
+                else:
+                    # Still P2/P3: back off further before the next check
+                    record.recheck_count = (record.recheck_count or 0) + 1
+                
+                record.discovery_score = score
+                record.priority_class = priority_class
+                record.signals = dict(zip(SIGNAL_NAMES, row))
+                record.freshness_bucket = FRESHNESS_BUCKETS[row[5]]
+                record.next_check_at = ranker.compute_next_check_at(
+                    priority_class, now, record.recheck_count
+                )
+            
+            # Committing releases the row locks
+            session.commit()
+            
+            return {'checked': len(records), 'promoted': promoted}
+            
+        except Exception as e:
+            session.rollback()
+            print(f"Error during recheck: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def run(self, max_batches: int = None) -> Dict[str, int]:
+        """Drain due URLs batch by batch until none are left."""
+        totals = {'checked': 0, 'promoted': 0}
+        batches = 0
+        
+        while max_batches is None or batches < max_batches:
+            result = self.recheck_batch()
+            if result['checked'] == 0:
+                break
+            
+            batches += 1
+            totals['checked'] += result['checked']
+            totals['promoted'] += result['promoted']
+            print(f"Rechecked {totals['checked']} URLs ({totals['promoted']} promoted to P0/P1)...")
+        
+        touched = ranker.pop_touched_dates()
+        if touched:
+            refresh_day_summaries(touched)
+            refresh_stats_snapshots(touched)
+        
+        return totals
+
+
+def recheck_due_urls(batch_size: int = None, max_batches: int = None) -> Dict[str, int]:
+    """Convenience function to drain the P2/P3 recheck queue."""
+    worker = RecheckWorker(batch_size)
+    return worker.run(max_batches)
@@ -1,168 +1,195 @@
 """Sitemap generation utilities."""
 
-import gzip
+import hashlib
+import json
 import os
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Any
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+from datetime import datetime, timezone
+from typing import Iterable, List, Dict, Any
+from xml.sax.saxutils import escape
 
 from ..config import config
-from ..db import db, DiscoveredKept, RunManifest
-from sqlalchemy import func
+from .day_summary import DaySummaryManager
+from .metrics import add_rows
+from .tracing import current_span, traced
+from .stream_writer import StreamWriter, atomic_write, siblings_match
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+SITEMAP_MANIFEST_NAME = '.sitemap-manifest.json'
+DEFAULT_SHARD = 'discover'  # Group for entries without a month
+URLSET_HEADER = f'<?xml version="1.0" encoding="utf-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+URLSET_FOOTER = '</urlset>\n'
+
+
+def format_lastmod(lastmod: datetime = None) -> str:
+    """W3C datetime in UTC, as sitemaps expect."""
+    if lastmod is None:
+        lastmod = datetime.utcnow()
+    elif lastmod.tzinfo is not None:
+        lastmod = lastmod.astimezone(timezone.utc)
+    return lastmod.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def format_url_entry(url: str, lastmod: datetime = None,
+                     changefreq: str = "daily", priority: str = "0.8") -> str:
+    """Serialize one <url> record."""
+    return (
+        f"  <url>\n"
+        f"    <loc>{escape(url)}</loc>\n"
+        f"    <lastmod>{format_lastmod(lastmod)}</lastmod>\n"
+        f"    <changefreq>{changefreq}</changefreq>\n"
+        f"    <priority>{priority}</priority>\n"
+        f"  </url>\n"
+    )
+
+
+class SitemapShardWriter:
+    """Write <url> records straight into gzip sitemap shards.
+    
+    A new shard is started whenever the next record would exceed either the
+    URL limit or the uncompressed byte limit of the current one.
+    """
+    
+    def __init__(self, sitemaps_dir: Path, prefix: str = "sitemap-discover",
+                 max_urls: int = None, max_bytes: int = None):
+        self.sitemaps_dir = Path(sitemaps_dir)
+        self.prefix = prefix
+        self.max_urls = max_urls or config.sitemap_urls_per_file
+        self.max_bytes = max_bytes or config.sitemap_max_bytes
+        
+        self.shard_files: List[str] = []  # Relative to the output root
+        self._writer = None
+        self._urls = 0
+        self._bytes = 0
+    
+    def _open_shard(self) -> None:
+        filename = f"{self.prefix}-{len(self.shard_files) + 1:03d}.xml.gz"
+        self._writer = StreamWriter(self.sitemaps_dir / filename).__enter__()
+        self._writer.write(URLSET_HEADER)
+        self._urls = 0
+        self._bytes = len(URLSET_HEADER.encode('utf-8'))
+        self.shard_files.append(f"{self.sitemaps_dir.name}/{filename}")
+    
+    def _close_shard(self) -> None:
+        self._writer.write(URLSET_FOOTER)
+        self._writer.__exit__(None, None, None)
+        self._writer = None
+        print(f"Generated sitemap: {self.sitemaps_dir.parent / self.shard_files[-1]} ({self._urls} URLs)")
+    
+    def add(self, url: str, lastmod: datetime = None) -> None:
+        """Append one URL, rolling to a new shard at either limit."""
+        entry = format_url_entry(url, lastmod)
+        entry_bytes = len(entry.encode('utf-8'))
+        
+        if self._writer is not None and (
+            self._urls >= self.max_urls
+            or self._bytes + entry_bytes + len(URLSET_FOOTER) > self.max_bytes
+        ):
+            self._close_shard()
+        if self._writer is None:
+            self._open_shard()
+        
+        self._writer.write(entry)
+        self._urls += 1
+        self._bytes += entry_bytes
+    
+    def __enter__(self) -> 'SitemapShardWriter':
+        self.sitemaps_dir.mkdir(parents=True, exist_ok=True)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._writer is None:
+            return
+        if exc_type is not None:
+            # Discard the partial shard; completed shards stay in place
+            self._writer.__exit__(exc_type, exc, tb)
+            self._writer = None
+            self.shard_files.pop()
+            return
+        self._close_shard()
 
 
 class SitemapWriter:
     """Sitemap generator."""
     
-    def __init__(self, output_dir: str = "public", base_url: str = None):
+    def __init__(self, output_dir: str = "public", base_url: str = None, force: bool = False):
         self.output_dir = Path(output_dir)
         self.base_url = base_url or config.base_url
+        self.force = force
         self.urls_per_file = config.sitemap_urls_per_file
+        self.max_bytes = config.sitemap_max_bytes
         
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.sitemaps_dir = self.output_dir / "sitemaps"
         self.sitemaps_dir.mkdir(parents=True, exist_ok=True)
     
-    def create_sitemap_entry(self, url: str, lastmod: datetime = None, 
-                           changefreq: str = "daily", priority: str = "0.8") -> Element:
-        """Create a single sitemap entry."""
-        if lastmod is None:
-            lastmod = datetime.utcnow()
-        
-        url_elem = Element("url")
-        
-        loc_elem = SubElement(url_elem, "loc")
-        loc_elem.text = url
-        
-        lastmod_elem = SubElement(url_elem, "lastmod")
-        lastmod_elem.text = lastmod.strftime("%Y-%m-%dT%H:%M:%SZ")
-        
-        changefreq_elem = SubElement(url_elem, "changefreq")
-        changefreq_elem.text = changefreq
-        
-        priority_elem = SubElement(url_elem, "priority")
-        priority_elem.text = priority
-        
-        return url_elem
-    
     def create_sitemap(self, urls: List[Dict[str, Any]]) -> str:
         """Create a sitemap XML for a list of URLs."""
-        # Create root element
-        urlset = Element("urlset")
-        urlset.set("xmlns", "http://www.sitemaps.org/schemas/sitemap/0.9")
-        
+        return ''.join(self.iter_sitemap(urls))
+    
+    def iter_sitemap(self, urls: Iterable[Dict[str, Any]]) -> Iterable[str]:
+        """Sitemap XML for a list of URLs, one record at a time."""
+        yield URLSET_HEADER
         for url_data in urls:
-            url = url_data['url']
-            lastmod = url_data.get('lastmod', datetime.utcnow())
-            
-            url_entry = self.create_sitemap_entry(url, lastmod)
-            urlset.append(url_entry)
-        
-        # Convert to pretty XML
-        rough_string = tostring(urlset, encoding='unicode')
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml = reparsed.toprettyxml(indent="  ")
-        
-        # Remove empty lines
-        lines = [line for line in pretty_xml.split('\n') if line.strip()]
-        return '\n'.join(lines)
+            yield format_url_entry(url_data['url'], url_data.get('lastmod'))
+        yield URLSET_FOOTER
     
-    def create_sitemap_index(self, sitemap_files: List[str]) -> str:
-        """Create sitemap index XML."""
-        # Create root element
-        sitemapindex = Element("sitemapindex")
-        sitemapindex.set("xmlns", "http://www.sitemaps.org/schemas/sitemap/0.9")
+    def create_sitemap_index(self, sitemap_files: List[str], lastmods: Dict[str, str] = None) -> str:
+        """Create sitemap index XML.
         
+        ``lastmods`` maps shard files to the time they last changed; shards
+        without one are stamped with the current time.
+        """
+        lastmods = lastmods or {}
+        now = format_lastmod()
+        parts = [f'<?xml version="1.0" encoding="utf-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n']
         for sitemap_file in sitemap_files:
-            sitemap_elem = Element("sitemap")
-            
-            loc_elem = SubElement(sitemap_elem, "loc")
-            loc_elem.text = f"{self.base_url}/{sitemap_file}"
-            
-            lastmod_elem = SubElement(sitemap_elem, "lastmod")
-            lastmod_elem.text = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-            
-            sitemapindex.append(sitemap_elem)
+            parts.append(
+                f"  <sitemap>\n"
+                f"    <loc>{escape(f'{self.base_url}/{sitemap_file}')}</loc>\n"
+                f"    <lastmod>{lastmods.get(sitemap_file, now)}</lastmod>\n"
+                f"  </sitemap>\n"
+            )
+        parts.append('</sitemapindex>\n')
+        return ''.join(parts)
+    
+    def get_day_urls(self, day) -> List[Dict[str, Any]]:
+        """Sitemap entries for one discovery_day row: the day index and every page."""
+        date_str = day.day.strftime('%Y-%m-%d')
+        lastmod = day.last_picked_at or datetime.utcnow()
+        # The stored count was computed with the links_per_page the day was
+        # published at, so it survives config changes
+        page_count = day.page_count
         
-        # Convert to pretty XML
-        rough_string = tostring(sitemapindex, encoding='unicode')
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml = reparsed.toprettyxml(indent="  ")
+        # Days are sharded by month; the day's content hash lets unchanged
+        # months skip rewriting
+        shard = {'shard': day.day.strftime('%Y-%m'), 'content_hash': day.content_hash}
         
-        # Remove empty lines
-        lines = [line for line in pretty_xml.split('\n') if line.strip()]
-        return '\n'.join(lines)
+        urls = [{'url': f"{self.base_url}/discover/{date_str}/", 'lastmod': lastmod, **shard}]
+        urls.extend(
+            {'url': f"{self.base_url}/discover/{date_str}/page-{page_num:06d}.html", 'lastmod': lastmod, **shard}
+            for page_num in range(1, page_count + 1)
+        )
+        return urls
     
     def get_discovery_urls(self, date_str: str = None) -> List[Dict[str, Any]]:
-        """Get URLs for discovery pages."""
-        session = db.get_session()
+        """Get URLs for discovery pages (one date, or every date)."""
+        days = DaySummaryManager().get_published_days([date_str] if date_str else None)
         
-        try:
-            # Get URLs from discovered_kept table
-            if date_str:
-                query = session.query(DiscoveredKept).filter(
-                    func.date(DiscoveredKept.picked_at) == date_str
-                )
-            else:
-                # Get all URLs
-                query = session.query(DiscoveredKept)
-            
-            records = query.all()
-            
-            urls = []
-            for record in records:
-                # Create discovery page URL
-                discovery_url = f"{self.base_url}/discover/{date_str}/"
-                if date_str:
-                    # For specific date, we'll need to determine which page this URL appears on
-                    # For now, just include the day index
-                    urls.append({
-                        'url': discovery_url,
-                        'lastmod': record.picked_at
-                    })
-            
-            return urls
-            
-        finally:
-            session.close()
+        urls = []
+        for day in days:
+            urls.extend(self.get_day_urls(day))
+        return urls
     
+    @traced('sitemap.collect_urls')
     def get_all_discovery_urls(self) -> List[Dict[str, Any]]:
         """Get all discovery page URLs."""
-        session = db.get_session()
-        
-        try:
-            # Get unique dates from discovered_kept
-            dates = session.query(
-                func.date(DiscoveredKept.picked_at).label('date')
-            ).distinct().order_by(
-                func.date(DiscoveredKept.picked_at).desc()
-            ).all()
-            
-            urls = []
-            for date_record in dates:
-                date_str = date_record.date.strftime('%Y-%m-%d')
-                discovery_url = f"{self.base_url}/discover/{date_str}/"
-                
-                # Get the latest picked_at time for this date
-                latest_time = session.query(
-                    func.max(DiscoveredKept.picked_at)
-                ).filter(
-                    func.date(DiscoveredKept.picked_at) == date_record.date
-                ).scalar()
-                
-                urls.append({
-                    'url': discovery_url,
-                    'lastmod': latest_time or datetime.utcnow()
-                })
-            
-            return urls
-            
-        finally:
-            session.close()
+        # One read of the discovery_day summary; page counts are the ones
+        # stored with each day
+        return self.get_discovery_urls()
     
+    @traced('sitemap.run')
     def generate_sitemaps(self, output_dir: str = None) -> List[str]:
         """Generate sitemap files."""
         if output_dir:
@@ -175,37 +202,102 @@ class SitemapWriter:
         # Get all discovery URLs
         urls = self.get_all_discovery_urls()
         print(f"Found {len(urls)} discovery URLs")
+        add_rows(rows_in=len(urls))
         
         if not urls:
             print("No URLs found for sitemap generation")
             return []
         
-        # Split URLs into chunks
+        # Group entries by shard (month), keeping their order
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for url_data in urls:
+            groups.setdefault(url_data.get('shard') or DEFAULT_SHARD, []).append(url_data)
+        
+        previous = self._load_manifest()
+        manifest = {}
         sitemap_files = []
-        for i in range(0, len(urls), self.urls_per_file):
-            chunk = urls[i:i + self.urls_per_file]
-            chunk_num = (i // self.urls_per_file) + 1
-            
-            # Create sitemap XML
-            sitemap_xml = self.create_sitemap(chunk)
-            
-            # Write sitemap file
-            sitemap_filename = f"sitemap-discover-{chunk_num:03d}.xml.gz"
-            sitemap_path = self.sitemaps_dir / sitemap_filename
+        rewritten = 0
+        
+        for shard, entries in groups.items():
+            digest = self._shard_hash(entries)
+            state = previous.get(shard)
             
-            with gzip.open(sitemap_path, 'wt', encoding='utf-8') as f:
-                f.write(sitemap_xml)
+            if (not self.force and state and state['hash'] == digest
+                    and all((self.output_dir / f).exists() for f in state['files'])):
+                manifest[shard] = state
+            else:
+                manifest[shard] = self._write_shard(shard, entries, digest)
+                rewritten += 1
+                if state:
+                    self._remove_files(set(state['files']) - set(manifest[shard]['files']))
             
-            sitemap_files.append(f"sitemaps/{sitemap_filename}")
-            print(f"Generated sitemap: {sitemap_path}")
+            sitemap_files.extend(manifest[shard]['files'])
+        
+        # Shards whose dates no longer have any pages
+        for shard in set(previous) - set(manifest):
+            self._remove_files(previous[shard]['files'])
         
-        # Create sitemap index
-        sitemap_index_xml = self.create_sitemap_index(sitemap_files)
+        print(f"Sitemap shards: {rewritten} rewritten, {len(groups) - rewritten} unchanged")
+        
+        # Create sitemap index (lastmod is when each shard last changed)
+        lastmods = {f: state['lastmod'] for state in manifest.values() for f in state['files']}
+        sitemap_index_xml = self.create_sitemap_index(sitemap_files, lastmods)
         sitemap_index_path = self.output_dir / "sitemap-index.xml"
         
-        with open(sitemap_index_path, 'w', encoding='utf-8') as f:
-            f.write(sitemap_index_xml)
+        # Also rewritten when the precompress setting changed, so its siblings follow
+        if (self._read_text(sitemap_index_path) != sitemap_index_xml
+                or not siblings_match(sitemap_index_path, config.precompress)):
+            atomic_write(sitemap_index_path, sitemap_index_xml, config.precompress)
+            print(f"Generated sitemap index: {sitemap_index_path}")
         
-        print(f"Generated sitemap index: {sitemap_index_path}")
+        self._save_manifest(manifest)
         
-        return [str(sitemap_index_path)] + [str(self.sitemaps_dir / f) for f in sitemap_files]
+        return [str(sitemap_index_path)] + [str(self.output_dir / f) for f in sitemap_files]
+    
+    @property
+    def manifest_path(self) -> Path:
+        return self.sitemaps_dir / SITEMAP_MANIFEST_NAME
+    
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Shard -> {'hash', 'files', 'lastmod'} from the previous run."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def _save_manifest(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        atomic_write(self.manifest_path, json.dumps(manifest, indent=1, sort_keys=True))
+    
+    def _shard_hash(self, entries: List[Dict[str, Any]]) -> str:
+        """Hash of everything written into a shard."""
+        content = [(u['url'], u.get('lastmod'), u.get('content_hash')) for u in entries]
+        # The limits decide how a shard splits into files, so they're part of it
+        payload = json.dumps([self.urls_per_file, self.max_bytes, content], default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @traced('sitemap.write_shard')
+    def _write_shard(self, shard: str, entries: List[Dict[str, Any]], digest: str) -> Dict[str, Any]:
+        """Stream a shard's records into gzip files, rolling over at the URL/byte limits."""
+        prefix = "sitemap-discover" if shard == DEFAULT_SHARD else f"sitemap-discover-{shard}"
+        current_span().set(shard=shard, urls=len(entries))
+        with SitemapShardWriter(self.sitemaps_dir, prefix=prefix, max_urls=self.urls_per_file,
+                                max_bytes=self.max_bytes) as shards:
+            for url_data in entries:
+                shards.add(url_data['url'], url_data.get('lastmod'))
+        
+        return {'hash': digest, 'files': shards.shard_files, 'lastmod': format_lastmod()}
+    
+    def _remove_files(self, files: Iterable[str]) -> None:
+        for sitemap_file in files:
+            path = self.output_dir / sitemap_file
+            if path.exists():
+                path.unlink()
+                print(f"Removed stale sitemap: {path}")
+    
+    @staticmethod
+    def _read_text(path: Path) -> str:
+        try:
+            return path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,145 @@
+"""Streaming, atomic file output with optional precompressed siblings."""
+
+import gzip
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+try:
+    import brotli
+except ImportError:  # Optional: only needed for .br siblings
+    brotli = None
+
+PRECOMPRESS_FORMATS = ('gz', 'br')
+
+
+def _umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Mode a plain open() gives new files; mkstemp would leave them 0600.
+# Read once, as os.umask can only be queried by setting it.
+NEW_FILE_MODE = 0o666 & ~_umask()
+
+
+def file_mode(path: Path) -> int:
+    """Permissions for a file replacing ``path``: its current mode, else NEW_FILE_MODE."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+
+def sibling_path(output_path: Path, fmt: str) -> Path:
+    """Precompressed sibling of output_path (``page.html`` -> ``page.html.gz``)."""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.name}.{fmt}")
+
+
+def siblings_match(output_path: Path, precompress: Sequence[str]) -> bool:
+    """Whether exactly the siblings for ``precompress`` exist beside output_path."""
+    return all(sibling_path(output_path, fmt).exists() == (fmt in precompress) for fmt in PRECOMPRESS_FORMATS)
+
+
+class StreamWriter:
+    """Write text chunks to a temp file and rename it into place on close.
+    
+    Chunks can be teed into ``.gz`` and ``.br`` siblings so a static host or
+    CDN can serve precompressed files; siblings of formats not written are
+    removed so they can't go stale. If ``output_path`` itself ends in
+    ``.gz`` the primary file is gzip-compressed.
+    """
+    
+    def __init__(self, output_path: Path, precompress: Sequence[str] = ()):
+        self.output_path = Path(output_path)
+        self.precompress = list(precompress)
+        
+        for fmt in self.precompress:
+            if fmt not in PRECOMPRESS_FORMATS:
+                raise ValueError(f"Unknown precompress format {fmt!r} (expected one of {PRECOMPRESS_FORMATS})")
+        if 'br' in self.precompress and brotli is None:
+            raise ValueError("Brotli precompression requires the 'brotli' package")
+        
+        self._targets = []  # (kind, final path, temp path, raw file, gzip stream or None)
+        self._brotli = None
+    
+    def _open_target(self, kind: str, final_path: Path) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=final_path.parent, prefix=f".{final_path.name}.", suffix=".tmp")
+        os.fchmod(fd, file_mode(final_path))
+        raw = os.fdopen(fd, 'wb')
+        # mtime=0 keeps gzip output byte-identical across runs
+        stream = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if kind == 'gz' else None
+        self._targets.append((kind, final_path, tmp_path, raw, stream))
+    
+    def __enter__(self) -> 'StreamWriter':
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            self._open_target('gz' if self.output_path.suffix == '.gz' else 'plain', self.output_path)
+            for fmt in self.precompress:
+                self._open_target(fmt, sibling_path(self.output_path, fmt))
+            if 'br' in self.precompress:
+                self._brotli = brotli.Compressor(quality=11)
+        except BaseException:
+            self._discard()
+            raise
+        
+        return self
+    
+    def write(self, chunk: str) -> None:
+        data = chunk.encode('utf-8')
+        for kind, _, _, raw, stream in self._targets:
+            if kind == 'br':
+                raw.write(self._brotli.process(data))
+            else:
+                (stream or raw).write(data)
+    
+    def _discard(self) -> None:
+        for _, _, tmp_path, raw, _ in self._targets:
+            raw.close()
+            os.unlink(tmp_path)
+        self._targets = []
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._discard()
+            return
+        
+        try:
+            for kind, _, _, raw, stream in self._targets:
+                if kind == 'br':
+                    raw.write(self._brotli.finish())
+                elif stream is not None:
+                    stream.close()
+                raw.close()
+        except BaseException:
+            self._discard()
+            raise
+        
+        # Siblings from an earlier run with other formats would outlive this
+        # content; drop them before the new file appears
+        for fmt in PRECOMPRESS_FORMATS:
+            if fmt not in self.precompress:
+                sibling_path(self.output_path, fmt).unlink(missing_ok=True)
+        
+        # Rename only once every file is complete
+        for _, final_path, tmp_path, _, _ in self._targets:
+            os.replace(tmp_path, final_path)
+        self._targets = []
+
+
+def write_stream(output_path: Path, chunks: Iterable[str], precompress: Sequence[str] = ()) -> List[str]:
+    """Stream text chunks to output_path (and any precompressed siblings)."""
+    with StreamWriter(output_path, precompress) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    
+    return [str(output_path)] + [f"{output_path}.{fmt}" for fmt in precompress]
+
+
+def atomic_write(output_path: Path, content: str, precompress: Sequence[str] = ()) -> List[str]:
+    """Write content to output_path atomically."""
+    return write_stream(output_path, [content], precompress)
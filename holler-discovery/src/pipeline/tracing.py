@@ -0,0 +1,189 @@
+"""Lightweight tracing spans exported as Chrome trace events.
+
+Spans are written one per line to a JSON array (``[`` then ``{...},`` lines),
+which chrome://tracing and ui.perfetto.dev load directly. Spans must nest
+within a thread; concurrent asyncio tasks should share one enclosing span.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Offset from perf_counter() to the Unix epoch, so traces from separate runs line up
+_EPOCH = time.time() - time.perf_counter()
+
+_exporter: Optional['TraceExporter'] = None
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class TraceExporter:
+    """Append Chrome trace "complete" events to a file, one per line."""
+
+    def __init__(self, path: str, process_name: str = 'hndisc'):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'w')
+        self._file.write('[\n')
+        self._write({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': process_name}})
+
+    def _write(self, trace_event: Dict[str, Any], last: bool = False) -> None:
+        line = json.dumps(trace_event, default=str)
+        with self._lock:
+            self._file.write(line + ('\n]\n' if last else ',\n'))
+
+    def complete(self, name: str, start: float, duration: float, args: Dict[str, Any]) -> None:
+        """Record a span that started at perf_counter() ``start`` and lasted ``duration`` seconds."""
+        self._write({
+            'name': name,
+            'cat': name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': round((_EPOCH + start) * 1e6, 3),
+            'dur': round(duration * 1e6, 3),
+            'pid': self.pid,
+            'tid': threading.get_native_id(),
+            'args': args,
+        })
+
+    def close(self) -> None:
+        # The closing metadata event makes the file valid JSON; a crashed run
+        # still loads since trace viewers accept an unterminated array
+        self._write({'name': 'trace_end', 'ph': 'M', 'pid': self.pid, 'args': {}}, last=True)
+        self._file.close()
+
+
+class Span:
+    """One traced operation; records wall time, thread CPU time and attributes."""
+
+    def __init__(self, name: str, attrs: Dict[str, Any] = None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self._start = None
+        self._cpu_start = None
+        self._token = None
+
+    def set(self, **attrs) -> 'Span':
+        """Add attributes (e.g. row counts known only once the work is done)."""
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> 'Span':
+        if _exporter is None:
+            return self
+
+        self._token = _current_span.set(self)
+        self._cpu_start = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._start is None:
+            return
+
+        duration = time.perf_counter() - self._start
+        cpu = time.thread_time() - self._cpu_start
+        _current_span.reset(self._token)
+
+        args = dict(self.attrs)
+        # Time not spent on this thread's CPU: DB and network waits, GIL, sleeps
+        args['cpu_ms'] = round(cpu * 1000, 3)
+        args['wait_ms'] = round(max(duration - cpu, 0.0) * 1000, 3)
+        if exc_type is not None:
+            args['error'] = exc_type.__name__
+
+        if _exporter is not None:
+            _exporter.complete(self.name, self._start, duration, args)
+        self._start = None
+
+
+def span(name: str, **attrs) -> Span:
+    """Trace a block: ``with span("filter.host_caps", rows=n):``."""
+    return Span(name, attrs)
+
+
+def current_span() -> Span:
+    """Innermost active span (a detached one when tracing is off)."""
+    return _current_span.get() or Span('detached')
+
+
+def traced(name: str) -> Callable:
+    """Decorator tracing every call of a function or coroutine function."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_tracing(path: str, process_name: str = 'hndisc') -> TraceExporter:
+    """Start exporting spans to ``path``."""
+    global _exporter
+
+    _exporter = TraceExporter(path, process_name)
+    print(f"Tracing spans to {path}")
+    return _exporter
+
+
+def stop_tracing() -> None:
+    """Finish the trace file; spans become no-ops again."""
+    global _exporter
+
+    if _exporter is not None:
+        exporter, _exporter = _exporter, None
+        exporter.close()
+
+
+def _detach_in_child() -> None:
+    # Forked pool workers must not write to the parent's trace file
+    global _exporter
+    _exporter = None
+
+
+os.register_at_fork(after_in_child=_detach_in_child)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    if _exporter is not None:
+        conn.info.setdefault('trace_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('trace_query_start')
+    if not starts:
+        return
+
+    start = starts.pop()
+    if _exporter is not None:
+        _exporter.complete('db.query', start, time.perf_counter() - start, {
+            'statement': ' '.join(statement.split())[:200],
+            'rows': cursor.rowcount,
+            'executemany': executemany,
+        })
+
+
+@event.listens_for(Engine, 'handle_error')
+def _query_failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('trace_query_start'):
+        conn.info['trace_query_start'].pop()
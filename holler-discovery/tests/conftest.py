@@ -0,0 +1,49 @@
+"""Shared fixtures."""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# SQLite stand-ins for the Postgres tables (no JSONB, partitions or AT TIME ZONE)
+SQLITE_DDL = [
+    """
+    CREATE TABLE discovered_kept (
+        id INTEGER PRIMARY KEY, url TEXT NOT NULL, host TEXT NOT NULL, tld TEXT,
+        parking_score REAL NOT NULL, novelty_score REAL NOT NULL, picked_at DATETIME NOT NULL,
+        picked_date DATE GENERATED ALWAYS AS (date(picked_at)) STORED,
+        discovery_score REAL NOT NULL, priority_class INTEGER NOT NULL, signals TEXT,
+        next_check_at DATETIME, recheck_count INTEGER NOT NULL DEFAULT 0,
+        needs_rank BOOLEAN NOT NULL DEFAULT 1, freshness_bucket INTEGER, published_page INTEGER
+    )
+    """,
+    """
+    CREATE TABLE discovered_raw (
+        id INTEGER PRIMARY KEY, url TEXT NOT NULL, host TEXT NOT NULL, tld TEXT,
+        source TEXT NOT NULL, seen_at DATETIME NOT NULL,
+        seen_date DATE GENERATED ALWAYS AS (date(seen_at)) STORED
+    )
+    """,
+    """
+    CREATE TABLE discovered_url (
+        url TEXT PRIMARY KEY, seen_at DATETIME NOT NULL, picked_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE discovery_page_keys (
+        picked_date TEXT, page_num INTEGER, links_per_page INTEGER NOT NULL,
+        discovery_score REAL NOT NULL, novelty_score REAL NOT NULL, parking_score REAL NOT NULL,
+        last_id INTEGER NOT NULL, PRIMARY KEY (picked_date, page_num)
+    )
+    """,
+]
+
+
+@pytest.fixture
+def sqlite_sessionmaker():
+    """Sessionmaker for an in-memory SQLite database with the discovered tables and page keys."""
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        for statement in SQLITE_DDL:
+            conn.execute(text(statement))
+    yield sessionmaker(bind=engine)
+    engine.dispose()
@@ -1,9 +1,43 @@
 """Tests for URL chunking and pagination."""
 
 import pytest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from sqlalchemy import event
+
+from holler_discovery.db import DiscoveredKept
 from holler_discovery.pipeline.chunker import URLChunker
 
 
+@pytest.fixture
+def kept_db(sqlite_sessionmaker):
+    """A day of publishable URLs with tied sort keys, in an in-memory SQLite database."""
+    Session = sqlite_sessionmaker
+    session = Session()
+    picked_at = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    for i in range(23):
+        session.add(DiscoveredKept(
+            url=f'https://example{i}.com/', host=f'example{i}.com', tld='com',
+            parking_score=(i % 2) / 10, novelty_score=(i % 3) / 3, picked_at=picked_at,
+            discovery_score=90.0 - (i % 4) * 5, priority_class=i % 4 // 2,
+        ))
+    # Same day below the publish threshold, and the next day: neither may show up
+    session.add(DiscoveredKept(url='https://low.example/', host='low.example', tld='example',
+                               parking_score=0.0, novelty_score=1.0, picked_at=picked_at,
+                               discovery_score=10.0, priority_class=3))
+    session.add(DiscoveredKept(url='https://next.example/', host='next.example', tld='example',
+                               parking_score=0.0, novelty_score=1.0,
+                               picked_at=datetime(2024, 1, 2, 1, tzinfo=timezone.utc),
+                               discovery_score=99.0, priority_class=0))
+    session.commit()
+    session.close()
+    
+    with patch('holler_discovery.pipeline.chunker.db') as mock_db:
+        mock_db.get_session.side_effect = Session
+        yield Session.kw['bind']
+
+
 class TestURLChunker:
     """Test URL chunking functionality."""
     
@@ -125,8 +159,13 @@ class TestURLChunker:
             else:
                 return []
         
+        # Adjacent days are looked up in the discovery_day summary
+        def mock_get_day_counts(dates):
+            return {d.strftime('%Y-%m-%d'): len(mock_get_urls(d.strftime('%Y-%m-%d'))) for d in dates}
+        
         original_method = chunker.get_urls_for_date
         chunker.get_urls_for_date = mock_get_urls
+        chunker.get_day_counts = mock_get_day_counts
         
         try:
             nav_info = chunker.get_day_navigation('2024-01-01')
@@ -141,3 +180,123 @@ class TestURLChunker:
         finally:
             # Restore original method
             chunker.get_urls_for_date = original_method
+    
+    def test_get_urls_for_date_single_query(self):
+        """Repeated lookups for a date should reuse one query result."""
+        chunker = URLChunker(links_per_page=2)
+        
+        record = Mock(url='https://example.com', host='example.com', tld='com',
+                      parking_score=0.1, novelty_score=0.9, discovery_score=75.0,
+                      priority_class=1, signals={}, picked_at=datetime(2024, 1, 1))
+        
+        with patch('holler_discovery.pipeline.chunker.db') as mock_db:
+            mock_session = Mock()
+            query = mock_session.query.return_value.filter.return_value.order_by.return_value
+            query.all.return_value = [record] * 5
+            mock_db.get_session.return_value = mock_session
+            
+            # Navigation for every page of the day issues a single query
+            for page_num in range(1, 4):
+                nav_info = chunker.get_navigation_info('2024-01-01', page_num)
+                assert nav_info['total_urls'] == 5
+            assert query.all.call_count == 1
+            
+            # Clearing the cache for the date forces a fresh read
+            chunker.clear_cache('2024-01-01')
+            chunker.get_urls_for_date('2024-01-01')
+            assert query.all.call_count == 2
+    
+    def test_get_page_keys(self):
+        """Page seek keys should come from the last URL of each previous page."""
+        chunker = URLChunker(links_per_page=3)
+        
+        urls = [
+            {'id': i, 'url': f'https://example{i}.com', 'discovery_score': 100.0 - i,
+             'novelty_score': 0.5, 'parking_score': 0.1}
+            for i in range(8)
+        ]
+        
+        keys = chunker.get_page_keys(urls)
+        
+        # 8 URLs / 3 per page = 3 pages; page 1 needs no key
+        assert [key['page_num'] for key in keys] == [2, 3]
+        assert keys[0]['last_id'] == 2
+        assert keys[0]['discovery_score'] == 98.0
+        assert keys[1]['last_id'] == 5
+    
+    def test_iter_urls_by_date(self):
+        """One streamed query should be split into per-date URL lists."""
+        chunker = URLChunker()
+        
+        def record(i, day):
+            return Mock(id=i, url=f'https://example{i}.com', host=f'example{i}.com', tld='com',
+                        parking_score=0.1, novelty_score=0.9, discovery_score=75.0,
+                        priority_class=1, signals={}, picked_at=datetime(2024, 1, day),
+                        picked_date=datetime(2024, 1, day).date())
+        
+        with patch('holler_discovery.pipeline.chunker.db') as mock_db:
+            mock_session = Mock()
+            query = mock_session.query.return_value.filter.return_value.order_by.return_value
+            query.yield_per.return_value = iter([record(1, 1), record(2, 1), record(3, 3)])
+            mock_db.get_session.return_value = mock_session
+            
+            days = [(date_str, [url['id'] for url in urls])
+                    for date_str, urls in chunker.iter_urls_by_date('2024-01-01', '2024-01-03')]
+        
+        assert days == [('2024-01-01', [1, 2]), ('2024-01-03', [3])]
+        assert mock_session.query.call_count == 1
+
+
+class TestGetPage:
+    """Test single-page reads against full-day pagination."""
+    
+    def _pages(self, chunker):
+        return [[url['id'] for url in page]
+                for page in chunker.chunk_urls(chunker.get_urls_for_date('2024-01-01'))]
+    
+    def test_seek_matches_pagination(self, kept_db):
+        """Seek keys and the OFFSET fallback return the same pages as get_urls_for_date."""
+        chunker = URLChunker(links_per_page=4)
+        expected = self._pages(chunker)
+        assert len(expected) == 6  # 23 publishable URLs, ties on every sort key but id
+        
+        # Without stored keys every page falls back to OFFSET
+        assert [[url['id'] for url in chunker.get_page('2024-01-01', n)]
+                for n in range(1, 7)] == expected
+        
+        chunker.save_page_keys('2024-01-01', chunker.get_urls_for_date('2024-01-01'))
+        statements = []
+        event.listen(kept_db, 'before_cursor_execute',
+                     lambda conn, cursor, statement, parameters, *args:
+                     statements.append((statement, parameters)))
+        
+        assert [[url['id'] for url in chunker.get_page('2024-01-01', n)]
+                for n in range(1, 7)] == expected
+        assert chunker.get_page('2024-01-01', 7) == []
+        page_queries = [(statement, parameters) for statement, parameters in statements
+                        if 'FROM discovered_kept' in statement and 'LIMIT' in statement]
+        assert len(page_queries) == 7
+        # SQLite always binds an OFFSET; only page 7, past the last key, falls back to it
+        assert [parameters[-1] for _, parameters in page_queries] == [0] * 6 + [24]
+        assert sum('(-discovered_kept.discovery_score, -discovered_kept.novelty_score, '
+                   'discovered_kept.parking_score, discovered_kept.id) > (' in statement
+                   for statement, _ in page_queries) == 5  # Pages 2-6
+    
+    def test_published_pages(self, kept_db):
+        """Once published, pages come from published_page, including appended URLs."""
+        chunker = URLChunker(links_per_page=4)
+        pages = self._pages(chunker)
+        
+        # The first three pages were published, then append placed the rest after them
+        assignments = {url_id: n for n, page in enumerate(pages[:3], start=1) for url_id in page}
+        chunker.assign_pages('2024-01-01', assignments, reset=True)
+        chunker.save_page_keys('2024-01-01', chunker.get_urls_for_date('2024-01-01'))
+        chunker.assign_pages('2024-01-01', chunker.append_assignments(
+            chunker.get_published_page_counts('2024-01-01'), chunker.get_unpublished_urls('2024-01-01')
+        ))
+        
+        for n in range(1, 7):
+            assert chunker.get_page('2024-01-01', n) == chunker.get_published_page('2024-01-01', n)
+        assert [url['id'] for url in chunker.get_page('2024-01-01', 4)] == pages[3]
+        assert chunker.get_page('2024-01-01', 7) == []
+
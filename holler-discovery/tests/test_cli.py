@@ -0,0 +1,40 @@
+"""Tests for CLI commands."""
+
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from click.testing import CliRunner
+
+from holler_discovery.cli import main
+from holler_discovery.config import config
+
+
+class TestRankCommand:
+    """Test the rank command."""
+    
+    def test_refreshes_run_off_event_loop(self, monkeypatch):
+        """Sync summary refreshes run in a worker thread, not on the event loop."""
+        monkeypatch.setattr(config, 'database_url', 'postgresql://localhost/test')
+        
+        threads = {}
+        
+        def record(name):
+            return lambda dates: threads.setdefault(name, threading.current_thread())
+        
+        ranker = MagicMock(last_avg_score=50.0)
+        ranker.redecay_freshness = AsyncMock()
+        ranker.rank_urls = AsyncMock(return_value={'P0': 1, 'P1': 0, 'P2': 0, 'P3': 0})
+        ranker.update_run_manifest = AsyncMock()
+        ranker.pop_touched_dates.return_value = ['2024-01-01']
+        
+        with patch('holler_discovery.cli.ranker', ranker), \
+                patch('holler_discovery.cli.async_db') as async_db, \
+                patch('holler_discovery.cli.record_stage_metrics'), \
+                patch('holler_discovery.cli.refresh_day_summaries', side_effect=record('days')), \
+                patch('holler_discovery.cli.refresh_stats_snapshots', side_effect=record('stats')):
+            async_db.dispose = AsyncMock()
+            result = CliRunner().invoke(main, ['rank'])
+        
+        assert result.exit_code == 0, result.output
+        assert set(threads) == {'days', 'stats'}
+        assert threading.main_thread() not in threads.values()
@@ -0,0 +1,247 @@
+"""Tests for table partitioning."""
+
+import asyncio
+from datetime import date, datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from holler_discovery.db import (
+    DiscoveredKept,
+    DiscoveredRaw,
+    DiscoveredUrl,
+    add_months,
+    claim_kept_url,
+    claim_raw_url,
+    detach_partitions,
+    ensure_partitions,
+    migrate_db,
+    month_partitions,
+    partition_month,
+    utc_day_range,
+)
+from holler_discovery.ingest.ct import CTIngester
+from holler_discovery.pipeline.chunker import URLChunker
+from holler_discovery.pipeline.filters import filter_raw_urls
+from holler_discovery.pipeline.ranker import DiscoveryRanker, SIGNAL_NAMES
+
+PICKED_AT = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _add_kept(session, count):
+    for i in range(count):
+        session.add(DiscoveredKept(url=f'https://example{i}.com/', host=f'example{i}.com', tld='com',
+                                   parking_score=0.1, novelty_score=0.5, picked_at=PICKED_AT,
+                                   discovery_score=0.0, priority_class=2))
+    session.commit()
+
+
+class TestPartitionedTables:
+    """Test partitioned table DDL and pruning predicates."""
+    
+    def test_partition_ddl(self):
+        """Both tables are range-partitioned, with the key in the primary key."""
+        raw = str(CreateTable(DiscoveredRaw.__table__).compile(dialect=postgresql.dialect()))
+        kept = str(CreateTable(DiscoveredKept.__table__).compile(dialect=postgresql.dialect()))
+        
+        assert 'PARTITION BY RANGE (seen_at)' in raw
+        assert 'PRIMARY KEY (id, seen_at)' in raw
+        assert 'PARTITION BY RANGE (picked_at)' in kept
+        assert 'PRIMARY KEY (id, picked_at)' in kept
+        assert 'id BIGSERIAL' in kept
+        
+        # ORM identity (and bulk updates by id) stay on id alone
+        assert list(DiscoveredKept.__mapper__.primary_key) == [DiscoveredKept.__table__.c.id]
+        
+        # URL uniqueness lives in the unpartitioned discovered_url table
+        assert not any(index.unique for index in DiscoveredRaw.__table__.indexes)
+        assert [column.name for column in DiscoveredUrl.__table__.primary_key] == ['url']
+    
+    def test_utc_day_range(self):
+        """Day filters carry half-open UTC bounds on the partition key."""
+        start, end = utc_day_range(DiscoveredKept.picked_at, '2024-01-31', '2024-02-01')
+        query = select(DiscoveredKept.id).where(start, end)
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        
+        assert 'discovered_kept.picked_at >= ' in sql
+        assert 'discovered_kept.picked_at < ' in sql
+        assert start.right.value == datetime(2024, 1, 31, tzinfo=timezone.utc)
+        assert end.right.value == datetime(2024, 2, 2, tzinfo=timezone.utc)
+        
+        _, single_end = utc_day_range(DiscoveredRaw.seen_at, date(2024, 1, 31))
+        assert single_end.right.value == datetime(2024, 2, 1, tzinfo=timezone.utc)
+    
+    def test_month_partitions(self):
+        """Monthly partitions are named by month and cover [first, next first)."""
+        partitions = month_partitions('discovered_raw', date(2023, 11, 15), date(2024, 1, 1))
+        
+        assert partitions == [
+            ('discovered_raw_p2023_11', date(2023, 11, 1), date(2023, 12, 1)),
+            ('discovered_raw_p2023_12', date(2023, 12, 1), date(2024, 1, 1)),
+            ('discovered_raw_p2024_01', date(2024, 1, 1), date(2024, 2, 1)),
+        ]
+        assert partition_month('discovered_raw', 'discovered_raw_p2023_12') == date(2023, 12, 1)
+        assert partition_month('discovered_raw', 'discovered_raw_default') is None
+        assert partition_month('discovered_raw', 'discovered_kept_p2023_12') is None
+        assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+        assert add_months(date(2024, 1, 1), 24) == date(2026, 1, 1)
+
+
+class TestPartitionMaintenance:
+    """Test creating partitions ahead and detaching old ones."""
+    
+    def test_ensure_partitions(self):
+        """Missing months from the oldest row through months_ahead are created, plus a default."""
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+        oldest = datetime.combine(add_months(this_month, -2), datetime.min.time(), tzinfo=timezone.utc)
+        existing = {f"discovered_kept_p{add_months(this_month, -1):%Y_%m}"}
+        
+        conn = AsyncMock()
+        
+        async def fetchval(query, *args):
+            if query.startswith('SELECT min'):
+                return oldest
+            return 'discovered_kept' if args[0] in existing else None
+        conn.fetchval.side_effect = fetchval
+        
+        created = asyncio.run(ensure_partitions(conn, 'discovered_kept', 'picked_at', months_ahead=2))
+        
+        assert created == [
+            f"discovered_kept_p{add_months(this_month, months):%Y_%m}" for months in (-2, 0, 1, 2)
+        ]
+        statements = [call.args[0] for call in conn.execute.call_args_list]
+        assert f"FOR VALUES FROM ('{this_month} 00:00:00+00')" in statements[1]
+        assert statements[-1] == (
+            "CREATE TABLE IF NOT EXISTS discovered_kept_default PARTITION OF discovered_kept DEFAULT"
+        )
+    
+    def test_default_partition_rows_raise(self):
+        """Rows in the default partition stop partition maintenance before any DDL."""
+        conn = AsyncMock()
+        
+        async def fetchval(query, *args):
+            if query.startswith('SELECT count'):
+                return 5
+            return 'discovered_raw_default' if args and args[0] == 'discovered_raw_default' else None
+        conn.fetchval.side_effect = fetchval
+        
+        with pytest.raises(RuntimeError, match='5 rows in discovered_raw_default'):
+            asyncio.run(ensure_partitions(conn, 'discovered_raw', 'seen_at'))
+        conn.execute.assert_not_called()
+    
+    def test_migrate_partition_failure_propagates(self):
+        """Partitioning errors fail the migration instead of printing a warning."""
+        conn = AsyncMock()
+        
+        with patch('holler_discovery.db.async_db.create_tables', AsyncMock()), \
+                patch('holler_discovery.db.db.get_connection', AsyncMock(return_value=conn)), \
+                patch('holler_discovery.db.partition_table', AsyncMock(side_effect=RuntimeError('boom'))):
+            with pytest.raises(RuntimeError, match='boom'):
+                asyncio.run(migrate_db())
+        
+        conn.close.assert_awaited_once()
+    
+    def test_detach_partitions(self):
+        """Only whole months before the cutoff are detached, never the default partition."""
+        conn = AsyncMock()
+        conn.fetch.side_effect = lambda query, table: [
+            {'relname': f"{table}_p2023_12"}, {'relname': f"{table}_p2024_01"}, {'relname': f"{table}_default"},
+        ]
+        
+        with patch('holler_discovery.db.db.get_connection', AsyncMock(return_value=conn)):
+            detached = asyncio.run(detach_partitions(date(2024, 1, 15), drop=True))
+        
+        assert detached == ['discovered_raw_p2023_12', 'discovered_kept_p2023_12']
+        statements = [call.args[0] for call in conn.execute.call_args_list]
+        assert statements == [
+            'ALTER TABLE discovered_raw DETACH PARTITION discovered_raw_p2023_12',
+            'DROP TABLE discovered_raw_p2023_12',
+            'ALTER TABLE discovered_kept DETACH PARTITION discovered_kept_p2023_12',
+            'DROP TABLE discovered_kept_p2023_12',
+        ]
+        conn.close.assert_awaited_once()
+
+
+class TestPartitionKeyUpdates:
+    """Test updates by id against the (id, partition key) primary key."""
+    
+    def test_bulk_update_needs_partition_key(self, sqlite_sessionmaker):
+        """ORM bulk updates address rows by (id, picked_at)."""
+        session = sqlite_sessionmaker()
+        _add_kept(session, 1)
+        
+        with pytest.raises(InvalidRequestError):
+            session.execute(update(DiscoveredKept), [{'id': 1, 'discovery_score': 50.0}])
+        session.rollback()
+        session.close()
+    
+    def test_rank_and_page_writes(self, sqlite_sessionmaker):
+        """Ranker chunk writes and page assignments update rows by id."""
+        session = sqlite_sessionmaker()
+        _add_kept(session, 3)
+        
+        with patch('holler_discovery.pipeline.ranker.db') as ranker_db, \
+                patch('holler_discovery.pipeline.chunker.db') as chunker_db:
+            ranker_db.get_session.side_effect = sqlite_sessionmaker
+            chunker_db.get_session.side_effect = sqlite_sessionmaker
+            
+            signals = [0.5] * len(SIGNAL_NAMES)
+            written = DiscoveryRanker()._write_rank_chunk(
+                ([1, 2], [PICKED_AT, PICKED_AT], [85.0, 45.0], [0, 2], [signals, signals]),
+                datetime.now(timezone.utc)
+            )
+            URLChunker().assign_pages('2024-01-01', {1: 1, 3: 2})
+        
+        assert written == 2
+        rows = {row.id: row for row in session.query(DiscoveredKept).all()}
+        assert (rows[1].discovery_score, rows[1].needs_rank, rows[1].published_page) == (85.0, False, 1)
+        assert (rows[2].discovery_score, rows[2].published_page) == (45.0, None)
+        assert rows[3].published_page == 2
+        session.close()
+
+
+class TestUrlClaims:
+    """Test URL-level deduplication through discovered_url."""
+    
+    def test_claims(self, sqlite_sessionmaker):
+        """A URL is claimed once for ingest and once for the kept table."""
+        session = sqlite_sessionmaker()
+        
+        seen_at = claim_raw_url(session, 'https://alpha.dev/')
+        assert seen_at is not None
+        assert claim_raw_url(session, 'https://alpha.dev/') is None
+        
+        assert claim_kept_url(session, 'https://alpha.dev/') is not None
+        assert claim_kept_url(session, 'https://alpha.dev/') is None
+        assert claim_kept_url(session, 'https://never-ingested.dev/') is None
+        session.close()
+    
+    def test_same_url_ingested_twice(self, sqlite_sessionmaker):
+        """A URL seen by two ingest runs, and twice in one run, gets one raw and one kept row."""
+        session = sqlite_sessionmaker()
+        ingester = CTIngester()
+        batches = [['alpha.dev', 'beta.io', 'alpha.dev'], ['beta.io', 'gamma.io']]
+        
+        with patch('holler_discovery.ingest.ct.db') as ct_db, \
+                patch('holler_discovery.pipeline.filters.db') as filters_db, \
+                patch.object(ingester, 'fetch_domains', AsyncMock(side_effect=batches)):
+            ct_db.get_session.side_effect = sqlite_sessionmaker
+            filters_db.get_session.side_effect = sqlite_sessionmaker
+            counts = [asyncio.run(ingester.ingest(1)) for _ in batches]
+            
+            # The filter keeps everything; the second pass finds nothing new
+            keep_all = {'parking_score': 0.1, 'novelty_score': 0.5}
+            with patch('holler_discovery.pipeline.filters.URLFilter') as url_filter:
+                url_filter.return_value.process_batch.side_effect = lambda urls, cap: {url: keep_all for url in urls}
+                kept = [filter_raw_urls(), filter_raw_urls()]
+        
+        assert counts == [2, 1]
+        assert kept == [3, 0]
+        urls = ['https://alpha.dev/', 'https://beta.io/', 'https://gamma.io/']
+        assert sorted(row.url for row in session.query(DiscoveredRaw)) == urls
+        assert sorted(row.url for row in session.query(DiscoveredKept)) == urls
+        session.close()
@@ -0,0 +1,182 @@
+"""Tests for HTML page generation."""
+
+import pytest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from sqlalchemy import event
+
+from holler_discovery.db import DiscoveredKept
+from holler_discovery.pipeline.chunker import URLChunker
+from holler_discovery.pipeline.html_writer import HTMLWriter
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+def _make_writer(output_dir, workers):
+    writer = HTMLWriter(template_dir=TEMPLATE_DIR, output_dir=output_dir, workers=workers)
+    writer.chunker = URLChunker(links_per_page=3)
+    
+    urls = [
+        {'id': i, 'url': f'https://example{i}.com/', 'host': f'example{i}.com', 'tld': 'com',
+         'discovery_score': 90.0 - i, 'priority_class': 0}
+        for i in range(10)
+    ]
+    writer.chunker.get_urls_for_date = Mock(return_value=urls)
+    writer.chunker.save_page_keys = Mock()
+    writer.chunker.assign_pages = Mock()
+    writer.generate_day_index = Mock(return_value=None)
+    return writer
+
+
+class TestHTMLWriter:
+    """Test discovery page generation."""
+    
+    def test_parallel_matches_serial(self, tmp_path):
+        """Pages rendered by the process pool should match serial rendering."""
+        outputs = {}
+        for workers in (1, 2):
+            writer = _make_writer(tmp_path / f"workers-{workers}", workers)
+            
+            with patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+                try:
+                    generated = writer.generate_all_pages_for_date('2024-01-01')
+                finally:
+                    writer.close()
+            
+            # 10 URLs / 3 per page = 4 pages
+            assert len(generated) == 4
+            outputs[workers] = {Path(p).name: Path(p).read_text() for p in generated}
+        
+        assert outputs[1] == outputs[2]
+        assert 'https://example9.com/' in outputs[2]['page-000004.html']
+    
+    def test_rerun_skips_unchanged_pages(self, tmp_path):
+        """A second run with the same inputs should not rewrite any page."""
+        writer = _make_writer(tmp_path, 1)
+        
+        with patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+            first = writer.generate_all_pages_for_date('2024-01-01')
+            assert writer.files_written == 4
+            mtimes = {p: Path(p).stat().st_mtime_ns for p in first}
+            
+            # Fresh writer reads the manifest saved by the first run
+            writer = _make_writer(tmp_path, 1)
+            second = writer.generate_all_pages_for_date('2024-01-01')
+            assert writer.files_written == 0
+            assert second == first
+            assert {p: Path(p).stat().st_mtime_ns for p in second} == mtimes
+            
+            # Changing one URL only rewrites the page it lands on
+            urls = writer.chunker.get_urls_for_date.return_value
+            urls[-1] = dict(urls[-1], url='https://changed.example/')
+            writer.chunker.clear_cache()
+            writer.generate_all_pages_for_date('2024-01-01')
+            assert writer.files_written == 1
+        
+        assert not list(tmp_path.rglob('*.tmp'))
+    
+    def test_precompress_switched_off(self, tmp_path):
+        """Turning precompression off rewrites pages and removes their .gz siblings."""
+        with patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+            writer = _make_writer(tmp_path, 1)
+            writer.precompress = ['gz']
+            writer.generate_all_pages_for_date('2024-01-01')
+            assert len(list(tmp_path.rglob('page-*.html.gz'))) == 4
+            
+            writer = _make_writer(tmp_path, 1)
+            writer.precompress = []
+            writer.generate_all_pages_for_date('2024-01-01')
+            assert writer.files_written == 4
+        
+        assert not list(tmp_path.rglob('*.gz'))
+    
+    def test_rerun_writes_no_rows(self, tmp_path, sqlite_sessionmaker):
+        """An unchanged re-run issues no writes; a reorder only moves the rows that changed page."""
+        session = sqlite_sessionmaker()
+        for i in range(10):
+            session.add(DiscoveredKept(url=f'https://example{i}.com/', host=f'example{i}.com', tld='com',
+                                       parking_score=0.1, novelty_score=0.5,
+                                       picked_at=datetime(2024, 1, 1, 12, tzinfo=timezone.utc),
+                                       discovery_score=90.0 - i, priority_class=0))
+        session.commit()
+        
+        statements = []
+        event.listen(sqlite_sessionmaker.kw['bind'], 'before_cursor_execute',
+                     lambda conn, cursor, statement, parameters, context, executemany:
+                     statements.append((statement.split()[0], statement, parameters)))
+        
+        def generate():
+            writer = HTMLWriter(template_dir=TEMPLATE_DIR, output_dir=tmp_path, workers=1)
+            writer.chunker = URLChunker(links_per_page=3)
+            writer.generate_day_index = Mock(return_value=None)
+            statements.clear()
+            writer.generate_all_pages_for_date('2024-01-01')
+            return [(verb, sql, params) for verb, sql, params in statements if verb != 'SELECT']
+        
+        with patch('holler_discovery.pipeline.chunker.db') as mock_db, \
+                patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+            mock_db.get_session.side_effect = sqlite_sessionmaker
+            
+            assert generate()  # First run assigns pages and saves keys
+            assert generate() == []
+            
+            # Dropping page 1's last URL below page 2's first swaps just those two rows
+            session.query(DiscoveredKept).filter(DiscoveredKept.id == 3).update({'discovery_score': 84.5})
+            session.commit()
+            writes = [(sql, params) for verb, sql, params in generate() if verb == 'UPDATE']
+        
+        [(sql, params)] = [(sql, params) for sql, params in writes if 'published_page' in sql]
+        assert len(params) == 2
+        pages = dict(session.query(DiscoveredKept.id, DiscoveredKept.published_page).all())
+        assert pages == {1: 1, 2: 1, 4: 1, 3: 2, 5: 2, 6: 2, 7: 3, 8: 3, 9: 3, 10: 4}
+        session.close()
+    
+    def test_append_rewrites_only_tail_pages(self, tmp_path):
+        """Appending should place new URLs after published ones and rewrite only the tail."""
+        writer = _make_writer(tmp_path, 1)
+        published = {page: [{'url': f'https://p{page}-{i}.com/', 'host': f'p{page}-{i}.com',
+                             'discovery_score': 80.0, 'priority_class': 1}
+                            for i in range(3 if page < 3 else 2)]
+                     for page in (1, 2, 3)}
+        new_urls = [{'id': 100 + i, 'url': f'https://new{i}.com/', 'host': f'new{i}.com',
+                     'discovery_score': 95.0, 'priority_class': 0} for i in range(3)]
+        
+        writer.chunker.get_published_page_counts = Mock(return_value={1: 3, 2: 3, 3: 2})
+        writer.chunker.get_unpublished_urls = Mock(return_value=new_urls)
+        writer.chunker.get_published_page = Mock(side_effect=lambda date_str, page: published.get(page, []))
+        
+        with patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+            generated = writer.append_pages_for_date('2024-01-01')
+        
+        # Page 3 is topped up with one URL, the other two open page 4
+        writer.chunker.assign_pages.assert_called_once_with('2024-01-01', {100: 3, 101: 4, 102: 4})
+        assert [Path(p).name for p in generated] == ['page-000003.html', 'page-000004.html']
+        writer.generate_day_index.assert_called_once_with('2024-01-01', url_count=11, total_pages=4)
+        assert not (tmp_path / 'discover' / '2024-01-01' / 'page-000001.html').exists()
+    
+    def test_generate_date_range(self, tmp_path):
+        """A backfill should render every streamed date through the pool."""
+        writer = _make_writer(tmp_path, 2)
+        day_urls = writer.chunker.get_urls_for_date.return_value
+        writer.chunker.iter_urls_by_date = Mock(return_value=iter([
+            ('2024-01-01', day_urls),
+            ('2024-01-02', day_urls[:2]),
+        ]))
+        
+        with patch('holler_discovery.pipeline.html_writer.DaySummaryManager'):
+            try:
+                generated = writer.generate_date_range('2024-01-01', '2024-01-02')
+            finally:
+                writer.close()
+        
+        # 4 pages for the first date, 1 for the second
+        assert sorted(Path(p).relative_to(tmp_path).as_posix() for p in generated) == [
+            'discover/2024-01-01/page-000001.html',
+            'discover/2024-01-01/page-000002.html',
+            'discover/2024-01-01/page-000003.html',
+            'discover/2024-01-01/page-000004.html',
+            'discover/2024-01-02/page-000001.html',
+        ]
+        assert writer.files_written == 5
@@ -0,0 +1,69 @@
+"""Tests for run manifest statistics."""
+
+import pytest
+from datetime import date, datetime, timezone
+from unittest.mock import Mock, patch
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from holler_discovery.db import DailyStats, DiscoveredKept
+from holler_discovery.pipeline.manifest import ManifestManager, SCORE_BUCKETS, score_stats_columns
+
+
+class TestStatsSnapshots:
+    """Test single-pass ranking statistics."""
+    
+    def test_score_stats_single_scan(self):
+        """Counts, average and histogram should compile to one FILTER-aggregate query."""
+        query = select(DiscoveredKept.picked_date, *score_stats_columns()).group_by(
+            DiscoveredKept.picked_date
+        )
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        
+        assert sql.count('SELECT') == 1
+        assert sql.count('FILTER (WHERE') == 4 + len(SCORE_BUCKETS)
+        assert 'width_bucket(discovered_kept.discovery_score' in sql
+        assert 'avg(discovered_kept.discovery_score)' in sql
+    
+    def test_snapshot_row(self):
+        """Aggregate rows map onto daily_stats columns."""
+        manager = ManifestManager()
+        row = Mock(kept_count=10, p0_count=1, p1_count=2, p2_count=3, p3_count=4, avg_score=55.5,
+                   bucket_0=1, bucket_1=2, bucket_2=3, bucket_3=3, bucket_4=1)
+        top = {date(2024, 1, 1): [{'url': 'https://example.com'}]}
+        
+        values = manager._snapshot_row(date(2024, 1, 1), row, top)
+        assert values['kept_count'] == 10
+        assert values['p3_count'] == 4
+        assert values['score_distribution'] == {'0-20': 1, '20-40': 2, '40-60': 3, '60-80': 3, '80-100': 1}
+        assert values['top_urls'] == [{'url': 'https://example.com'}]
+        
+        empty = manager._snapshot_row(date(2024, 1, 2), None, top)
+        assert empty['kept_count'] == 0
+        assert empty['top_urls'] == []
+    
+    def test_ranking_stats_read_only(self):
+        """Ranking stats never write: snapshots report computed_at, missing days are computed live."""
+        manager = ManifestManager()
+        live = manager._snapshot_row(date(2024, 1, 2), Mock(kept_count=3, p0_count=1, p1_count=0, p2_count=2,
+                                                             p3_count=0, avg_score=50.0, bucket_0=0, bucket_1=0,
+                                                             bucket_2=3, bucket_3=0, bucket_4=0), {})
+        computed_at = datetime(2024, 1, 1, 23, tzinfo=timezone.utc)
+        snapshots = {date(2024, 1, 1): DailyStats(day=date(2024, 1, 1), kept_count=5, p0_count=5, p1_count=0,
+                                                  p2_count=0, p3_count=0, avg_score=90.0, score_distribution={},
+                                                  top_urls=[], computed_at=computed_at)}
+        
+        with patch('holler_discovery.pipeline.manifest.db') as mock_db, \
+                patch.object(manager, 'refresh_stats_snapshots') as refresh, \
+                patch.object(manager, 'compute_stats_snapshots', return_value={date(2024, 1, 2): live}):
+            session = mock_db.get_session.return_value
+            session.get.side_effect = lambda model, day: snapshots.get(day)
+            
+            stored = manager.get_ranking_stats('2024-01-01')
+            computed = manager.get_ranking_stats('2024-01-02')
+        
+        assert (stored['kept_count'], stored['computed_at']) == (5, computed_at)
+        assert (computed['priority_counts'], computed['computed_at']) == ({'P0': 1, 'P2': 2}, None)
+        refresh.assert_not_called()
+        session.execute.assert_not_called()
+        session.commit.assert_not_called()
@@ -0,0 +1,103 @@
+"""Tests for per-stage performance metrics."""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import Mock
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy import create_engine, text
+
+from holler_discovery.pipeline.manifest import ManifestManager
+from holler_discovery.pipeline.metrics import StageMetrics, add_rows, format_prometheus, http_trace_config
+
+
+class TestStageMetrics:
+    """Test stage timing and counters."""
+    
+    def test_timing_and_rows(self):
+        """A stage records its clocks, memory and the rows reported inside it."""
+        add_rows(rows_in=99)  # Outside any stage: ignored
+        
+        with StageMetrics('filter') as stage:
+            sum(range(200000))
+            add_rows(rows_in=10, rows_out=4)
+            add_rows(rows_out=1)
+        add_rows(rows_out=99)
+        
+        assert stage.rows_in == 10
+        assert stage.rows_out == 5
+        assert stage.wall_seconds > 0
+        assert stage.cpu_seconds > 0
+        assert stage.peak_rss_kb > 0
+        assert stage.rows_per_sec == pytest.approx(5 / stage.wall_seconds)
+        assert stage.as_dict()['stage'] == 'filter'
+    
+    def test_counts_db_round_trips(self):
+        """Every statement executed during the stage counts as a round trip."""
+        engine = create_engine('sqlite://')
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            with StageMetrics('rank') as stage:
+                for _ in range(3):
+                    conn.execute(text('SELECT 1'))
+        
+        assert stage.db_round_trips == 3
+    
+    def test_counts_http_requests(self):
+        """Requests made through the trace config count requests and body bytes."""
+        async def handler(request):
+            return web.Response(body=b'x' * 1000)
+        
+        async def fetch():
+            app = web.Application()
+            app.router.add_get('/', handler)
+            async with TestServer(app) as server:
+                async with aiohttp.ClientSession(trace_configs=[http_trace_config()]) as session:
+                    with StageMetrics('ingest', 'ct') as stage:
+                        for _ in range(2):
+                            async with session.get(server.make_url('/')) as response:
+                                await response.read()
+            return stage
+        
+        stage = asyncio.run(fetch())
+        assert stage.http_requests == 2
+        assert stage.http_bytes == 2000
+
+
+class TestMetricsExport:
+    """Test stage metrics in exported manifests."""
+    
+    def test_format_prometheus(self):
+        """Each stage becomes one labelled sample per metric."""
+        rows = [
+            {'stage': 'ingest', 'source': 'ct', 'wall_seconds': 1.5, 'peak_rss_kb': 2, 'http_bytes': 10},
+            {'stage': 'filter', 'source': None, 'wall_seconds': 0.25},
+        ]
+        output = format_prometheus(rows, {'run_date': '2024-01-01'})
+        
+        assert '# TYPE hndisc_stage_wall_seconds gauge' in output
+        assert 'hndisc_stage_wall_seconds{run_date="2024-01-01",stage="ingest",source="ct"} 1.5' in output
+        assert 'hndisc_stage_wall_seconds{run_date="2024-01-01",stage="filter"} 0.25' in output
+        assert 'hndisc_stage_peak_rss_bytes{run_date="2024-01-01",stage="ingest",source="ct"} 2048' in output
+        assert output.endswith('\n')
+    
+    def test_export_writes_json_and_textfile(self, tmp_path):
+        """export_manifest writes stage metrics to the JSON and a .prom sibling."""
+        manager = ManifestManager()
+        manager.get_run_stats = Mock(return_value={'run_id': 'abc'})
+        manager.get_daily_stats = Mock(return_value={})
+        manager.get_stage_metrics = Mock(return_value=[
+            {'stage': 'rank', 'source': None, 'wall_seconds': 2.0, 'rows_out': 100},
+        ])
+        
+        output_path = manager.export_manifest('2024-01-01', str(tmp_path / 'manifest-2024-01-01.json'))
+        
+        manager.get_stage_metrics.assert_called_once_with(run_id='abc', run_date='2024-01-01')
+        data = json.loads((tmp_path / 'manifest-2024-01-01.json').read_text())
+        assert data['stage_metrics'][0]['rows_out'] == 100
+        prom = (tmp_path / 'manifest-2024-01-01.prom').read_text()
+        assert 'hndisc_stage_rows_out{run_date="2024-01-01",stage="rank"} 100' in prom
+        assert output_path.endswith('.json')
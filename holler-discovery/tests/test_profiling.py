@@ -0,0 +1,58 @@
+"""Tests for CLI profiling hooks."""
+
+import pstats
+import time
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from holler_discovery.cli import main
+from holler_discovery.config import config
+from holler_discovery.pipeline.metrics import StageMetrics
+from holler_discovery.pipeline.profiling import CommandProfiler
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+class TestCommandProfiler:
+    """Test command and per-stage profiles."""
+    
+    def test_stage_profiles(self, tmp_path):
+        """Each stage gets its own .pstats/.collapsed; the command files cover all of them."""
+        profiler = CommandProfiler('rank', output_dir=str(tmp_path), top=None, interval=0.001).start()
+        try:
+            with StageMetrics('ingest', 'ct'):
+                _busy(0.05)
+            _busy(0.01)
+        finally:
+            profiler.stop()
+        
+        names = {path.name for path in profiler.output_dir.iterdir()}
+        assert {'rank.pstats', 'rank-ingest-ct.pstats', 'rank.collapsed', 'rank-ingest-ct.collapsed'} <= names
+        
+        functions = {func[2] for func in pstats.Stats(str(profiler.output_dir / 'rank.pstats')).stats}
+        assert '_busy' in functions
+        
+        lines = (profiler.output_dir / 'rank-ingest-ct.collapsed').read_text().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        assert stack.split(';')[-1].startswith('_busy (test_profiling.py:')
+    
+    def test_cli_profile_top(self, tmp_path, monkeypatch):
+        """--profile-top profiles the selected command and prints a summary."""
+        monkeypatch.setattr(config, 'database_url', 'postgresql://localhost/test')
+        monkeypatch.setattr(config, 'profile_dir', str(tmp_path))
+        
+        with patch('holler_discovery.cli.refresh_day_summaries', return_value=3):
+            result = CliRunner().invoke(main, ['--profile-top', '5', 'refresh-days'])
+        
+        assert result.exit_code == 0, result.output
+        assert 'Discovery day summary rebuilt: 3 days' in result.output
+        assert 'top 5 by cumulative time' in result.output
+        [run_dir] = list(tmp_path.iterdir())
+        assert run_dir.name.startswith('refresh-days-')
+        assert (run_dir / 'refresh-days.pstats').exists()
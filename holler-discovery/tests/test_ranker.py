@@ -2,9 +2,62 @@
 
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import Mock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
 
-from src.pipeline.ranker import DiscoveryRanker, DiscoverySignals
+import numpy as np
+
+from src.pipeline.ranker import DiscoveryRanker, DiscoverySignals, SIGNAL_NAMES, FRESHNESS_VALUES
+
+
+async def _stream(rows):
+    """Stand-in for the AsyncResult returned by AsyncSession.stream()."""
+    for row in rows:
+        yield row
+
+
+class _FakeKeptQuery:
+    """Just enough of session.query() for _read_rank_chunk: unranked rows after an id."""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.after_id = 0
+        self.size = None
+    
+    def filter(self, *clauses):
+        self.after_id = clauses[-1].right.value  # DiscoveredKept.id > after_id
+        return self
+    
+    def order_by(self, *columns):
+        return self
+    
+    def limit(self, size):
+        self.size = size
+        return self
+    
+    def all(self):
+        return [r for r in self.rows if r.needs_rank and r.id > self.after_id][:self.size]
+
+
+def _kept_rows():
+    """Unranked discovered_kept rows spanning every priority class."""
+    now = datetime.now()
+    specs = [
+        ("https://research.example.gov/documents/report.pdf", "research.example.gov", "gov", 0.1, 0.9, 1),
+        ("https://adult.example.tk/for-sale", "adult.example.tk", "tk", 0.9, 0.1, 400),
+        ("https://beta.tool.dev/data/x.csv", "beta.tool.dev", "dev", 0.3, 0.6, 3),
+        ("https://news.example.org/", "news.example.org", "org", 0.5, 0.5, 48),
+        ("https://example.com/about", "example.com", "com", 0.2, 0.7, 12),
+        ("https://shop.example.net/cart", "shop.example.net", "net", 0.7, 0.2, 100),
+        ("https://docs.example.io/api/v2", "docs.example.io", "io", 0.05, 0.95, 2),
+    ]
+    return [
+        SimpleNamespace(id=i + 1, url=url, host=host, tld=tld, parking_score=parking,
+                        novelty_score=novelty, picked_at=now - timedelta(hours=hours),
+                        needs_rank=True, discovery_score=0.0, priority_class=2, signals=None,
+                        next_check_at=None, freshness_bucket=None)
+        for i, (url, host, tld, parking, novelty, hours) in enumerate(specs * 3)
+    ]
 
 
 class TestDiscoverySignals:
@@ -127,6 +180,33 @@ class TestDiscoveryRanker:
         )
         assert score_gov > score_com
     
+    def test_url_doc_features(self):
+        """Test combined document path and extension detection."""
+        assert self.ranker._url_doc_features("https://example.com/Documents/a.PDF") == (True, True)
+        assert self.ranker._url_doc_features("https://example.com/dataset/") == (True, False)
+        assert self.ranker._url_doc_features("https://example.com/file.csv") == (False, True)
+        assert self.ranker._url_doc_features("https://example.com/page.html") == (False, False)
+
+        # Precomputed features must give the same result as computing inline
+        url = "https://example.com/reports/q3.json"
+        features = self.ranker._url_doc_features(url)
+        assert self.ranker._compute_link_yield(url, "example.com", features) == \
+            self.ranker._compute_link_yield(url, "example.com")
+        assert self.ranker._compute_content_readiness(url, 0.2, "example.com", features) == \
+            self.ranker._compute_content_readiness(url, 0.2, "example.com")
+
+    def test_host_signals_memoized(self):
+        """Host components should be computed once per host until reset."""
+        first = self.ranker.host_signals("news.adult-data.example.gov")
+        assert self.ranker.host_signals("news.adult-data.example.gov") is first
+        assert first.unseen_likelihood == 0.1
+        assert abs(first.link_yield - 0.3) < 1e-9
+        assert 'adult' in first.safety_keywords
+        assert 'data' in first.topic_keywords
+        
+        self.ranker.reset_host_cache()
+        assert self.ranker.host_signals("news.adult-data.example.gov") is not first
+    
     def test_compute_source_reliability(self):
         """Test source reliability computation."""
         # CT should have highest reliability
@@ -169,6 +249,67 @@ class TestDiscoveryRanker:
         week_ago = now - timedelta(days=7)
         assert self.ranker._compute_freshness(week_ago) == 0.2
     
+    def test_freshness_bucket(self):
+        """Freshness buckets should index the values _compute_freshness returns."""
+        now = datetime.now()
+        for age in [timedelta(minutes=30), timedelta(hours=3), timedelta(hours=12),
+                    timedelta(hours=48), timedelta(days=7)]:
+            seen_at = now - age
+            bucket = self.ranker.freshness_bucket(seen_at, now)
+            assert FRESHNESS_VALUES[bucket] == self.ranker._compute_freshness(seen_at)
+    
+    @pytest.mark.asyncio
+    async def test_redecay_freshness(self):
+        """Re-decay should only change the freshness term of stored signals."""
+        now = datetime.now()
+        signals = {
+            'unseen_likelihood': 0.8, 'host_novelty': 0.6, 'content_readiness': 0.9,
+            'link_yield': 0.7, 'source_reliability': 0.5, 'freshness': 1.0,
+            'safety': 1.0, 'topic_boost': 0.1,
+        }
+        record = Mock(id=7, picked_at=now - timedelta(hours=30), signals=signals, recheck_count=0)
+        
+        with patch('src.pipeline.ranker.async_db') as mock_db:
+            mock_session = AsyncMock()
+            mock_session.execute.return_value = Mock(all=Mock(return_value=[record]))
+            mock_db.get_session.return_value = mock_session
+            
+            updated = await self.ranker.redecay_freshness(now)
+        
+        assert updated == 1
+        mappings = mock_session.execute.call_args[0][1]
+        assert mappings[0]['id'] == 7
+        assert mappings[0]['picked_at'] == record.picked_at  # Partition key completes the primary key
+        assert mappings[0]['freshness_bucket'] == 3
+        assert mappings[0]['signals'] == dict(signals, freshness=0.5)
+        
+        expected = sum(
+            value * weight
+            for value, weight in zip(mappings[0]['signals'].values(), self.ranker.rank_weight_vector())
+        ) * 100
+        assert abs(mappings[0]['discovery_score'] - expected) < 1e-9
+        mock_session.commit.assert_awaited_once()
+        mock_session.close.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_redecay_keeps_backoff(self):
+        """Re-decay should not reset a rechecked P2/P3 URL's backoff step."""
+        now = datetime.now()
+        signals = {name: 0.3 for name in SIGNAL_NAMES}
+        record = Mock(id=9, picked_at=now - timedelta(hours=30), signals=signals, recheck_count=2)
+        
+        with patch('src.pipeline.ranker.async_db') as mock_db:
+            mock_session = AsyncMock()
+            mock_session.execute.return_value = Mock(all=Mock(return_value=[record]))
+            mock_db.get_session.return_value = mock_session
+            
+            await self.ranker.redecay_freshness(now)
+        
+        mapping = mock_session.execute.call_args[0][1][0]
+        assert mapping['priority_class'] in (2, 3)
+        assert mapping['next_check_at'] == self.ranker.compute_next_check_at(mapping['priority_class'], now, 2)
+        assert mapping['next_check_at'] > self.ranker.compute_next_check_at(mapping['priority_class'], now)
+    
     def test_compute_safety(self):
         """Test safety computation."""
         # Clean URL should be 1.0
@@ -269,12 +410,19 @@ class TestDiscoveryRanker:
         next_check_p3 = self.ranker.compute_next_check_at(3, now)
         assert next_check_p3 is not None
         assert next_check_p3 > next_check_p2
+        
+        # Each recheck that leaves a URL in P2 doubles the interval, up to the cap
+        intervals = [
+            (self.ranker.compute_next_check_at(2, now, attempt) - now).total_seconds() / 3600
+            for attempt in range(5)
+        ]
+        assert intervals == [6, 12, 24, 48, 48]
     
     @pytest.mark.asyncio
     async def test_rank_urls(self):
         """Test URL ranking process."""
         # Mock database session
-        with patch('src.pipeline.ranker.db') as mock_db:
+        with patch('src.pipeline.ranker.async_db') as mock_db:
             # Mock URL records
             mock_record1 = Mock()
             mock_record1.url = "https://example.com/page1"
@@ -300,10 +448,12 @@ class TestDiscoveryRanker:
             mock_record2.signals = None
             mock_record2.next_check_at = None
             
-            # Mock session
-            mock_session = Mock()
-            mock_session.query.return_value.filter.return_value.all.return_value = [mock_record1, mock_record2]
-            mock_session.query.return_value.filter.return_value.count.return_value = 1
+            # Mock session; serial ranking runs on its sync facade
+            sync_session = Mock()
+            sync_session.query.return_value.filter.return_value.all.return_value = [mock_record1, mock_record2]
+            mock_session = AsyncMock()
+            mock_session.run_sync.side_effect = lambda fn: fn(sync_session)
+            mock_session.execute.return_value = Mock(one=Mock(return_value=(1, 1, 0, 0, 70.0)))
             mock_db.get_session.return_value = mock_session
             
             # Run ranking
@@ -322,35 +472,39 @@ class TestDiscoveryRanker:
             assert mock_record1.signals is not None
             
             # Commit should have been called
-            mock_session.commit.assert_called_once()
+            sync_session.commit.assert_called_once()
+            assert counts == {'P0': 1, 'P1': 1, 'P2': 0, 'P3': 0}
+            assert self.ranker.last_avg_score == 70.0
     
     @pytest.mark.asyncio
     async def test_get_publishable_urls(self):
-        """Test getting publishable URLs."""
+        """Test streaming publishable URLs."""
         # Mock database session
-        with patch('src.pipeline.ranker.db') as mock_db:
-            # Mock URL records
-            mock_record = Mock()
-            mock_record.url = "https://example.com/page"
-            mock_record.host = "example.com"
-            mock_record.discovery_score = 75.0
-            mock_record.priority_class = 1
+        with patch('src.pipeline.ranker.async_db') as mock_db:
+            # Mock URL rows
+            mock_row = Mock()
+            mock_row.url = "https://example.com/page"
+            mock_row.host = "example.com"
+            mock_row.discovery_score = 75.0
+            mock_row.priority_class = 1
             
             # Mock session
-            mock_session = Mock()
-            mock_session.query.return_value.filter.return_value.order_by.return_value.all.return_value = [mock_record]
+            mock_session = AsyncMock()
+            mock_session.stream.return_value = _stream([mock_row])
             mock_db.get_session.return_value = mock_session
             
-            # Get publishable URLs
-            urls = await self.ranker.get_publishable_urls()
+            # Stream publishable URLs
+            urls = [row async for row in self.ranker.get_publishable_urls(limit=10)]
             
             # Check results
             assert len(urls) == 1
             assert urls[0].url == "https://example.com/page"
             
-            # Check query filters
-            query_call = mock_session.query.call_args[0][0]
-            assert query_call.__name__ == 'DiscoveredKept'
+            # Limit is applied in SQL and rows come from a server-side cursor
+            query = mock_session.stream.call_args[0][0]
+            assert 'LIMIT' in str(query)
+            assert query.get_execution_options()['yield_per'] == 1000
+            mock_session.close.assert_awaited_once()
     
     def test_boundary_conditions(self):
         """Test boundary conditions for scoring."""
@@ -380,6 +534,94 @@ class TestDiscoveryRanker:
         assert score < 50.0  # Should be low quality
 
 
+class TestScoreBatch:
+    """Test the vectorized batch scorer against the scalar reference."""
+    
+    def test_batch_matches_scalar(self):
+        """Batch scores, classes and signals should agree with compute_discovery_score."""
+        ranker = DiscoveryRanker()
+        now = datetime.now()
+        rows = [
+            ("https://research.example.gov/documents/report.pdf", "research.example.gov", "gov", 0.1, 0.9, "ct", now),
+            ("https://adult.example.tk/for-sale", "adult.example.tk", "tk", 0.9, 0.1, "unknown", now - timedelta(days=30)),
+            ("https://beta.tool.dev/data/x.csv", "beta.tool.dev", "dev", 0.3, 0.6, "rss", now - timedelta(hours=3)),
+            ("https://news.example.org/", "news.example.org", None, 0.5, 0.5, "cc", now - timedelta(hours=48)),
+        ]
+        columns = {
+            name: [row[i] for row in rows]
+            for i, name in enumerate(['url', 'host', 'tld', 'parking_score',
+                                      'novelty_score', 'source', 'seen_at'])
+        }
+        
+        scores, classes, matrix = ranker.score_batch(columns)
+        
+        assert matrix.shape == (len(rows), len(SIGNAL_NAMES))
+        for i, (url, host, tld, parking, novelty, source, seen_at) in enumerate(rows):
+            score, signals = ranker.compute_discovery_score(
+                url, host, tld or '', parking, novelty, source, seen_at
+            )
+            assert np.isclose(scores[i], score)
+            assert classes[i] == ranker.map_to_priority_class(score)
+            for j, name in enumerate(SIGNAL_NAMES):
+                assert np.isclose(matrix[i, j], getattr(signals, name))
+    
+    def test_empty_batch(self):
+        """An empty batch should return empty arrays."""
+        ranker = DiscoveryRanker()
+        columns = {name: [] for name in ['url', 'host', 'tld', 'parking_score',
+                                         'novelty_score', 'source', 'seen_at']}
+        scores, classes, matrix = ranker.score_batch(columns)
+        assert len(scores) == 0
+        assert len(classes) == 0
+        assert matrix.shape == (0, len(SIGNAL_NAMES))
+
+
+class TestParallelRanking:
+    """Test the overlapped read/score/write ranking path."""
+    
+    @pytest.mark.asyncio
+    async def test_workers_match_serial(self):
+        """workers > 1 should write the same results as the serial path, for every row."""
+        serial_rows, parallel_rows = _kept_rows(), _kept_rows()
+        
+        sync_session = Mock()
+        sync_session.query.return_value.filter.return_value.all.return_value = serial_rows
+        
+        def write(stmt, mappings):
+            by_id = {r.id: r for r in parallel_rows}
+            for mapping in mappings:
+                vars(by_id[mapping['id']]).update(mapping)
+        
+        chunk_session = Mock()
+        chunk_session.query.side_effect = lambda *columns: _FakeKeptQuery(parallel_rows)
+        chunk_session.execute.side_effect = write
+        
+        with patch('src.pipeline.ranker.async_db') as mock_async_db, \
+                patch('src.pipeline.ranker.db') as mock_db:
+            mock_session = AsyncMock()
+            mock_session.run_sync.side_effect = lambda fn: fn(sync_session)
+            mock_session.execute.return_value = Mock(one=Mock(return_value=(0, 0, 0, 0, 0.0)))
+            mock_async_db.get_session.return_value = mock_session
+            mock_db.get_session.return_value = chunk_session
+            
+            await DiscoveryRanker().rank_urls()
+            await DiscoveryRanker().rank_urls(workers=2, chunk_size=4)
+        
+        assert len({r.priority_class for r in serial_rows}) > 1
+        assert any(r.next_check_at is not None for r in serial_rows)
+        for serial, parallel in zip(serial_rows, parallel_rows):
+            assert parallel.needs_rank is False
+            assert parallel.discovery_score == pytest.approx(serial.discovery_score)
+            assert parallel.priority_class == serial.priority_class
+            assert parallel.freshness_bucket == serial.freshness_bucket
+            if serial.next_check_at is None:
+                assert parallel.next_check_at is None
+            else:
+                # Each path takes its own "now"
+                assert abs(parallel.next_check_at - serial.next_check_at) < timedelta(seconds=5)
+        assert chunk_session.commit.call_count == 6  # 21 rows in chunks of 4
+
+
 class TestRankerIntegration:
     """Integration tests for the ranker."""
     
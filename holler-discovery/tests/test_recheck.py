@@ -0,0 +1,104 @@
+"""Tests for the P2/P3 recheck worker."""
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from src.pipeline.recheck import RecheckWorker
+from src.pipeline.ranker import ranker
+
+
+def _record(url, host, parking_score, novelty_score, recheck_count=0):
+    record = Mock()
+    record.url = url
+    record.host = host
+    record.tld = host.rsplit('.', 1)[-1]
+    record.parking_score = parking_score
+    record.novelty_score = novelty_score
+    record.picked_at = datetime.now() - timedelta(hours=2)
+    record.priority_class = 2
+    record.recheck_count = recheck_count
+    return record
+
+
+class TestRecheckWorker:
+    """Test RecheckWorker batch processing."""
+    
+    def test_recheck_batch_applies_backoff(self):
+        """Rows still in P2/P3 back off further; promoted rows clear their schedule."""
+        now = datetime.now()
+        weak = _record("https://example.com/", "example.com", 0.9, 0.1, recheck_count=1)
+        strong = _record("https://research.example.gov/documents/report.pdf",
+                         "research.example.gov", 0.0, 1.0, recheck_count=2)
+        
+        with patch('src.pipeline.recheck.db') as mock_db:
+            mock_session = Mock()
+            query = mock_session.query.return_value.filter.return_value.order_by.return_value
+            query.limit.return_value.with_for_update.return_value.all.return_value = [weak, strong]
+            mock_db.get_session.return_value = mock_session
+            
+            result = RecheckWorker(batch_size=10).recheck_batch(now)
+        
+        # Rows must be leased without blocking on other workers
+        query.limit.return_value.with_for_update.assert_called_once_with(skip_locked=True)
+        mock_session.commit.assert_called_once()
+        
+        assert result == {'checked': 2, 'promoted': 1}
+        
+        assert weak.priority_class == 3
+        assert weak.recheck_count == 2
+        assert weak.next_check_at == now + timedelta(hours=48)
+        
+        assert strong.priority_class in [0, 1]
+        assert strong.recheck_count == 0
+        assert strong.next_check_at is None
+    
+    def test_recheck_batch_clears_host_cache(self):
+        """Each batch scores against freshly computed host components."""
+        record = _record("https://example.com/", "example.com", 0.9, 0.1)
+        stale = ranker.host_signals("example.com")
+        
+        with patch('src.pipeline.recheck.db') as mock_db:
+            mock_session = Mock()
+            query = mock_session.query.return_value.filter.return_value.order_by.return_value
+            query.limit.return_value.with_for_update.return_value.all.return_value = [record]
+            mock_db.get_session.return_value = mock_session
+            
+            RecheckWorker(batch_size=10).recheck_batch(datetime.now())
+        
+        assert ranker.host_signals("example.com") is not stale
+    
+    def test_recheck_batch_touches_changed_days(self):
+        """Days of rows whose score or class changed are refreshed, not only promotions."""
+        demoted = _record("https://example.com/", "example.com", 0.9, 0.1, recheck_count=1)
+        demoted.discovery_score = 50.0
+        
+        with patch('src.pipeline.recheck.db') as mock_db:
+            mock_session = Mock()
+            query = mock_session.query.return_value.filter.return_value.order_by.return_value
+            query.limit.return_value.with_for_update.return_value.all.return_value = [demoted]
+            mock_db.get_session.return_value = mock_session
+            
+            ranker.pop_touched_dates()
+            result = RecheckWorker(batch_size=10).recheck_batch(datetime.now())
+            assert result['promoted'] == 0
+            assert demoted.priority_class == 3
+            assert ranker.pop_touched_dates() == {demoted.picked_at.date()}
+            
+            # Re-scoring to the same score and class leaves the day alone
+            RecheckWorker(batch_size=10).recheck_batch(datetime.now())
+            assert ranker.pop_touched_dates() == set()
+    
+    def test_run_stops_when_queue_empty(self):
+        """run() should stop once a batch comes back empty."""
+        worker = RecheckWorker(batch_size=10)
+        worker.recheck_batch = Mock(side_effect=[
+            {'checked': 10, 'promoted': 1},
+            {'checked': 4, 'promoted': 0},
+            {'checked': 0, 'promoted': 0},
+        ])
+        
+        with patch('src.pipeline.recheck.refresh_day_summaries'), \
+                patch('src.pipeline.recheck.refresh_stats_snapshots'):
+            assert worker.run() == {'checked': 14, 'promoted': 1}
+        assert worker.recheck_batch.call_count == 3
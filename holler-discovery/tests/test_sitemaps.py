@@ -3,24 +3,31 @@
 import pytest
 import tempfile
 import gzip
+from datetime import date, datetime, timezone
 from pathlib import Path
+from unittest.mock import Mock, patch
 from xml.etree.ElementTree import fromstring
-from holler_discovery.pipeline.sitemap_writer import SitemapWriter
+from sqlalchemy import select
+from holler_discovery.config import config
+from holler_discovery.db import DiscoveredKept
+from holler_discovery.pipeline.chunker import URLChunker
+from holler_discovery.pipeline.day_summary import DaySummaryManager
+from holler_discovery.pipeline.sitemap_writer import SitemapWriter, SitemapShardWriter, format_lastmod, format_url_entry
+
+NS = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
 
 
 class TestSitemapWriter:
     """Test sitemap generation functionality."""
     
-    def test_create_sitemap_entry(self):
-        """Test individual sitemap entry creation."""
-        writer = SitemapWriter()
-        
-        entry = writer.create_sitemap_entry(
+    def test_format_url_entry(self):
+        """Test individual sitemap entry serialization."""
+        entry = fromstring(format_url_entry(
             "https://example.com/page",
             lastmod=None,
             changefreq="daily",
             priority="0.8"
-        )
+        ))
         
         assert entry.tag == "url"
         assert entry.find("loc").text == "https://example.com/page"
@@ -165,3 +172,143 @@ class TestSitemapWriter:
                     content = f.read()
                     assert "urlset" in content
                     assert "https://test.com/discover/2024-01-01/" in content
+    
+    def test_shard_writer_byte_limit(self):
+        """Shards should roll over before exceeding the uncompressed size limit."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sitemaps_dir = Path(temp_dir) / "sitemaps"
+            with SitemapShardWriter(sitemaps_dir, max_urls=1000, max_bytes=1024) as shards:
+                for i in range(20):
+                    shards.add(f'https://test.com/discover/2024-01-01/page-{i:06d}.html')
+            
+            assert len(shards.shard_files) > 1
+            
+            total = 0
+            for shard_file in shards.shard_files:
+                with gzip.open(Path(temp_dir) / shard_file, 'rb') as f:
+                    content = f.read()
+                assert len(content) <= 1024
+                total += len(fromstring(content).findall('sm:url', NS))
+            assert total == 20
+    
+    def test_discovery_urls_from_day_summary(self):
+        """Every page and day index should come from the day summary rows."""
+        writer = SitemapWriter(base_url="https://test.com")
+        
+        # Page counts come from the stored summary, not the current config
+        days = [
+            Mock(day=date(2024, 1, 2), publishable_count=401, page_count=3, links_per_page=200,
+                 last_picked_at=datetime(2024, 1, 2, 23)),
+            Mock(day=date(2024, 1, 1), publishable_count=200, page_count=1, links_per_page=200,
+                 last_picked_at=datetime(2024, 1, 1, 22)),
+        ]
+        
+        with patch('holler_discovery.pipeline.sitemap_writer.DaySummaryManager') as mock_manager:
+            mock_manager.return_value.get_published_days.return_value = days
+            urls = writer.get_all_discovery_urls()
+        
+        mock_manager.return_value.get_published_days.assert_called_once_with(None)
+        assert [u['url'] for u in urls] == [
+            'https://test.com/discover/2024-01-02/',
+            'https://test.com/discover/2024-01-02/page-000001.html',
+            'https://test.com/discover/2024-01-02/page-000002.html',
+            'https://test.com/discover/2024-01-02/page-000003.html',
+            'https://test.com/discover/2024-01-01/',
+            'https://test.com/discover/2024-01-01/page-000001.html',
+        ]
+        assert urls[-1]['lastmod'] == datetime(2024, 1, 1, 22)
+    
+    def test_page_count_after_append_and_shrink(self, sqlite_sessionmaker):
+        """Appended pages stay counted after their URLs drop below the threshold."""
+        session = sqlite_sessionmaker()
+        for i in range(7):
+            session.add(DiscoveredKept(url=f'https://example{i}.com/', host=f'example{i}.com', tld='com',
+                                       parking_score=0.1, novelty_score=0.5,
+                                       picked_at=datetime(2024, 1, 1, 12, tzinfo=timezone.utc),
+                                       discovery_score=90.0 - i, priority_class=0))
+        session.commit()
+        
+        manager = DaySummaryManager(links_per_page=3, min_score=60)
+        summary = select(DiscoveredKept.picked_date, *manager._page_columns()).group_by(DiscoveredKept.picked_date)
+        assert session.execute(summary).one()[1:] == (7, 3)  # Not published yet: ceil(7 / 3)
+        
+        with patch('holler_discovery.pipeline.chunker.db') as mock_db:
+            mock_db.get_session.side_effect = sqlite_sessionmaker
+            URLChunker(links_per_page=3).assign_pages('2024-01-01', {1: 1, 2: 1, 3: 1, 4: 2, 5: 2})
+            URLChunker(links_per_page=3).assign_pages('2024-01-01', {6: 2, 7: 3})  # --append
+        
+        # Recheck drops two URLs below the threshold; page 3 is still on disk
+        session.query(DiscoveredKept).filter(DiscoveredKept.id.in_([1, 2])).update({'discovery_score': 10.0})
+        session.commit()
+        
+        assert session.execute(summary).one()[1:] == (5, 3)
+        session.close()
+    
+    def test_incremental_monthly_shards(self):
+        """Only shards whose days changed should be rewritten."""
+        def entries(month, content_hash):
+            return [{'url': f'https://test.com/discover/{month}-01/', 'lastmod': datetime(2024, 1, 1),
+                     'shard': month, 'content_hash': content_hash}]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = SitemapWriter(output_dir=temp_dir, base_url="https://test.com")
+            writer.get_all_discovery_urls = lambda: entries('2024-02', 'a') + entries('2024-01', 'b')
+            
+            first = writer.generate_sitemaps()
+            assert [Path(f).name for f in first[1:]] == [
+                'sitemap-discover-2024-02-001.xml.gz',
+                'sitemap-discover-2024-01-001.xml.gz',
+            ]
+            mtimes = {f: Path(f).stat().st_mtime_ns for f in first}
+            
+            # Nothing changed: no file is touched
+            assert writer.generate_sitemaps() == first
+            assert {f: Path(f).stat().st_mtime_ns for f in first} == mtimes
+            
+            # February changed: only its shard and the index are rewritten
+            writer.get_all_discovery_urls = lambda: entries('2024-02', 'c') + entries('2024-01', 'b')
+            with patch('holler_discovery.pipeline.sitemap_writer.format_lastmod',
+                       side_effect=lambda lastmod=None: format_lastmod(lastmod or datetime(2030, 1, 1))):
+                writer.generate_sitemaps()
+            changed = [f for f in first if Path(f).stat().st_mtime_ns != mtimes[f]]
+            assert sorted(Path(f).name for f in changed) == [
+                'sitemap-discover-2024-02-001.xml.gz', 'sitemap-index.xml',
+            ]
+    
+    def test_byte_limit_change_resplits_shards(self):
+        """Changing the byte limit rewrites shards written under the old one."""
+        entries = [{'url': f'https://test.com/discover/2024-01-01/page-{i:06d}.html',
+                    'lastmod': datetime(2024, 1, 1), 'shard': '2024-01', 'content_hash': 'a'}
+                   for i in range(20)]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = SitemapWriter(output_dir=temp_dir, base_url="https://test.com")
+            writer.get_all_discovery_urls = lambda: entries
+            
+            assert len(writer.generate_sitemaps()) == 2  # Index plus one shard file
+            
+            writer.max_bytes = 1024
+            files = writer.generate_sitemaps()
+            assert len(files) > 2
+            for sitemap_file in files[1:]:
+                with gzip.open(sitemap_file, 'rb') as f:
+                    assert len(f.read()) <= 1024
+    
+    def test_index_precompress_switched_off(self, monkeypatch):
+        """An unchanged index is still rewritten when precompression is turned off."""
+        entries = [{'url': 'https://test.com/discover/2024-01-01/', 'lastmod': datetime(2024, 1, 1),
+                    'shard': '2024-01', 'content_hash': 'a'}]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = SitemapWriter(output_dir=temp_dir, base_url="https://test.com")
+            writer.get_all_discovery_urls = lambda: entries
+            index_path = Path(temp_dir) / "sitemap-index.xml"
+            
+            monkeypatch.setattr(config, 'precompress', ['gz'])
+            writer.generate_sitemaps()
+            assert Path(f"{index_path}.gz").exists()
+            
+            monkeypatch.setattr(config, 'precompress', [])
+            writer.generate_sitemaps()
+            assert index_path.exists()
+            assert not Path(f"{index_path}.gz").exists()
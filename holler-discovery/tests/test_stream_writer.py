@@ -0,0 +1,84 @@
+"""Tests for streaming, atomic file output."""
+
+import gzip
+import os
+import stat
+import pytest
+
+from holler_discovery.pipeline.stream_writer import NEW_FILE_MODE, StreamWriter, write_stream
+
+
+class TestStreamWriter:
+    """Test streamed writes and precompressed siblings."""
+    
+    def test_gzip_sibling(self, tmp_path):
+        """The .gz sibling should decompress to the primary file."""
+        output_path = tmp_path / "page.html"
+        paths = write_stream(output_path, ['<html>', 'body' * 100, '</html>'], ['gz'])
+        
+        assert paths == [str(output_path), f"{output_path}.gz"]
+        content = output_path.read_text(encoding='utf-8')
+        assert content == '<html>' + 'body' * 100 + '</html>'
+        with gzip.open(f"{output_path}.gz", 'rt', encoding='utf-8') as f:
+            assert f.read() == content
+    
+    def test_gz_suffix_compresses_primary(self, tmp_path):
+        """A .gz output path is itself gzip-compressed."""
+        output_path = tmp_path / "sitemap.xml.gz"
+        write_stream(output_path, ['<urlset/>'])
+        
+        with gzip.open(output_path, 'rt', encoding='utf-8') as f:
+            assert f.read() == '<urlset/>'
+    
+    def test_brotli_sibling(self, tmp_path):
+        """The .br sibling should decompress to the primary file."""
+        brotli = pytest.importorskip('brotli')
+        output_path = tmp_path / "page.html"
+        write_stream(output_path, ['<html>', '</html>'], ['br'])
+        
+        with open(f"{output_path}.br", 'rb') as f:
+            assert brotli.decompress(f.read()) == b'<html></html>'
+    
+    def test_failure_leaves_previous_file(self, tmp_path):
+        """An error mid-stream should keep the old file and remove temp files."""
+        output_path = tmp_path / "page.html"
+        output_path.write_text('old', encoding='utf-8')
+        
+        def chunks():
+            yield 'new'
+            raise RuntimeError("template error")
+        
+        with pytest.raises(RuntimeError):
+            write_stream(output_path, chunks(), ['gz'])
+        
+        assert output_path.read_text(encoding='utf-8') == 'old'
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['page.html']
+    
+    def test_precompress_switched_off(self, tmp_path):
+        """Rewriting without precompression removes the old siblings."""
+        output_path = tmp_path / "page.html"
+        write_stream(output_path, ['old'], ['gz'])
+        write_stream(output_path, ['new'])
+        
+        assert output_path.read_text(encoding='utf-8') == 'new'
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['page.html']
+    
+    def test_file_mode(self, tmp_path):
+        """New files get the umask-derived mode of open(); rewrites keep the existing mode."""
+        output_path = tmp_path / "page.html"
+        write_stream(output_path, ['<html></html>'], ['gz'])
+        
+        with open(tmp_path / "plain.html", 'w'):
+            pass
+        assert stat.S_IMODE(os.stat(tmp_path / "plain.html").st_mode) == NEW_FILE_MODE
+        assert stat.S_IMODE(os.stat(output_path).st_mode) == NEW_FILE_MODE
+        assert stat.S_IMODE(os.stat(f"{output_path}.gz").st_mode) == NEW_FILE_MODE
+        
+        os.chmod(output_path, 0o640)
+        write_stream(output_path, ['<html>v2</html>'])
+        assert stat.S_IMODE(os.stat(output_path).st_mode) == 0o640
+    
+    def test_unknown_format(self, tmp_path):
+        """Unknown precompress formats are rejected."""
+        with pytest.raises(ValueError):
+            StreamWriter(tmp_path / "page.html", ['zstd'])
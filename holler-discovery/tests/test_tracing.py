@@ -0,0 +1,76 @@
+"""Tests for tracing spans and the Chrome trace exporter."""
+
+import asyncio
+import json
+
+from sqlalchemy import create_engine, text
+
+from holler_discovery.pipeline.filters import URLFilter
+from holler_discovery.pipeline.tracing import current_span, span, start_tracing, stop_tracing, traced
+
+
+def _load_events(path):
+    return [event for event in json.loads(path.read_text()) if event['ph'] == 'X']
+
+
+class TestTracing:
+    """Test span export."""
+    
+    def test_nested_spans(self, tmp_path):
+        """Spans nest by time and carry attributes, CPU and wait time."""
+        @traced('test.inner')
+        def inner():
+            current_span().set(rows=3)
+        
+        @traced('test.async')
+        async def coroutine():
+            await asyncio.sleep(0.001)
+        
+        trace_path = tmp_path / 'trace.json'
+        start_tracing(str(trace_path))
+        try:
+            with span('test.outer', date='2024-01-01'):
+                inner()
+                asyncio.run(coroutine())
+        finally:
+            stop_tracing()
+        
+        events = {event['name']: event for event in _load_events(trace_path)}
+        outer, inner_event = events['test.outer'], events['test.inner']
+        
+        assert outer['args']['date'] == '2024-01-01'
+        assert inner_event['args']['rows'] == 3
+        assert outer['ts'] <= inner_event['ts']
+        assert inner_event['ts'] + inner_event['dur'] <= outer['ts'] + outer['dur']
+        assert events['test.async']['args']['wait_ms'] > 0
+        assert {'cpu_ms', 'wait_ms'} <= set(outer['args'])
+        assert inner_event['cat'] == 'test'
+    
+    def test_db_queries_and_filter_steps(self, tmp_path):
+        """SQL statements become db.query spans; URLFilter steps are traced."""
+        engine = create_engine('sqlite://')
+        trace_path = tmp_path / 'trace.json'
+        
+        start_tracing(str(trace_path))
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            URLFilter().process_batch(['https://example.com/', 'https://example.org/about'])
+        finally:
+            stop_tracing()
+        
+        names = [event['name'] for event in _load_events(trace_path)]
+        assert 'db.query' in names
+        assert {'filter.scores', 'filter.host_caps', 'filter.thresholds', 'filter.dedupe'} <= set(names)
+        
+        # Every line but the brackets is one event, so the file also reads as JSONL
+        lines = trace_path.read_text().splitlines()
+        assert lines[0] == '[' and lines[-1] == ']'
+        assert all(json.loads(line.rstrip(',')) for line in lines[1:-1])
+    
+    def test_disabled_is_noop(self, tmp_path):
+        """Without an exporter spans record nothing."""
+        with span('test.off') as s:
+            current_span().set(rows=1)
+        assert s.attrs == {}
+        assert list(tmp_path.iterdir()) == []